@@ -0,0 +1,172 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import database
+from config import DB_READER_THREADS
+
+# Yozuvlar bitta oqimda ketma-ket bajariladi (SQLite bitta yozuvchini qo'llaydi),
+# o'qishlar alohida oqimlar hovuzida - WAL rejimida ular yozuvni kutmaydi.
+# Shunday qilib sekin commit butun event loop ni to'xtatib qo'ymaydi.
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+_readers = ThreadPoolExecutor(max_workers=DB_READER_THREADS, thread_name_prefix="db-reader")
+
+
+async def _write(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_writer, partial(func, *args))
+
+
+async def _read(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_readers, partial(func, *args))
+
+
+async def init_group_table(group_id: int, group_title: str = None):
+    return await _write(database.init_group_table, group_id, group_title)
+
+
+async def get_violations_db(user_id: int, group_id: int):
+    return await _read(database.get_violations_db, user_id, group_id)
+
+
+async def clear_violations_db(user_id: int, group_id: int):
+    return await _write(database.clear_violations_db, user_id, group_id)
+
+
+async def flush_violations(rows: list, events: list, cutoff: float):
+    return await _write(database.flush_violations, rows, events, cutoff)
+
+
+async def get_violation_state(user_id: int, group_id: int, since: float) -> tuple:
+    return await _read(database.get_violation_state, user_id, group_id, since)
+
+
+async def load_recent_violations(since: float) -> tuple:
+    return await _read(database.load_recent_violations, since)
+
+
+async def group_table_exists(group_id: int) -> bool:
+    return await _read(database.group_table_exists, group_id)
+
+
+async def get_groups() -> list:
+    return await _read(database.get_groups)
+
+
+async def get_group_stats(group_id: int):
+    return await _read(database.get_group_stats, group_id)
+
+
+async def add_captcha_user(user_id: int, group_id: int, message_id: int):
+    return await _write(database.add_captcha_user, user_id, group_id, message_id)
+
+
+async def remove_captcha_user(user_id: int, group_id: int):
+    return await _write(database.remove_captcha_user, user_id, group_id)
+
+
+async def is_captcha_user(user_id: int, group_id: int) -> bool:
+    return await _read(database.is_captcha_user, user_id, group_id)
+
+
+async def get_captcha_message_id(user_id: int, group_id: int) -> int:
+    return await _read(database.get_captcha_message_id, user_id, group_id)
+
+
+async def add_blocked_user(user_id: int, group_id: int, blocked_by: int, reason: str = ""):
+    return await _write(database.add_blocked_user, user_id, group_id, blocked_by, reason)
+
+
+async def get_blocked_users(group_id: int, limit: int = -1, offset: int = 0) -> list:
+    return await _read(database.get_blocked_users, group_id, limit, offset)
+
+
+async def count_blocked_users(group_id: int) -> int:
+    return await _read(database.count_blocked_users, group_id)
+
+
+async def is_user_blocked(user_id: int, group_id: int) -> bool:
+    return await _read(database.is_user_blocked, user_id, group_id)
+
+
+async def add_group_word(group_id: int, word: str, kind: str, added_by: int = None):
+    return await _write(database.add_group_word, group_id, word, kind, added_by)
+
+
+async def remove_group_word(group_id: int, word: str) -> bool:
+    return await _write(database.remove_group_word, group_id, word)
+
+
+async def get_group_words(group_id: int) -> tuple:
+    return await _read(database.get_group_words, group_id)
+
+
+async def get_groups_with_words() -> list:
+    return await _read(database.get_groups_with_words)
+
+
+async def set_flood_response(group_id: int, response: str):
+    return await _write(database.set_flood_response, group_id, response)
+
+
+async def get_flood_responses() -> dict:
+    return await _read(database.get_flood_responses)
+
+
+async def add_job(due_at: float, kind: str, chat_id: int, user_id: int = None, message_id: int = None) -> int:
+    return await _write(database.add_job, due_at, kind, chat_id, user_id, message_id)
+
+
+async def cancel_jobs(kind: str, chat_id: int, user_id: int = None, message_id: int = None) -> int:
+    return await _write(database.cancel_jobs, kind, chat_id, user_id, message_id)
+
+
+async def get_due_jobs(now: float, limit: int, shard_index: int = 0, shard_count: int = 1) -> list:
+    return await _read(database.get_due_jobs, now, limit, shard_index, shard_count)
+
+
+async def delete_jobs(job_ids: list):
+    return await _write(database.delete_jobs, job_ids)
+
+
+async def next_job_time(shard_index: int = 0, shard_count: int = 1):
+    return await _read(database.next_job_time, shard_index, shard_count)
+
+
+def shutdown():
+    """Navbatdagi so'rovlarni tugatib, oqimlar va ulanishlarni yopadi"""
+    _writer.shutdown(wait=True)
+    _readers.shutdown(wait=True)
+    database.close_connections()
+
+
+__all__ = [
+    "init_group_table",
+    "get_violations_db",
+    "clear_violations_db",
+    "flush_violations",
+    "get_violation_state",
+    "load_recent_violations",
+    "group_table_exists",
+    "get_groups",
+    "get_group_stats",
+    "add_captcha_user",
+    "remove_captcha_user",
+    "is_captcha_user",
+    "get_captcha_message_id",
+    "add_blocked_user",
+    "get_blocked_users",
+    "count_blocked_users",
+    "is_user_blocked",
+    "add_group_word",
+    "remove_group_word",
+    "get_group_words",
+    "get_groups_with_words",
+    "set_flood_response",
+    "get_flood_responses",
+    "add_job",
+    "cancel_jobs",
+    "get_due_jobs",
+    "delete_jobs",
+    "next_job_time",
+    "shutdown",
+]
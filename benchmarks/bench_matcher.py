@@ -0,0 +1,172 @@
+"""Matcher micro-benchmarks: find_forbidden_word / contains_forbidden_word.
+
+Runs offline over the seeded corpus in benchmarks.corpus and reports
+messages/sec, p50/p99 latency and memory allocated while matching, then
+how many messages the prefilter skipped and how many it passed that
+turned out clean. Run from the repository root:
+
+    python -m benchmarks.bench_matcher
+    python -m benchmarks.bench_matcher --legacy           # also time the old per-word scan
+    python -m benchmarks.bench_matcher --save base.json   # record a baseline
+    python -m benchmarks.bench_matcher --baseline base.json --tolerance 0.15
+
+With --baseline the exit status is 1 when any function got slower than
+the tolerance allows, so the run can gate a change.
+"""
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+import unicodedata
+
+from config import FORBIDDEN_WORDS
+from moderation import ModerationBot
+from normalizer import normalize_text, canonical_forms
+from benchmarks.corpus import make_corpus
+from benchmarks.matcher_corpus import check
+
+
+class LegacyMatcher:
+    """The per-word scan ModerationBot used before the automaton, kept for comparison."""
+
+    def __init__(self, words):
+        self.forbidden_words = [w.lower() for w in words]
+        self._forbidden_patterns = [
+            re.compile(rf"(?<!\\w){re.escape(w)}(?!\\w)", re.IGNORECASE) for w in self.forbidden_words
+        ]
+
+    def find_forbidden_word(self, text):
+        nfkd = unicodedata.normalize("NFKD", text).lower()
+        without_marks = "".join(ch for ch in nfkd if not unicodedata.combining(ch))
+        normalized = (
+            without_marks
+            .replace("’", " ")
+            .replace("ʻ", " ")
+            .replace("ʼ", " ")
+            .replace("`", " ")
+            .replace("·", " ")
+            .replace("–", "-")
+            .replace("—", "-")
+        )
+        collapsed = re.sub(r"[^a-z0-9]+", " ", normalized)
+        for w in self.forbidden_words:
+            if w in normalized:
+                return w
+        for pat, w in zip(self._forbidden_patterns, self.forbidden_words):
+            if pat.search(normalized) or pat.search(collapsed):
+                return w
+        tokens = set(collapsed.split())
+        for w in self.forbidden_words:
+            if w in tokens:
+                return w
+        return None
+
+
+def _clear_caches() -> None:
+    # Every measurement starts cold, so results do not depend on run order
+    normalize_text.cache_clear()
+    canonical_forms.cache_clear()
+
+
+def measure(func, messages: list, rounds: int) -> dict:
+    throughputs = []
+    for _ in range(rounds):
+        _clear_caches()
+        started = time.perf_counter()
+        for text in messages:
+            func(text)
+        throughputs.append(len(messages) / (time.perf_counter() - started))
+
+    _clear_caches()
+    latencies = []
+    clock = time.perf_counter_ns
+    for text in messages:
+        started = clock()
+        func(text)
+        latencies.append(clock() - started)
+    latencies.sort()
+
+    _clear_caches()
+    tracemalloc.start()
+    for text in messages:
+        func(text)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "msgs_per_sec": max(throughputs),
+        "p50_us": statistics.median(latencies) / 1000,
+        "p99_us": latencies[int(len(latencies) * 0.99) - 1] / 1000,
+        "peak_kib": peak / 1024,
+        "retained_bytes_per_msg": retained / len(messages),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if current["msgs_per_sec"] < before["msgs_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: {before['msgs_per_sec']:,.0f} -> {current['msgs_per_sec']:,.0f} msg/s")
+        if current["p99_us"] > before["p99_us"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {before['p99_us']:.1f} -> {current['p99_us']:.1f} us")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--dirty-ratio", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=20240601)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--legacy", action="store_true", help="also time the pre-automaton per-word scan")
+    parser.add_argument("--save", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    moderation = ModerationBot()
+    failures = check(moderation.find_forbidden_word)
+    if failures:
+        raise SystemExit(f"matcher disagrees with the corpus on {len(failures)} entries, not timing it")
+
+    messages = make_corpus(args.messages, args.dirty_ratio, args.seed)
+    cases = {
+        "find_forbidden_word": moderation.find_forbidden_word,
+        "contains_forbidden_word": moderation.contains_forbidden_word,
+    }
+    if args.legacy:
+        cases["legacy_per_word_scan"] = LegacyMatcher(FORBIDDEN_WORDS).find_forbidden_word
+
+    results = {name: measure(func, messages, args.rounds) for name, func in cases.items()}
+
+    flagged = sum(1 for text in messages if moderation.find_forbidden_word(text))
+    print(f"corpus: {len(messages)} messages, seed {args.seed}, {flagged} flagged")
+    print(f"{'function':<26}{'msg/s':>12}{'p50 us':>10}{'p99 us':>10}{'peak KiB':>10}{'B/msg':>8}")
+    for name, r in results.items():
+        print(
+            f"{name:<26}{r['msgs_per_sec']:>12,.0f}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}"
+            f"{r['peak_kib']:>10.0f}{r['retained_bytes_per_msg']:>8.0f}"
+        )
+    prefilter = moderation.prefilter_stats()
+    print(f"prefilter: skip rate {prefilter['skip_rate']:.1%}, false pass rate {prefilter['false_pass_rate']:.1%}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Reproducible chat corpus for the matcher benchmarks.
+
+Messages mix Latin and Cyrillic Uzbek, Russian, emoji and numbers, range
+from one-word replies to long captions, and a share of them carries a
+forbidden word, often in an evasion spelling. Everything is generated
+from a seed, so two runs with the same arguments time the same text.
+"""
+import random
+
+from config import FORBIDDEN_WORDS
+
+UZ_LATIN = [
+    "salom", "assalomu", "alaykum", "rahmat", "yaxshi", "bugun", "ertaga", "kecha",
+    "uyga", "keldik", "darsga", "bordik", "hamma", "narsa", "joyida", "qachon",
+    "uchrashamiz", "yangi", "kitob", "do'kon", "o'qituvchi", "g'alaba", "shahar",
+    "qayerda", "nima", "gap", "bormi", "ishlar", "zo'r", "oila", "bolalar", "choy",
+    "non", "ovqat", "tayyor", "mashina", "yo'lda", "tirbandlik", "ob-havo", "issiq",
+    "sovuq", "yomg'ir", "narxi", "qancha", "so'm", "sotiladi", "telefon", "raqam",
+]
+UZ_CYRILLIC = [
+    "салом", "рахмат", "яхши", "бугун", "эртага", "уйга", "келдик", "ҳамма", "нарса",
+    "қачон", "учрашамиз", "янги", "китоб", "дўкон", "ўқитувчи", "ғалаба", "шаҳар",
+    "қаерда", "нима", "гап", "борми", "ишлар", "оила", "болалар", "чой", "нон",
+]
+RUSSIAN = [
+    "привет", "спасибо", "хорошо", "завтра", "сегодня", "встретимся", "как", "дела",
+    "нормально", "где", "когда", "сколько", "стоит", "продаётся", "машина", "квартира",
+    "работа", "учёба", "погода", "кот", "мол", "дом", "город", "друзья", "давай",
+]
+EMOJI = ["😀", "😂", "👍", "🔥", "❤️", "🙏", "😡", "🤣", "👏", "✅", "🇺🇿", "💯"]
+NUMBERS = ["12", "17", "2024", "+998901234567", "15:30", "100$", "5000", "1-chi"]
+PUNCTUATION = ["", "", "", ",", ".", "!", "?", "!!!", "...", ")"]
+
+# Message length buckets in words: one-word replies, chat lines, long captions
+LENGTHS = [(1, 3, 0.35), (4, 20, 0.45), (21, 80, 0.15), (81, 200, 0.05)]
+
+_HOMOGLYPHS = {"a": "а", "e": "е", "o": "о", "p": "р", "c": "с", "x": "х", "y": "у", "k": "к"}
+_LEET = {"a": "4", "e": "3", "i": "1", "o": "0", "s": "5", "t": "7"}
+
+
+def evade(word: str, rng: random.Random) -> str:
+    """Spell a forbidden word the way people dodge filters."""
+    style = rng.randrange(6)
+    if style == 0:
+        return word
+    if style == 1:
+        return "".join(_LEET.get(ch, ch) if rng.random() < 0.5 else ch for ch in word)
+    if style == 2:
+        i = rng.randrange(len(word))
+        return word[:i + 1] + word[i] * rng.randint(1, 4) + word[i + 1:]
+    if style == 3:
+        return "".join(_HOMOGLYPHS.get(ch, ch) if rng.random() < 0.5 else ch for ch in word)
+    if style == 4:
+        return word.upper()
+    return word.capitalize() + rng.choice(["!", "!!", "?", "..."])
+
+
+def _length(rng: random.Random) -> int:
+    roll = rng.random()
+    for low, high, share in LENGTHS:
+        if roll < share:
+            return rng.randint(low, high)
+        roll -= share
+    return LENGTHS[-1][1]
+
+
+def make_message(rng: random.Random, dirty: bool) -> str:
+    vocabulary = rng.choices([UZ_LATIN, UZ_CYRILLIC, RUSSIAN], weights=[6, 2, 2])[0]
+    words = []
+    for _ in range(_length(rng)):
+        roll = rng.random()
+        if roll < 0.08:
+            words.append(rng.choice(EMOJI))
+        elif roll < 0.12:
+            words.append(rng.choice(NUMBERS))
+        else:
+            words.append(rng.choice(vocabulary) + rng.choice(PUNCTUATION))
+    if dirty:
+        words.insert(rng.randrange(len(words) + 1), evade(rng.choice(FORBIDDEN_WORDS), rng))
+    return " ".join(words)
+
+
+def make_corpus(count: int = 5000, dirty_ratio: float = 0.15, seed: int = 20240601) -> list:
+    rng = random.Random(seed)
+    return [make_message(rng, rng.random() < dirty_ratio) for _ in range(count)]
+
+
+__all__ = ["make_corpus", "make_message", "evade"]
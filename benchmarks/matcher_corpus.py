@@ -0,0 +1,112 @@
+"""Expected verdicts of ModerationBot.find_forbidden_word.
+
+Every benchmark checks the matcher against this corpus before timing it,
+so a faster matcher that changes what gets flagged fails loudly.
+
+    python -m benchmarks.matcher_corpus
+"""
+
+# (text, first forbidden word expected, or None for clean text)
+CORPUS = [
+    # whole words, any case, any surrounding punctuation
+    ("sen ahmoq", "ahmoq"),
+    ("AHMOQ!!!", "ahmoq"),
+    ("Sikaman.", "sikaman"),
+    ("blyat😡", "blyat"),
+    ("(gandon)", "gandon"),
+    ("pizdes", "pizdes"),
+    ("ko't", "ko't"),
+    ("qo'toq bosh", "qo'toq"),
+    # diacritics are stripped before matching
+    ("ÀHMOQ", "ahmoq"),
+    # longer phrases win over their own prefix
+    ("Fuck you!", "fuck you"),
+    ("fuck off", "fuck off"),
+    ("fuck", "fuck"),
+    # separators collapse to spaces for the second text form
+    ("jala_ble", "jala ble"),
+    ("idi_naxuy", "idi naxuy"),
+    # longer words keep matching under Uzbek and Russian endings
+    ("sen ahmoqsan", "ahmoq"),
+    ("dalbayoblar", "dalbayob"),
+    ("suchkalar", "suchka"),
+    ("pidaraslar", "pidaras"),
+    ("gandonlar", "gandon"),
+    ("gandonni", "gandon"),
+    ("ahmoqqa", "ahmoq"),
+    ("pidarassan", "pidaras"),
+    ("gandonlarni", "gandon"),
+    # digits tacked on the end do not hide a word
+    ("Ahmoq123", "ahmoq"),
+    # short words only as whole words
+    ("am", "am"),
+    ("it", "it"),
+    ("bu mol", "mol"),
+    # evasions fold onto the canonical form of the listed word
+    ("p1zdes", "pizdes"),
+    ("4hm0q", "ahmoq"),
+    ("jalaaaab", "jalab"),
+    ("Poxxxuy", "poxuy"),
+    ("blyaaaat", "blyat"),
+    ("sukа", "suka"),  # Cyrillic а
+    ("Qo’toq", "qo’toq"),
+    # ordinary numbers and whole Cyrillic words are not folded
+    ("17 yoshda", None),
+    ("кот", None),
+    # a number before a word is a measurement or a price, not leetspeak
+    ("uzunligi 4m", None),
+    ("eni 4m, bo'yi 6m", None),
+    ("4mm", None),
+    ("1t yuk", None),
+    ("0m", None),
+    ("narxi 5kin", None),
+    ("5ke", None),
+    # forbidden words embedded in ordinary words are not matches
+    ("salom hammaga", None),
+    ("rahmat, yaxshi", None),
+    ("bitta kitob oldim", None),
+    ("amaliyot darsi", None),
+    ("omad tilayman", None),
+    ("moliya vazirligi", None),
+    ("kotlet pishirdim", None),
+    ("Blaster", None),
+    ("sikl", None),
+    ("amma keldi", None),
+    ("mollar boqildi", None),
+    ("chumoli", None),
+    ("tvarog", None),
+    ("seksiya", None),
+    # only listed stems take endings, and a double letter is not squeezed
+    ("bichim", None),
+    ("yetmi", None),
+    ("jalalar", None),
+    ("yetimlar", None),
+    # nothing to match
+    ("", None),
+    ("👍🔥", None),
+    ("привет, как дела?", None),
+]
+
+
+def check(find) -> list:
+    """Return (text, expected, got) for every corpus entry ``find`` gets wrong."""
+    failures = []
+    for text, expected in CORPUS:
+        got = find(text)
+        if got != expected:
+            failures.append((text, expected, got))
+    return failures
+
+
+def main():
+    from moderation import ModerationBot
+
+    failures = check(ModerationBot().find_forbidden_word)
+    for text, expected, got in failures:
+        print(f"MISMATCH {text!r}: expected {expected!r}, got {got!r}")
+    print(f"{len(CORPUS) - len(failures)}/{len(CORPUS)} corpus entries match")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
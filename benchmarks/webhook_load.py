@@ -0,0 +1,198 @@
+"""Webhook-mode throughput against a fake Telegram.
+
+By default everything runs in this process: a fake Bot API that answers
+every method locally, the bot's webhook server with the real routers, and
+a client that POSTs message updates built from benchmarks.corpus the way
+Telegram does. Nothing reaches api.telegram.org and the database is a
+temporary file. Reports how fast updates are acknowledged (p50/p99 and
+updates/sec) and how fast they are fully handled.
+
+    python -m benchmarks.webhook_load
+    python -m benchmarks.webhook_load --updates 20000 --concurrency 200
+
+With --url only the client runs, against a bot already started with
+BOT_MODE = "webhook" (that bot then talks to the real API):
+
+    python -m benchmarks.webhook_load --url http://127.0.0.1:8080/webhook --secret <WEBHOOK_SECRET>
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+from aiohttp import ClientSession, web
+
+from benchmarks.corpus import make_corpus
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def make_update(update_id: int, text: str, chat_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup", "title": f"Bench {chat_id}"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"},
+            "text": text,
+        },
+    }
+
+
+class FakeBotAPI:
+    """Answers Bot API calls the way Telegram would, without doing anything."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self._message_id = 10 ** 9
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        form = await request.post()
+        return web.json_response({"ok": True, "result": self._result(method.lower(), form)})
+
+    def _result(self, method: str, form):
+        chat_id = int(form.get("chat_id", 0) or 0)
+        chat = {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private", "title": f"Bench {chat_id}"}
+        if method == "getme":
+            return {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        if method in ("sendmessage", "editmessagetext", "senddocument"):
+            self._message_id += 1
+            return {"message_id": self._message_id, "date": int(time.time()), "chat": chat, "text": form.get("text", "")}
+        if method == "getchat":
+            return chat
+        if method == "getchatadministrators":
+            return []
+        if method == "getchatmember":
+            user_id = int(form.get("user_id", 0) or 0)
+            return {"status": "member", "user": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"}}
+        return True
+
+
+async def post_updates(url: str, secret: str, updates: list, concurrency: int) -> tuple:
+    """POST every update; return (ack latencies in seconds, status counts, wall time)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = Counter()
+    headers = {SECRET_HEADER: secret} if secret else {}
+
+    async def post(session, update):
+        async with semaphore:
+            started = time.perf_counter()
+            async with session.post(url, json=update, headers=headers) as response:
+                await response.read()
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status] += 1
+
+    async with ClientSession() as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(post(session, update) for update in updates))
+        return latencies, statuses, time.perf_counter() - started
+
+
+def _percentile(values: list, q: float) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def report(label: str, latencies: list, statuses: Counter, elapsed: float) -> None:
+    print(f"{label}: {len(latencies)} updates in {elapsed:.2f}s = {len(latencies) / elapsed:,.0f} updates/s acked")
+    print(f"  ack latency p50 {_percentile(latencies, 50) * 1000:.2f} ms, p99 {_percentile(latencies, 99) * 1000:.2f} ms")
+    print(f"  statuses: {dict(statuses)}")
+
+
+async def run_local(args) -> None:
+    import database
+
+    tmp = tempfile.mkdtemp(prefix="webhook-bench-")
+    database.DB_PATH = os.path.join(tmp, "bench.db")
+    database.init_db()
+
+    from aiogram.client.telegram import TelegramAPIServer
+
+    import async_db
+    from core import bot, dp
+    from counters import violation_counters
+    from outbound import outbound
+    from deleter import message_deleter
+    from moderation import moderation_bot
+    from pipeline import chat_pipeline
+    from run import setup_dispatcher
+    from webhook import WebhookServer
+
+    logging.getLogger("shutupbot").setLevel(logging.WARNING)
+    fake = FakeBotAPI()
+    fake_runner = web.AppRunner(fake.app())
+    await fake_runner.setup()
+    await web.TCPSite(fake_runner, "127.0.0.1", 0).start()
+    fake_host, fake_port = fake_runner.addresses[0][:2]
+    bot.session.api = TelegramAPIServer.from_base(f"http://{fake_host}:{fake_port}")
+
+    setup_dispatcher()
+    server = WebhookServer(dp, bot, secret=args.secret, max_inflight=args.max_inflight)
+    runner = web.AppRunner(server.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    host, port = runner.addresses[0][:2]
+    violation_counters.start()
+
+    updates = build_updates(args)
+    latencies, statuses, elapsed = await post_updates(f"http://{host}:{port}{server.path}", args.secret, updates, args.concurrency)
+    drain_started = time.perf_counter()
+    await server.drain(timeout=120)
+    handled = elapsed + time.perf_counter() - drain_started
+    report("webhook", latencies, statuses, elapsed)
+    print(f"  handled: {server.metrics['processed']} in {handled:.2f}s = {server.metrics['processed'] / handled:,.0f} updates/s")
+    await moderation_bot.stop_notices()
+    await message_deleter.stop()
+    await outbound.stop(timeout=30)
+    print(f"  fake Bot API calls: {dict(fake.calls)}")
+    print(f"  outbound: {outbound.stats()}")
+    print(f"  pipeline: {chat_pipeline.stats()}")
+
+    await violation_counters.stop()
+    await runner.cleanup()
+    await fake_runner.cleanup()
+    await bot.session.close()
+    async_db.shutdown()
+
+
+def build_updates(args) -> list:
+    texts = make_corpus(args.updates, args.dirty_ratio, args.seed)
+    return [
+        make_update(i + 1, text, -1001000000000 - i % args.chats, 1000 + i % args.users)
+        for i, text in enumerate(texts)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100, help="requests in flight at once")
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--dirty-ratio", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=20240601)
+    parser.add_argument("--max-inflight", type=int, default=1000)
+    parser.add_argument("--secret", default="bench-secret")
+    parser.add_argument("--url", help="POST to a running webhook instead of starting one here")
+    args = parser.parse_args()
+    if args.url:
+        latencies, statuses, elapsed = asyncio.run(post_updates(args.url, args.secret, build_updates(args), args.concurrency))
+        report(args.url, latencies, statuses, elapsed)
+    else:
+        asyncio.run(run_local(args))
+
+
+if __name__ == "__main__":
+    main()
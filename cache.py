@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+
+class TTLCache:
+    """Async cache whose entries expire ``ttl`` seconds after being loaded.
+
+    Concurrent misses for the same key share one in-flight load, so a burst
+    of lookups costs a single round trip. A failed load is not cached.
+    ``maxsize`` bounds the number of entries; the oldest-inserted go first.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = {}
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def peek(self, key, default=None):
+        """Return the cached value without loading, or ``default``."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return default
+        return entry[1]
+
+    def set(self, key, value) -> None:
+        self._entries.pop(key, None)
+        if self.maxsize is not None and len(self._entries) >= self.maxsize:
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key) -> None:
+        self._entries.pop(key, None)
+        # A load already in flight may carry the old value: don't store it
+        self._loading.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._loading.clear()
+
+    async def get(self, key, loader):
+        """Return the cached value, calling ``await loader()`` on a miss."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] >= time.monotonic():
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load(key, loader))
+            self._loading[key] = loading
+        # Shielded: one cancelled caller must not cancel the others' lookup
+        return await asyncio.shield(loading)
+
+    async def _load(self, key, loader):
+        task = asyncio.current_task()
+        try:
+            value = await loader()
+        finally:
+            # Invalidated while loading: the result may be stale, don't keep it
+            current = self._loading.get(key) is task
+            if current:
+                del self._loading[key]
+        if current:
+            self.set(key, value)
+        return value
+
+
+__all__ = ["TTLCache"]
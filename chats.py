@@ -0,0 +1,53 @@
+from cache import TTLCache
+from config import CHAT_CACHE_TTL, CHAT_CACHE_SIZE
+from core import bot
+
+
+class ChatMetadata:
+    """The bot's own user, the type/title of chats and users' display names.
+
+    The bot user is resolved once at startup. Chat entries are refreshed
+    for free from every update that carries the chat, so ``get_chat`` is
+    only called for a chat nobody has written in for CHAT_CACHE_TTL.
+    """
+
+    def __init__(self, ttl: float = CHAT_CACHE_TTL, maxsize: int = CHAT_CACHE_SIZE):
+        self.me = None
+        self._chats = TTLCache(ttl, maxsize)
+        self._names = TTLCache(ttl, maxsize)
+
+    async def get_me(self):
+        if self.me is None:
+            self.me = await bot.me()
+        return self.me
+
+    def remember(self, chat) -> None:
+        """Refresh the chat's entry from an update payload."""
+        self._chats.set(chat.id, (chat.type, chat.title))
+
+    async def _fetch(self, chat_id: int) -> tuple:
+        chat = await bot.get_chat(chat_id)
+        return chat.type, chat.title
+
+    async def get(self, chat_id: int) -> tuple:
+        """Return (type, title) of the chat."""
+        return await self._chats.get(chat_id, lambda: self._fetch(chat_id))
+
+    async def chat_type(self, chat_id: int):
+        return (await self.get(chat_id))[0]
+
+    def remember_user(self, user) -> None:
+        self._names.set(user.id, user.full_name or user.username or f"User {user.id}")
+
+    async def _fetch_name(self, chat_id: int, user_id: int) -> str:
+        member = await bot.get_chat_member(chat_id, user_id)
+        return member.user.full_name or member.user.username or f"User {user_id}"
+
+    async def display_name(self, chat_id: int, user_id: int) -> str:
+        """Name of a user, looked up as a member of ``chat_id`` on a miss."""
+        return await self._names.get(user_id, lambda: self._fetch_name(chat_id, user_id))
+
+
+chat_metadata = ChatMetadata()
+
+__all__ = ["ChatMetadata", "chat_metadata"]
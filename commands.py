@@ -1,3 +1,4 @@
+import html
 from datetime import datetime
 from aiogram import F
 from aiogram.enums import ChatType
@@ -7,8 +8,15 @@ from aiogram.types.input_file import FSInputFile
 from aiogram import Router
 
 from core import bot, logger
-from database import get_blocked_users, add_blocked_user
+from async_db import get_blocked_users, count_blocked_users, add_blocked_user, add_group_word, remove_group_word, get_group_words
 from moderation import moderation_bot
+from chats import chat_metadata
+from outbound import ACTION, NOTICE, outbound
+from fanout import fan_out
+from deleter import message_deleter
+from flood import RESPONSES, flood_detector
+from pipeline import chat_pipeline
+from config import BLOCKED_USERS_PAGE_SIZE
 
 router = Router()
 
@@ -24,23 +32,32 @@ async def handle_admins_command(message: Message):
     if not admins:
         await message.reply("Guruhda adminlar topilmadi!")
         return
-    for admin_id in admins:
-        try:
-            await bot.send_message(
-                chat_id=admin_id,
-                text=(
-                    "🔔 <b>Ogohlantirish!</b>\n\n"
-                    f"Guruh: <b>{message.chat.title}</b>\n"
-                    f"Foydalanuvchi: <a href='tg://user?id={user_id}'>{message.from_user.full_name or message.from_user.username}</a>\n"
-                    f"Vaqt: {datetime.now().strftime('%H:%M:%S')}\n\n"
-                    f"Sizni guruhda belgilashdi!"
-                ),
-            )
-        except Exception as e:
-            logger.error(f"Failed to send admin notification: {e}")
+    text = (
+        "🔔 <b>Ogohlantirish!</b>\n\n"
+        f"Guruh: <b>{message.chat.title}</b>\n"
+        f"Foydalanuvchi: <a href='tg://user?id={user_id}'>{message.from_user.full_name or message.from_user.username}</a>\n"
+        f"Vaqt: {datetime.now().strftime('%H:%M:%S')}\n\n"
+        f"Sizni guruhda belgilashdi!"
+    )
+    _, errors = await fan_out(
+        admins, lambda admin_id: outbound.call(NOTICE, admin_id, bot.send_message, chat_id=admin_id, text=text)
+    )
+    for admin_id, e in errors:
+        logger.error(f"Failed to send admin notification to {admin_id}: {e}")
     await message.reply("✅ Barcha adminlarga ogohlantirish yuborildi!")
 
 
+def _blocked_user_entry(user_id: int, user_name: str | None, reason: str, blocked_at) -> str:
+    if user_name:
+        entry = f"👤 <a href='tg://user?id={user_id}'>{user_name}</a>\n"
+    else:
+        entry = f"👤 User {user_id}\n"
+    reason = reason or "Ko'rsatilmagan"
+    entry += f"   🚫 Sabab: {reason}\n"
+    entry += f"   📅 Vaqt: {blocked_at}\n\n"
+    return entry
+
+
 @router.message(Command(commands=["blocklists", "blocked_users"]))
 async def handle_blocklists_command(message: Message):
     chat_id = message.chat.id
@@ -48,25 +65,27 @@ async def handle_blocklists_command(message: Message):
     if not await moderation_bot.is_admin(chat_id, user_id):
         await message.reply("❌ Siz bu xizmatdan foydalana olmaysiz!")
         return
-    blocked_users = get_blocked_users(chat_id)
-    if not blocked_users:
+    total = await count_blocked_users(chat_id)
+    if not total:
         await message.reply("📋 Guruhda blocklangan foydalanuvchilar yo'q!")
         return
+    # /blocklists [sahifa]
+    parts = (message.text or "").split()
+    page = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 1
+    pages = -(-total // BLOCKED_USERS_PAGE_SIZE)
+    page = min(max(page, 1), pages)
+    blocked_users = await get_blocked_users(chat_id, BLOCKED_USERS_PAGE_SIZE, (page - 1) * BLOCKED_USERS_PAGE_SIZE)
+    # Names resolved concurrently and cached; a failed lookup shows the bare id
+    names, _ = await fan_out(blocked_users, lambda row: chat_metadata.display_name(chat_id, row[0]))
     text = f"📋 <b>Blocklangan foydalanuvchilar ro'yxati</b>\n"
-    text += f"Guruh: <b>{message.chat.title}</b>\n\n"
-    for user_id_blocked, blocked_by, reason, blocked_at in blocked_users:
-        try:
-            user_info = await bot.get_chat_member(chat_id, user_id_blocked)
-            user_name = user_info.user.full_name or user_info.user.username or f"User {user_id_blocked}"
-            text += f"👤 <a href='tg://user?id={user_id_blocked}'>{user_name}</a>\n"
-            text += f"   🚫 Sabab: {reason or 'Ko\'rsatilmagan'}\n"
-            text += f"   📅 Vaqt: {blocked_at}\n\n"
-        except:
-            text += f"👤 User {user_id_blocked}\n"
-            text += f"   🚫 Sabab: {reason or 'Ko\'rsatilmagan'}\n"
-            text += f"   📅 Vaqt: {blocked_at}\n\n"
+    text += f"Guruh: <b>{message.chat.title}</b>\n"
+    text += f"Sahifa: {page}/{pages} (jami {total} ta)\n\n"
+    for (user_id_blocked, blocked_by, reason, blocked_at), user_name in zip(blocked_users, names):
+        text += _blocked_user_entry(user_id_blocked, user_name, reason, blocked_at)
+    if page < pages:
+        text += f"Keyingi sahifa: /blocklists {page + 1}"
     try:
-        await bot.send_message(chat_id=user_id, text=text)
+        await outbound.call(NOTICE, user_id, bot.send_message, chat_id=user_id, text=text)
         await message.reply("✅ Blocklanganlar ro'yxati shaxsiy xabarga yuborildi!")
     except Exception:
         await message.reply("❌ Shaxsiy xabar yuborishda xatolik!")
@@ -85,6 +104,7 @@ async def handle_ban_command(message: Message):
     target_user_name = None
     if message.reply_to_message:
         target_user_id = message.reply_to_message.from_user.id
+        chat_metadata.remember_user(message.reply_to_message.from_user)
         target_user_name = (
             message.reply_to_message.from_user.full_name
             or message.reply_to_message.from_user.username
@@ -97,6 +117,7 @@ async def handle_ban_command(message: Message):
                 for ent in message.entities:
                     if ent.type == "text_mention" and getattr(ent, "user", None):
                         target_user_id = ent.user.id
+                        chat_metadata.remember_user(ent.user)
                         target_user_name = ent.user.full_name or ent.user.username or f"User {target_user_id}"
                         break
         except Exception:
@@ -117,7 +138,7 @@ async def handle_ban_command(message: Message):
     if target_user_id == user_id:
         await message.reply("❌ O'zingizni ban qila olmaysiz!")
         return
-    if target_user_id == (await bot.me()).id:
+    if target_user_id == (await chat_metadata.get_me()).id:
         await message.reply("❌ Botni ban qila olmaysiz!")
         return
     try:
@@ -135,8 +156,9 @@ async def handle_ban_command(message: Message):
             await message.reply("❌ Foydalanuvchi topilmadi!")
             return
         logger.info("/ban executing ban for target=%s in chat=%s", target_user_id, chat_id)
-        await bot.ban_chat_member(chat_id=chat_id, user_id=target_user_id)
-        add_blocked_user(target_user_id, chat_id, user_id, "Admin tomonidan ban qilindi")
+        await outbound.call(ACTION, chat_id, bot.ban_chat_member, chat_id=chat_id, user_id=target_user_id)
+        message_deleter.purge_user(chat_id, target_user_id)
+        await add_blocked_user(target_user_id, chat_id, user_id, "Admin tomonidan ban qilindi")
         await message.reply(f"✅ <a href='tg://user?id={target_user_id}'>{target_user_name}</a> guruhdan chiqarildi!")
     except Exception as e:
         logger.error(f"Ban error: {e}")
@@ -159,7 +181,7 @@ async def handle_warn_command(message: Message):
     target_user_id = message.reply_to_message.from_user.id
     target_user_name = message.reply_to_message.from_user.full_name or message.reply_to_message.from_user.username or f"User {target_user_id}"
     try:
-        await message.reply_to_message.delete()
+        await outbound.call(ACTION, chat_id, message.reply_to_message.delete)
         await message.reply(f"⚠️ <a href='tg://user?id={target_user_id}'>{target_user_name}</a> ogohlantirildi!\n\nBunday habar yozish mumkin emas!")
     except Exception:
         await message.reply("❌ Ogohlantirishda xatolik!")
@@ -180,7 +202,7 @@ async def handle_captcha_command(message: Message):
         return
     target_user_id = message.reply_to_message.from_user.id
     target_user_name = message.reply_to_message.from_user.full_name or message.reply_to_message.from_user.username or f"User {target_user_id}"
-    if target_user_id == (await bot.me()).id:
+    if target_user_id == (await chat_metadata.get_me()).id:
         await message.reply("❌ Botga CAPTCHA yuborib bo'lmaydi!")
         return
     if target_user_id == user_id:
@@ -229,17 +251,120 @@ async def handle_admin_notification(message: Message):
     )
     if not link:
         text += "\nℹ️ Guruhda xabar topildi, lekin to'g'ridan-to'g'ri link mavjud emas."
-    ok = 0
-    for admin_id in admins:
-        try:
-            await bot.send_message(chat_id=admin_id, text=text, reply_markup=kb)
-            ok += 1
-        except Exception as e:
-            logger.warning(f"Admin DM failed for {admin_id}: {e}")
-            continue
+    _, errors = await fan_out(
+        admins, lambda admin_id: outbound.call(NOTICE, admin_id, bot.send_message, chat_id=admin_id, text=text, reply_markup=kb)
+    )
+    for admin_id, e in errors:
+        logger.warning(f"Admin DM failed for {admin_id}: {e}")
+    ok = len(admins) - len(errors)
     await message.reply("✅ Adminlarga xabar yuborildi!" if ok else "❌ Hech bir adminga xabar yuborilmadi.")
 
 
+async def _group_word_command(message: Message, kind: str):
+    chat_id = message.chat.id
+    user_id = message.from_user.id
+    if message.chat.type not in [ChatType.GROUP, ChatType.SUPERGROUP]:
+        await message.reply("Bu command faqat guruhlarda ishlaydi!")
+        return
+    if not await moderation_bot.is_admin(chat_id, user_id):
+        await message.reply("❌ Siz bu xizmatdan foydalana olmaysiz!")
+        return
+    parts = (message.text or "").strip().split(maxsplit=1)
+    word = parts[1].strip().lower() if len(parts) > 1 else ""
+    if not word:
+        await message.reply(f"❌ So'zni yozing: {parts[0] if parts else '/addword'} <so'z>")
+        return
+    # Bitta so'z bir vaqtda ham qo'shilgan, ham istisno bo'lmasligi kerak
+    await remove_group_word(chat_id, word)
+    await add_group_word(chat_id, word, kind, user_id)
+    moderation_bot.reload_group_words(chat_id)
+    if kind == "add":
+        await message.reply(f"✅ <code>{html.escape(word)}</code> guruh uchun taqiqlangan so'zlarga qo'shildi.")
+    else:
+        await message.reply(f"✅ <code>{html.escape(word)}</code> guruhda ruxsat etildi.")
+
+
+@router.message(Command("addword"))
+async def handle_addword_command(message: Message):
+    await _group_word_command(message, "add")
+
+
+@router.message(Command("allowword"))
+async def handle_allowword_command(message: Message):
+    await _group_word_command(message, "exempt")
+
+
+@router.message(Command("delword"))
+async def handle_delword_command(message: Message):
+    chat_id = message.chat.id
+    user_id = message.from_user.id
+    if message.chat.type not in [ChatType.GROUP, ChatType.SUPERGROUP]:
+        await message.reply("Bu command faqat guruhlarda ishlaydi!")
+        return
+    if not await moderation_bot.is_admin(chat_id, user_id):
+        await message.reply("❌ Siz bu xizmatdan foydalana olmaysiz!")
+        return
+    parts = (message.text or "").strip().split(maxsplit=1)
+    word = parts[1].strip().lower() if len(parts) > 1 else ""
+    if not word:
+        await message.reply("❌ So'zni yozing: /delword <so'z>")
+        return
+    if await remove_group_word(chat_id, word):
+        moderation_bot.reload_group_words(chat_id)
+        await message.reply(f"✅ <code>{html.escape(word)}</code> guruh ro'yxatidan o'chirildi.")
+    else:
+        await message.reply(f"❌ <code>{html.escape(word)}</code> guruh ro'yxatida yo'q.")
+
+
+@router.message(Command("words"))
+async def handle_words_command(message: Message):
+    chat_id = message.chat.id
+    user_id = message.from_user.id
+    if message.chat.type not in [ChatType.GROUP, ChatType.SUPERGROUP]:
+        await message.reply("Bu command faqat guruhlarda ishlaydi!")
+        return
+    if not await moderation_bot.is_admin(chat_id, user_id):
+        await message.reply("❌ Siz bu xizmatdan foydalana olmaysiz!")
+        return
+    additions, exemptions = await get_group_words(chat_id)
+    if not additions and not exemptions:
+        await message.reply("📋 Guruhda faqat umumiy so'zlar ro'yxati ishlatiladi.")
+        return
+    text = "📋 <b>Guruh so'zlari</b>\n\n"
+    if additions:
+        text += "🚫 Qo'shilgan: " + ", ".join(f"<code>{html.escape(w)}</code>" for w in additions) + "\n"
+    if exemptions:
+        text += "✅ Ruxsat etilgan: " + ", ".join(f"<code>{html.escape(w)}</code>" for w in exemptions) + "\n"
+    await message.reply(text)
+
+
+@router.message(Command("flood"))
+async def handle_flood_command(message: Message):
+    chat_id = message.chat.id
+    user_id = message.from_user.id
+    if message.chat.type not in [ChatType.GROUP, ChatType.SUPERGROUP]:
+        await message.reply("Bu command faqat guruhlarda ishlaydi!")
+        return
+    if not await moderation_bot.is_admin(chat_id, user_id):
+        await message.reply("❌ Siz bu xizmatdan foydalana olmaysiz!")
+        return
+    parts = (message.text or "").strip().split(maxsplit=1)
+    if len(parts) == 1:
+        await message.reply(
+            f"🌊 Floodga javob: <code>{moderation_bot.flood_response(chat_id)}</code>\n\n"
+            "/flood off - tekshirilmaydi\n"
+            "/flood delete - faqat o'chiriladi\n"
+            "/flood mute - o'chiriladi, takror yuborganlar cheklanadi"
+        )
+        return
+    response = parts[1].strip().lower()
+    if response not in RESPONSES:
+        await message.reply("❌ Faqat: /flood off, /flood delete yoki /flood mute")
+        return
+    await moderation_bot.set_flood_response(chat_id, response)
+    await message.reply(f"✅ Floodga javob: <code>{response}</code>")
+
+
 @router.message(Command("logs"))
 async def handle_logs_command(message: Message):
     """Admin-only: send the rotating log file as a document."""
@@ -252,7 +377,7 @@ async def handle_logs_command(message: Message):
         from logs import LOG_FILE_PATH
         file = FSInputFile(LOG_FILE_PATH)
         # Prefer sending to the admin privately
-        await bot.send_document(user_id, file, caption="📄 Bot logs")
+        await outbound.call(NOTICE, user_id, bot.send_document, chat_id=user_id, document=file, caption="📄 Bot logs")
         await message.reply("✅ Log fayli shaxsiy xabarga yuborildi!")
     except Exception as e:
         await message.reply(f"❌ Log yuborishda xatolik: {e}")
@@ -265,7 +390,7 @@ async def handle_diag_command(message: Message):
         await message.reply("Bu command faqat guruhda ishlaydi!")
         return
     try:
-        me = await bot.me()
+        me = await chat_metadata.get_me()
         member = await bot.get_chat_member(chat_id=chat.id, user_id=me.id)
         status = getattr(member, 'status', None)
         status_value = status.value if hasattr(status, 'value') else str(status)
@@ -282,6 +407,18 @@ async def handle_diag_command(message: Message):
         text = "🧪 Bot diag\n\n" + "\n".join(
             f"- {k}: <code>{v}</code>" for k, v in fields
         )
+        text += "\n\n📤 Navbat:\n" + "\n".join(
+            f"- {k}: <code>{v}</code>" for k, v in outbound.stats().items()
+        )
+        text += "\n\n📥 Yangilanishlar:\n" + "\n".join(
+            f"- {k}: <code>{v}</code>" for k, v in chat_pipeline.stats().items()
+        )
+        text += "\n\n🔎 Prefilter:\n" + "\n".join(
+            f"- {k}: <code>{v}</code>" for k, v in moderation_bot.prefilter_stats().items()
+        )
+        text += "\n\n🌊 Flood:\n" + "\n".join(
+            f"- {k}: <code>{v}</code>" for k, v in flood_detector.stats().items()
+        )
         await message.reply(text)
     except Exception as e:
         logger.error(f"Diag error: {e}")
@@ -1,5 +1,37 @@
 BOT_TOKEN = "8077819092:AAESe5YrG6R_y0jZ2uZuBaTxyebdDz10oxA"
 
+# Yangilanishlarni olish usuli: "polling" yoki "webhook".
+# Webhook rejimida bot aiohttp server ochadi; WEBHOOK_URL - tashqi https manzil
+# (bo'sh bo'lsa webhook Telegram da o'rnatilmaydi, masalan proxy orqali o'rnatilgan bo'lsa)
+BOT_MODE = "polling"
+WEBHOOK_URL = ""
+WEBHOOK_PATH = "/webhook"
+# Telegram har bir yangilanish bilan yuboradigan maxfiy token. Bo'sh bo'lsa va
+# WEBHOOK_URL berilgan bo'lsa, har ishga tushganda tasodifiy token yaratiladi;
+# WEBHOOK_URL ham bo'sh bo'lsa webhook rejimi ishga tushmaydi
+WEBHOOK_SECRET = ""
+WEBHOOK_HOST = "0.0.0.0"
+WEBHOOK_PORT = 8080
+# Bir vaqtda ishlanayotgan yangilanishlar chegarasi; undan oshsa Telegram keyinroq qayta yuboradi
+WEBHOOK_MAX_INFLIGHT = 1000
+# To'xtashda ishlanayotgan yangilanishlar tugashi uchun kutiladigan vaqt (soniya)
+WEBHOOK_DRAIN_TIMEOUT = 30
+
+# Worker jarayonlari soni. 1 dan katta bo'lsa asosiy jarayon faqat yangilanishlarni
+# oladi (BOT_MODE bo'yicha) va ularni chat_id bo'yicha workerlarga taqsimlaydi;
+# har bir guruh doim bitta workerda ishlanadi
+WORKERS = 1
+# Har bir worker uchun hali yetkazilmagan yangilanishlar chegarasi
+WORKER_QUEUE_SIZE = 10000
+# To'xtashda navbatdagi yangilanishlarni workerlarga yetkazish uchun kutiladigan vaqt (soniya)
+WORKER_DRAIN_TIMEOUT = 30
+
+# Bir chat yangilanishlari navbat bilan, turli chatlar parallel ishlanadi:
+# bir vaqtda ishlanayotgan chatlar soni
+UPDATE_WORKERS = 64
+# Har bir chat navbati chegarasi; to'lsa eng eski oddiy xabar tashlanadi
+CHAT_QUEUE_SIZE = 200
+
 FORBIDDEN_WORDS = [
     "Ahmoq","Am","Amcha","Befarosat","Blyat","Buvini ami","Cho'choq","Dalban","Dalbayob",
     "Dalbayop","Dnx","Dovdir","Ey qetoq","Foxisha","Fuck","Fuck you","Gandon","Gotalak",
@@ -28,8 +60,104 @@ FORBIDDEN_WORDS = [
     'skivarding','qotakm','qotogm','qotak','qotogm','soska','itdan bogan','apanngi skin','ananggi skin','ananggi ommi'
 ]
 
+# Shu so'zlar qo'shimcha bilan ham topiladi ("ahmoqsan", "gandonlarni"), qolganlari faqat o'zi:
+# "bich", "jala", "yetim" kabi so'zlar qo'shimcha bilan oddiy so'zga aylanadi ("bichim", "jalalar")
+INFLECTED_WORDS = [
+    "ahmoq", "axmoq", "befarosat", "dalban", "dalbayob", "dalbayop", "dovdir", "foxisha", "gandon",
+    "gnida", "gotalak", "hunasa", "isqirt", "jalab", "jalap", "jallab", "jallap", "kispurush",
+    "manjalaqi", "maraz", "pasholak", "pidaras", "pidaraz", "qanchiq", "qanciq", "qanjiq",
+    "qotoq", "qo'toq", "qotaq", "qutoq", "qotoqbosh", "suchka", "tashshoq", "yeblan", "xuyesos",
+]
+
 PUNISHMENT_DURATIONS = [60, 300, 1800, 3600] 
 
+# Qoida buzishlar sanaladigan sirpanuvchi oyna va ularni database ga yozish oralig'i
+VIOLATION_WINDOW_SECONDS = 24 * 60 * 60
+VIOLATION_FLUSH_INTERVAL_MS = 500
+
+# Normallashtirilgan matnlar keshi (takroriy xabarlar uchun)
+NORMALIZE_CACHE_SIZE = 4096
+
+# Ko'p xabarni birga tekshirish: shundan katta paketlar alohida jarayonlarda.
+# Bir paketda UPDATE_WORKERS tadan ko'p matn bo'lmaydi, shuning uchun undan kichik bo'lishi kerak
+BATCH_PROCESS_POOL_THRESHOLD = 32
+BATCH_PROCESS_POOL_WORKERS = 2
+
+# Database o'qish oqimlari soni (yozuvlar bitta alohida oqimda)
+DB_READER_THREADS = 4
+
+# Kechiktirilgan amallar bir martada shuncha-shunchadan bajariladi
+SCHEDULER_BATCH_SIZE = 100
+# Kirgan foydalanuvchi CAPTCHA ni shu vaqt ichida tasdiqlashi kerak (soniya)
+CAPTCHA_TIMEOUT = 1800
+# Guruh adminlari ro'yxati shuncha vaqt eslab qolinadi (soniya);
+# admin tayinlanganda yoki olib tashlanganda darhol yangilanadi
+ADMIN_CACHE_TTL = 300
+# Chat turi va nomi keshi: yozilmagan chat shuncha vaqtdan keyin qayta so'raladi
+CHAT_CACHE_TTL = 60 * 60
+CHAT_CACHE_SIZE = 10000
+
+# Telegram ga chiquvchi so'rovlar navbati (Telegram cheklovlari bo'yicha):
+# umumiy - soniyasiga 30 ta, guruhga - daqiqasiga 20 ta, foydalanuvchiga - soniyasiga 1 ta xabar
+OUTBOUND_GLOBAL_RATE = 30
+OUTBOUND_GROUP_RATE = 20 / 60
+OUTBOUND_GROUP_BURST = 5
+OUTBOUND_PRIVATE_RATE = 1
+OUTBOUND_PRIVATE_BURST = 3
+# Navbat to'lsa: o'chirish/ban kutadi, xabar rad etiladi
+OUTBOUND_QUEUE_SIZE = 1000
+OUTBOUND_CONCURRENCY = 16
+OUTBOUND_MAX_RETRIES = 5
+# To'xtashda navbatdagi so'rovlarni yuborish uchun beriladigan vaqt (soniya)
+OUTBOUND_DRAIN_TIMEOUT = 10
+
+# Ko'p adminga xabar yuborish kabi ishlarda bir vaqtda bajariladigan so'rovlar soni
+FAN_OUT_CONCURRENCY = 10
+# Blocklanganlar ro'yxatining bir sahifasidagi foydalanuvchilar soni
+BLOCKED_USERS_PAGE_SIZE = 20
+
+# Hujum paytida guruh xabarnomalari bitta umumiy xabarga yig'iladi:
+# DIGEST_RATE_WINDOW soniyada DIGEST_THRESHOLD tadan ko'p qoida buzilsa,
+# ular DIGEST_FLUSH_DELAY soniya to'planib, bitta xabar yuboriladi va keyin o'sha xabar tahrirlanadi.
+# DIGEST_IDLE_TIMEOUT soniya jimlikdan keyin yana odatiy xabarnomalar yuboriladi
+DIGEST_THRESHOLD = 5
+DIGEST_RATE_WINDOW = 30
+DIGEST_FLUSH_DELAY = 3
+DIGEST_IDLE_TIMEOUT = 120
+DIGEST_MAX_LINES = 30
+
+# O'chiriladigan xabarlar shuncha soniya yig'ilib, bitta deleteMessages (100 tagacha) bilan o'chiriladi
+DELETE_BATCH_WINDOW = 0.5
+# Ban qilinganda o'chirish uchun har bir foydalanuvchining oxirgi xabarlari eslab qolinadi
+RECENT_MESSAGES_PER_USER = 50
+RECENT_MESSAGES_USERS = 20000
+
+# Bir xil (yoki deyarli bir xil) matn FLOOD_WINDOW_SECONDS soniya ichida FLOOD_THRESHOLD marta
+# yuborilsa va bu hujumga o'xshasa, flood hisoblanadi. Hujum belgisi: shu nusxalardan kamida
+# FLOOD_THRESHOLD tasi matnni FLOOD_REPEATS marta yuborgan yoki guruhga FLOOD_NEW_MEMBER_SECONDS
+# soniya ichida qo'shilgan foydalanuvchilardan bo'lsa, yoki matnni FLOOD_RAID_USERS ta turli
+# foydalanuvchi yuborgan bo'lsa. Ko'p odamning bir xil salomi yoki tabrigi flood emas.
+# Flood nusxalari o'chiriladi; nusxasi o'chirilgandan keyin yana yuborgan foydalanuvchi
+# FLOOD_MUTE_DURATION soniyaga yozishdan cheklanadi (oddiy guruhlarda cheklab bo'lmaydi,
+# u yerda faqat o'chiriladi, ban qilinmaydi). Har bir guruhda oxirgi FLOOD_WINDOW_SIZE ta xabar eslab qolinadi
+FLOOD_WINDOW_SECONDS = 60
+FLOOD_THRESHOLD = 5
+FLOOD_REPEATS = 2
+FLOOD_NEW_MEMBER_SECONDS = 600
+FLOOD_RAID_USERS = 20
+FLOOD_MUTE_DURATION = 3600
+# Floodga javob (guruh adminlari /flood bilan o'zgartiradi): "off" - tekshirilmaydi,
+# "delete" - faqat o'chiriladi, "mute" - o'chiriladi va takrorlaganlar cheklanadi
+FLOOD_RESPONSE = "mute"
+FLOOD_WINDOW_SIZE = 100
+# Ikki matn qanchalik o'xshash bo'lsa bitta hisoblanadi (0..1, MinHash bo'yicha)
+FLOOD_SIMILARITY = 0.7
+# Bundan qisqa xabarlar ("salom", "ok") floodga hisoblanmaydi
+FLOOD_MIN_LENGTH = 12
+# Tekshirilgan matnlar natijasi (barcha guruhlar uchun umumiy) eslab qolinadi, takror matn qayta tekshirilmaydi
+FLOOD_VERDICT_CACHE_SIZE = 4096
+FLOOD_CHATS = 10000
+
 
 BLOCKED_MESSAGE_TEMPLATE = (
     "❗️ Siz {count}-marta qoida buzdingiz.\n"
@@ -44,6 +172,24 @@ GROUP_NOTIFICATION_TEMPLATE = (
     "🕐 Qachongacha: {until_time}"
 )
 
+GROUP_DIGEST_TEMPLATE = (
+    "🚨 <b>Guruhda ko'p qoida buzilmoqda!</b>\n"
+    "👥 {users_count} ta foydalanuvchi, {violations_count} ta qoida buzish\n\n"
+    "{lines}"
+)
+
+GROUP_DIGEST_LINE_TEMPLATE = (
+    "❗️ <a href='tg://user?id={user_id}'>{user_name}</a> — {count} marta "
+    "(24 soatda: {daily_count}, jami: {total_count})"
+)
+
+FLOOD_NOTIFICATION_TEMPLATE = (
+    "🚫 <b>Guruhda flood aniqlandi!</b>\n"
+    "🗑 {messages_count} ta bir xil xabar o'chirildi"
+)
+
+FLOOD_MUTE_WARNING_TEMPLATE = "\n🔇 Yana yuborganlar {duration} ga yozishdan cheklanadi"
+
 def format_duration(seconds):
     if seconds < 60:
         return f"{seconds} soniya"
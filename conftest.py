@@ -0,0 +1,3 @@
+# The bot's modules live in the repository root and import each other by
+# plain name ("from config import ..."); this puts the root on sys.path
+# for plain ``pytest`` too, not only ``python -m pytest``
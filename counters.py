@@ -0,0 +1,157 @@
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from async_db import clear_violations_db, flush_violations, get_violation_state, load_recent_violations
+from config import VIOLATION_WINDOW_SECONDS, VIOLATION_FLUSH_INTERVAL_MS
+from core import logger
+from shards import current_shard
+
+
+def _format_ts(ts: float) -> str:
+    # Same shape as SQLite CURRENT_TIMESTAMP (UTC)
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class ViolationCounters:
+    """Violation counters per (chat_id, user_id), kept in memory.
+
+    ``daily`` is a true sliding window: the number of violations in the last
+    VIOLATION_WINDOW_SECONDS, from the timestamps themselves. Punishment
+    decisions read from here; a background task writes the changes to
+    SQLite in one batched transaction every VIOLATION_FLUSH_INTERVAL_MS and
+    once more on shutdown. Users with recent violations are loaded at
+    startup, anyone else on their first violation.
+    """
+
+    def __init__(self, window: float = VIOLATION_WINDOW_SECONDS, flush_interval: float = VIOLATION_FLUSH_INTERVAL_MS / 1000):
+        self.window = window
+        self.flush_interval = flush_interval
+        self._totals = {}
+        self._recent = {}
+        self._pending = {}
+        self._loading = {}
+        self._flusher = None
+        self._last_evict = 0.0
+
+    def _trim(self, key: tuple, now: float) -> deque:
+        recent = self._recent[key]
+        cutoff = now - self.window
+        while recent and recent[0] < cutoff:
+            recent.popleft()
+        return recent
+
+    async def _ensure_loaded(self, key: tuple) -> None:
+        if key in self._totals:
+            return
+        loading = self._loading.get(key)
+        if loading is None:
+            chat_id, user_id = key
+            loading = asyncio.ensure_future(get_violation_state(user_id, chat_id, time.time() - self.window))
+            self._loading[key] = loading
+        try:
+            total, timestamps = await loading
+        finally:
+            self._loading.pop(key, None)
+        if key not in self._totals:
+            self._totals[key] = total
+            self._recent[key] = deque(timestamps)
+
+    async def record(self, chat_id: int, user_id: int) -> tuple:
+        """Count one violation now; return (total, daily, last_violation)."""
+        key = (chat_id, user_id)
+        await self._ensure_loaded(key)
+        now = time.time()
+        self._totals[key] += 1
+        self._recent[key].append(now)
+        self._pending.setdefault(key, []).append(now)
+        return self._totals[key], len(self._trim(key, now)), _format_ts(now)
+
+    async def get(self, chat_id: int, user_id: int) -> tuple:
+        key = (chat_id, user_id)
+        await self._ensure_loaded(key)
+        recent = self._trim(key, time.time())
+        return self._totals[key], len(recent), (_format_ts(recent[-1]) if recent else None)
+
+    async def clear(self, chat_id: int, user_id: int) -> None:
+        key = (chat_id, user_id)
+        self._totals[key] = 0
+        self._recent[key] = deque()
+        self._pending.pop(key, None)
+        # Queued on the writer thread after any flush already submitted
+        await clear_violations_db(user_id, chat_id)
+
+    async def load(self) -> None:
+        """Rebuild the windows of everyone with a violation in the last window."""
+        totals, events = await load_recent_violations(time.time() - self.window)
+        for chat_id, user_id, created_at in events:
+            if not current_shard.owns(chat_id):
+                continue
+            key = (chat_id, user_id)
+            if key not in self._totals:
+                self._totals[key] = totals.get(key, 0)
+                self._recent[key] = deque()
+            self._recent[key].append(created_at)
+        logger.info(f"Qoida buzish hisoblagichlari tiklandi: {len(self._recent)} ta foydalanuvchi")
+
+    async def flush(self) -> None:
+        if not self._pending:
+            self._evict(time.time())
+            return
+        pending, self._pending = self._pending, {}
+        now = time.time()
+        rows = []
+        events = []
+        for (chat_id, user_id), timestamps in pending.items():
+            recent = self._trim((chat_id, user_id), now)
+            # The window starts at its oldest violation: daily_count counts from there
+            rows.append((
+                chat_id, user_id, len(timestamps), len(recent),
+                _format_ts(timestamps[-1]), _format_ts(recent[0] if recent else now),
+            ))
+            events.extend((chat_id, user_id, ts) for ts in timestamps)
+        try:
+            await flush_violations(rows, events, now - self.window)
+        except Exception as e:
+            logger.error(f"Failed to flush violation counters: {e}")
+            # Put them back in front of anything recorded meanwhile
+            for key, timestamps in pending.items():
+                self._pending[key] = timestamps + self._pending.get(key, [])
+            return
+        self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        # Forget users whose window is empty and who have nothing unflushed;
+        # memory then stays proportional to recently active violators
+        if now - self._last_evict < 60:
+            return
+        self._last_evict = now
+        for key in [k for k in self._recent if k not in self._pending and k not in self._loading]:
+            if not self._trim(key, now):
+                del self._recent[key]
+                del self._totals[key]
+
+    async def _run_flusher(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run_flusher())
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+
+violation_counters = ViolationCounters()
+
+__all__ = ["ViolationCounters", "violation_counters"]
@@ -1,39 +1,101 @@
 import sqlite3
-import os
-import re
-from datetime import datetime, timedelta
+import threading
+from contextlib import contextmanager
 
-# Bitta database faylida har bir guruh uchun alohida table
+# Barcha guruhlar uchun bitta database fayli
 DB_PATH = "violations.db"
 
-def sanitize_table_name(name: str) -> str:
-    """Guruh nomini SQL table nomi uchun xavfsiz qiladi"""
-    # Faqat harflar, raqamlar va pastki chiziq qoldirish
-    name = re.sub(r'[^a-zA-Z0-9_]', '_', name)
-    # Raqam bilan boshlanmasligi kerak
-    if name and name[0].isdigit():
-        name = f"group_{name}"
-    # Bo'sh bo'lmasligi kerak
-    if not name:
-        name = "unknown_group"
-    return name[:50]  # Uzunlikni cheklash
+# Har bir oqim (thread) uchun bitta doimiy ulanish
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
 
-def init_db():
-    """Asosiy database faylini yaratadi"""
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
-    c = conn.cursor()
+def get_connection() -> sqlite3.Connection:
+    """Joriy oqimning doimiy ulanishini qaytaradi (kerak bo'lsa ochadi).
+
+    Ulanish WAL rejimida, sozlangan pragmalar bilan ochiladi va yopilmaydi:
+    har bir so'rov uchun yangi ulanish ochish o'rniga shu ulanish va uning
+    tayyorlangan (prepared) so'rovlar keshi qayta ishlatiladi.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=30.0, cached_statements=256, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-16000")  # ~16 MB
+        conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA busy_timeout=30000")
+        _local.conn = conn
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+@contextmanager
+def transaction():
+    """Doimiy ulanishdan kursor beradi: muvaffaqiyatda commit, xatolikda rollback"""
+    conn = get_connection()
+    try:
+        yield conn.cursor()
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+def close_connections():
+    """Barcha ochiq ulanishlarni yopadi (bot to'xtaganda)"""
+    with _connections_lock:
+        connections, _connections[:] = list(_connections), []
+    for conn in connections:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    _local.__dict__.pop("conn", None)
+
+# Database sxemasi: table nomi -> uni va index larini yaratadigan so'rovlar.
+# init_db shularni yaratadi; migrate_group_tables bu nomdagi table larni
+# eski guruh table si deb ko'chirmaydi va o'chirmaydi
+SCHEMA = {
     # Guruhlar ro'yxatini saqlash uchun table
-    c.execute("""
+    # (table_name - eski, har bir guruh uchun alohida table tizimidan qolgan)
+    "groups": ("""
         CREATE TABLE IF NOT EXISTS groups (
             group_id INTEGER PRIMARY KEY,
             group_title TEXT,
             table_name TEXT,
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP
         )
-    """)
-    
+    """,),
+    # Barcha guruhlarning qoida buzishlari bitta table da
+    "violations": ("""
+        CREATE TABLE IF NOT EXISTS violations (
+            group_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            total_count INTEGER DEFAULT 0,
+            daily_count INTEGER DEFAULT 0,
+            last_violation DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_daily_reset DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (group_id, user_id)
+        ) WITHOUT ROWID
+    """,
+        # Foydalanuvchi bo'yicha (barcha guruhlarda) qidirish uchun
+        "CREATE INDEX IF NOT EXISTS idx_violations_user ON violations (user_id)",
+    ),
+    # Har bir qoida buzish vaqti (unix soniya) - 24 soatlik sirpanuvchi oyna uchun
+    "violation_events": ("""
+        CREATE TABLE IF NOT EXISTS violation_events (
+            group_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """,
+        "CREATE INDEX IF NOT EXISTS idx_violation_events_key ON violation_events (group_id, user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_violation_events_time ON violation_events (created_at)",
+    ),
     # CAPTCHA uchun table
-    c.execute("""
+    "captcha_users": ("""
         CREATE TABLE IF NOT EXISTS captcha_users (
             user_id INTEGER,
             group_id INTEGER,
@@ -41,10 +103,9 @@ def init_db():
             captcha_time DATETIME DEFAULT CURRENT_TIMESTAMP,
             PRIMARY KEY (user_id, group_id)
         )
-    """)
-    
+    """,),
     # Blocklangan foydalanuvchilar uchun table
-    c.execute("""
+    "blocked_users": ("""
         CREATE TABLE IF NOT EXISTS blocked_users (
             user_id INTEGER,
             group_id INTEGER,
@@ -53,212 +114,397 @@ def init_db():
             blocked_at DATETIME DEFAULT CURRENT_TIMESTAMP,
             PRIMARY KEY (user_id, group_id)
         )
-    """)
-    
-    conn.commit()
-    conn.close()
+    """,
+        "CREATE INDEX IF NOT EXISTS idx_blocked_users_group ON blocked_users (group_id, blocked_at)",
+    ),
+    # Guruhga xos so'zlar: qo'shimcha taqiqlanganlar ('add') va istisnolar ('exempt')
+    "group_words": ("""
+        CREATE TABLE IF NOT EXISTS group_words (
+            group_id INTEGER,
+            word TEXT,
+            kind TEXT,
+            added_by INTEGER,
+            added_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (group_id, word, kind)
+        )
+    """,),
+    # Guruh sozlamalari (/flood). Qatori yo'q guruhda config dagi qiymatlar ishlaydi
+    "group_settings": ("""
+        CREATE TABLE IF NOT EXISTS group_settings (
+            group_id INTEGER PRIMARY KEY,
+            flood_response TEXT
+        )
+    """,),
+    # Kechiktirilgan amallar (unban, CAPTCHA muddati, xabarni o'chirish).
+    # Qayta ishga tushganda yo'qolmasligi uchun database da saqlanadi
+    "scheduled_jobs": ("""
+        CREATE TABLE IF NOT EXISTS scheduled_jobs (
+            job_id INTEGER PRIMARY KEY,
+            due_at REAL NOT NULL,
+            kind TEXT NOT NULL,
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER,
+            message_id INTEGER
+        )
+    """,
+        "CREATE INDEX IF NOT EXISTS idx_scheduled_jobs_due ON scheduled_jobs (due_at)",
+        "CREATE INDEX IF NOT EXISTS idx_scheduled_jobs_target ON scheduled_jobs (kind, chat_id, user_id)",
+    ),
+}
+
+# SQLite table nomlarida katta-kichik harfni farqlamaydi
+_SCHEMA_NAMES = {name.lower() for name in SCHEMA}
+
+def init_db():
+    """Asosiy database faylini yaratadi"""
+    with transaction() as c:
+        set_aside_legacy_tables(c)
+        for statements in SCHEMA.values():
+            for statement in statements:
+                c.execute(statement)
+    migrate_group_tables()
+    seed_violation_events()
+
+def _is_legacy_table(c, table_name: str) -> bool:
+    """Eski tizimdagi bitta guruhning qoida buzishlar table simi (group_id ustunisiz)"""
+    c.execute(f'PRAGMA table_info("{table_name}")')
+    columns = {row[1] for row in c.fetchall()}
+    return {"user_id", "total_count", "daily_count"} <= columns and "group_id" not in columns
+
+def set_aside_legacy_tables(c):
+    """Nomi sxemadagi table bilan bir xil chiqqan eski guruh table larini legacy_<nom> ga o'tkazadi.
+
+    Guruh nomidan yasalgan "Violations" yoki "Group_Words" table si bo'lsa,
+    CREATE TABLE IF NOT EXISTS yangi table ni yaratmaydi va keyingi
+    so'rovlar buziladi. Shuning uchun bunday table lar sxema yaratilishidan
+    oldin boshqa nomga o'tkaziladi, keyin migrate_group_tables ularni
+    boshqalari kabi ko'chiradi. Faqat ko'chirish hali bajarilmagan bo'lsa.
+    """
+    c.execute("PRAGMA user_version")
+    if c.fetchone()[0] >= 1:
+        return
+    c.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existing = {row[0].lower(): row[0] for row in c.fetchall()}
+    if "groups" not in existing:
+        return
+    c.execute("SELECT DISTINCT table_name FROM groups WHERE table_name IS NOT NULL")
+    for (table_name,) in c.fetchall():
+        name = existing.get(table_name.lower())
+        if name is None or name.lower() not in _SCHEMA_NAMES or not _is_legacy_table(c, name):
+            continue
+        new_name = f"legacy_{name}"
+        while new_name.lower() in existing:
+            new_name += "_"
+        c.execute(f'ALTER TABLE "{name}" RENAME TO "{new_name}"')
+        c.execute("UPDATE groups SET table_name = ? WHERE lower(table_name) = ?", (new_name, name.lower()))
+        del existing[name.lower()]
+        existing[new_name.lower()] = new_name
+
+def migrate_group_tables():
+    """Eski har-bir-guruh table laridagi ma'lumotni violations table ga ko'chiradi.
+
+    Bir martalik: bajarilgach PRAGMA user_version = 1 qo'yiladi. Nusxalash
+    SQLite ichida (INSERT ... SELECT) bajariladi, ma'lumot Python ga
+    yuklanmaydi. Nomi bir xil chiqib qolgan guruhlar bitta table ni
+    bo'lishgan - eski tizim ikkala guruhga ham shu qatorlarni ko'rsatgan,
+    shuning uchun qatorlar har bir shunday guruhga ko'chiriladi.
+    """
+    with transaction() as c:
+        c.execute("PRAGMA user_version")
+        if c.fetchone()[0] >= 1:
+            return
+        c.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        existing = {row[0].lower(): row[0] for row in c.fetchall()}
+        c.execute("SELECT group_id, table_name FROM groups WHERE table_name IS NOT NULL")
+        legacy = {}
+        for group_id, table_name in c.fetchall():
+            name = existing.get(table_name.lower())
+            if name is None or name.lower() in _SCHEMA_NAMES or name.lower().startswith("sqlite_"):
+                continue
+            legacy.setdefault(name, []).append(group_id)
+        for table_name, group_ids in legacy.items():
+            for group_id in group_ids:
+                c.execute(f"""
+                    INSERT INTO violations (group_id, user_id, total_count, daily_count, last_violation, last_daily_reset)
+                    SELECT ?, user_id, total_count, daily_count, last_violation, last_daily_reset FROM "{table_name}"
+                    WHERE true
+                    ON CONFLICT (group_id, user_id) DO NOTHING
+                """, (group_id,))
+            c.execute(f'DROP TABLE "{table_name}"')
+        c.execute("UPDATE groups SET table_name = NULL")
+        c.execute("PRAGMA user_version = 1")
+    if legacy:
+        print(f"✅ {len(legacy)} ta eski guruh table violations table ga ko'chirildi")
+
+def seed_violation_events():
+    """Hodisasi yo'q, lekin kunlik hisobi bor foydalanuvchilar uchun violation_events ni to'ldiradi.
+
+    Eski table lardan ko'chirilganlar faqat daily_count va last_daily_reset
+    bilan keladi. Ularning har bir qoida buzishi last_daily_reset vaqtiga
+    yoziladi: sirpanuvchi oyna ularni eski tizim hisobni nolga tushiradigan
+    paytda unutadi. Bir martalik: bajarilgach PRAGMA user_version = 2.
+    """
+    with transaction() as c:
+        c.execute("PRAGMA user_version")
+        if c.fetchone()[0] >= 2:
+            return
+        c.execute("""
+            INSERT INTO violation_events (group_id, user_id, created_at)
+            WITH RECURSIVE seed (group_id, user_id, created_at, remaining) AS (
+                SELECT group_id, user_id, (julianday(last_daily_reset) - 2440587.5) * 86400.0, daily_count
+                FROM violations v
+                WHERE daily_count > 0 AND julianday('now') - julianday(last_daily_reset) < 1
+                AND NOT EXISTS (
+                    SELECT 1 FROM violation_events e WHERE e.group_id = v.group_id AND e.user_id = v.user_id
+                )
+                UNION ALL
+                SELECT group_id, user_id, created_at, remaining - 1 FROM seed WHERE remaining > 1
+            )
+            SELECT group_id, user_id, created_at FROM seed
+        """)
+        seeded = c.rowcount
+        c.execute("PRAGMA user_version = 2")
+    if seeded > 0:
+        print(f"✅ {seeded} ta eski kunlik qoida buzish 24 soatlik oynaga qo'shildi")
 
 def init_group_table(group_id: int, group_title: str = None):
-    """Yangi guruh uchun alohida table yaratadi"""
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
-    c = conn.cursor()
-    
-    # Guruh nomini xavfsiz qilish
+    """Guruhni groups ro'yxatiga qo'shadi yoki nomini yangilaydi"""
+    # Nom endi faqat ko'rsatish uchun: qoida buzishlar group_id bo'yicha saqlanadi
     if not group_title:
         group_title = f"Group_{abs(group_id)}"
-    
-    table_name = sanitize_table_name(group_title)
-    
-    # Guruhni groups table ga qo'shish
-    c.execute("INSERT OR REPLACE INTO groups (group_id, group_title, table_name) VALUES (?, ?, ?)", 
-              (group_id, group_title, table_name))
-    
-    # Guruh uchun alohida table yaratish
-    c.execute(f"""
-        CREATE TABLE IF NOT EXISTS "{table_name}" (
-            user_id INTEGER PRIMARY KEY UNIQUE,
-            total_count INTEGER DEFAULT 0,
-            daily_count INTEGER DEFAULT 0,
-            last_violation DATETIME DEFAULT CURRENT_TIMESTAMP,
-            last_daily_reset DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    conn.commit()
-    conn.close()
-    print(f"✅ Guruh '{group_title}' ({group_id}) uchun yangi table yaratildi: {table_name}")
-    return table_name
-
-def add_violation_db(user_id: int, group_id: int, group_title: str = None):
-    """Foydalanuvchiga qoida buzish qo'shadi"""
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
-    c = conn.cursor()
-    
-    # Guruh table nomini topish
-    c.execute("SELECT table_name FROM groups WHERE group_id = ?", (group_id,))
-    result = c.fetchone()
-    
-    if not result:
-        # Agar table mavjud bo'lmasa, yaratish
-        table_name = init_group_table(group_id, group_title)
-    else:
-        table_name = result[0]
-    
-    # 24 soat ichida qoida buzish hisobini tekshirish
-    c.execute(f'SELECT daily_count, last_daily_reset FROM "{table_name}" WHERE user_id = ?', (user_id,))
-    row = c.fetchone()
-    
-    now = datetime.now()
-    if row:
-        last_reset = datetime.fromisoformat(row[1]) if row[1] else now
-        # Agar 24 soat o'tgan bo'lsa, daily_count ni nolga tushirish
-        if now - last_reset >= timedelta(hours=24):
-            c.execute(f'UPDATE "{table_name}" SET daily_count = 1, total_count = total_count + 1, last_violation = CURRENT_TIMESTAMP, last_daily_reset = CURRENT_TIMESTAMP WHERE user_id = ?', (user_id,))
-        else:
-            c.execute(f'UPDATE "{table_name}" SET daily_count = daily_count + 1, total_count = total_count + 1, last_violation = CURRENT_TIMESTAMP WHERE user_id = ?', (user_id,))
-    else:
-        c.execute(f'INSERT INTO "{table_name}" (user_id, total_count, daily_count, last_violation, last_daily_reset) VALUES (?, 1, 1, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)', (user_id,))
-    
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute("""
+            INSERT INTO groups (group_id, group_title) VALUES (?, ?)
+            ON CONFLICT (group_id) DO UPDATE SET group_title = excluded.group_title
+        """, (group_id, group_title))
+    print(f"✅ Guruh '{group_title}' ({group_id}) ro'yxatga olindi")
 
 def get_violations_db(user_id: int, group_id: int):
     """Foydalanuvchining qoida buzishlar sonini qaytaradi"""
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
-    c = conn.cursor()
-    
-    # Guruh table nomini topish
-    c.execute("SELECT table_name FROM groups WHERE group_id = ?", (group_id,))
-    result = c.fetchone()
-    
-    if not result:
-        return 0, 0, None
-    
-    table_name = result[0]
-    c.execute(f'SELECT total_count, daily_count, last_violation FROM "{table_name}" WHERE user_id = ?', (user_id,))
-    row = c.fetchone()
-    conn.close()
-    
-    if row:
-        return row[0], row[1], row[2]  # total_count, daily_count, last_violation
-    else:
-        return 0, 0, None
+    with transaction() as c:
+        c.execute("SELECT total_count, daily_count, last_violation FROM violations WHERE group_id = ? AND user_id = ?", (group_id, user_id))
+        row = c.fetchone()
+        if row:
+            return row[0], row[1], row[2]  # total_count, daily_count, last_violation
+        else:
+            return 0, 0, None
 
 def clear_violations_db(user_id: int, group_id: int):
     """Foydalanuvchining barcha qoida buzishlarini o'chiradi"""
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
-    c = conn.cursor()
-    
-    # Guruh table nomini topish
-    c.execute("SELECT table_name FROM groups WHERE group_id = ?", (group_id,))
-    result = c.fetchone()
-    
-    if result:
-        table_name = result[0]
-        c.execute(f'DELETE FROM "{table_name}" WHERE user_id = ?', (user_id,))
-    
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute("DELETE FROM violations WHERE group_id = ? AND user_id = ?", (group_id, user_id))
+        c.execute("DELETE FROM violation_events WHERE group_id = ? AND user_id = ?", (group_id, user_id))
+
+def flush_violations(rows: list, events: list, cutoff: float):
+    """Xotiradagi hisoblagichlardan to'plangan o'zgarishlarni bitta tranzaksiyada yozadi.
+    Har bir qoida buzishni RETURNING bilan alohida upsert qilgan add_violation_db o'rnida.
+
+    rows: (group_id, user_id, qo'shilgan_soni, daily_count, last_violation, last_daily_reset)
+    (last_daily_reset - oynadagi eng eski hodisa vaqti: daily_count shundan beri sanalgan)
+    events: (group_id, user_id, created_at)
+    cutoff: bundan eski hodisalar o'chiriladi (oynadan chiqqan)
+    """
+    with transaction() as c:
+        c.executemany(
+            "INSERT INTO groups (group_id, group_title) VALUES (?, 'Group_' || abs(?)) ON CONFLICT (group_id) DO NOTHING",
+            {(row[0], row[0]) for row in rows},
+        )
+        c.executemany("""
+            INSERT INTO violations (group_id, user_id, total_count, daily_count, last_violation, last_daily_reset)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (group_id, user_id) DO UPDATE SET
+                total_count = total_count + excluded.total_count,
+                daily_count = excluded.daily_count,
+                last_violation = excluded.last_violation,
+                last_daily_reset = excluded.last_daily_reset
+        """, rows)
+        c.executemany("INSERT INTO violation_events (group_id, user_id, created_at) VALUES (?, ?, ?)", events)
+        c.execute("DELETE FROM violation_events WHERE created_at < ?", (cutoff,))
+
+def get_violation_state(user_id: int, group_id: int, since: float) -> tuple:
+    """Foydalanuvchining jami soni va oynadagi hodisa vaqtlarini qaytaradi: (total_count, [created_at])"""
+    with transaction() as c:
+        c.execute("SELECT total_count FROM violations WHERE group_id = ? AND user_id = ?", (group_id, user_id))
+        row = c.fetchone()
+        c.execute("SELECT created_at FROM violation_events WHERE group_id = ? AND user_id = ? AND created_at >= ? ORDER BY created_at",
+                  (group_id, user_id, since))
+        return (row[0] if row else 0), [r[0] for r in c.fetchall()]
+
+def load_recent_violations(since: float) -> tuple:
+    """Oynada hodisasi bor foydalanuvchilarni qaytaradi: ({(group_id, user_id): total_count}, [(group_id, user_id, created_at)])"""
+    with transaction() as c:
+        c.execute("SELECT group_id, user_id, created_at FROM violation_events WHERE created_at >= ? ORDER BY created_at", (since,))
+        events = c.fetchall()
+        c.execute("""
+            SELECT v.group_id, v.user_id, v.total_count FROM violations v
+            WHERE EXISTS (
+                SELECT 1 FROM violation_events e
+                WHERE e.group_id = v.group_id AND e.user_id = v.user_id AND e.created_at >= ?
+            )
+        """, (since,))
+        totals = {(group_id, user_id): total for group_id, user_id, total in c.fetchall()}
+        return totals, events
 
 def group_table_exists(group_id: int) -> bool:
-    """Guruh table mavjudligini tekshiradi"""
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
-    c = conn.cursor()
-    c.execute("SELECT table_name FROM groups WHERE group_id = ?", (group_id,))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
+    """Guruh ro'yxatga olinganligini tekshiradi"""
+    with transaction() as c:
+        c.execute("SELECT 1 FROM groups WHERE group_id = ?", (group_id,))
+        result = c.fetchone()
+        return result is not None
+
+def get_groups() -> list:
+    """Ro'yxatga olingan barcha guruhlarni qaytaradi: [(group_id, group_title)]"""
+    with transaction() as c:
+        c.execute("SELECT group_id, group_title FROM groups")
+        return c.fetchall()
 
 def get_group_stats(group_id: int):
-    """Guruh statistikalarini qaytaradi"""
-    if not group_table_exists(group_id):
-        return 0, 0
-    
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
-    c = conn.cursor()
-    
-    # Guruh table nomini topish
-    c.execute("SELECT table_name FROM groups WHERE group_id = ?", (group_id,))
-    result = c.fetchone()
-    
-    if not result:
-        return 0, 0
-    
-    table_name = result[0]
-    
-    # Jami foydalanuvchilar soni
-    c.execute(f'SELECT COUNT(*) FROM "{table_name}"')
-    total_users = c.fetchone()[0]
-    
-    # Jami qoida buzishlar soni
-    c.execute(f'SELECT SUM(total_count) FROM "{table_name}"')
-    total_violations = c.fetchone()[0] or 0
-    
-    conn.close()
-    return total_users, total_violations
+    """Guruh statistikalarini qaytaradi: (foydalanuvchilar soni, jami qoida buzishlar)"""
+    with transaction() as c:
+        c.execute("SELECT COUNT(*), COALESCE(SUM(total_count), 0) FROM violations WHERE group_id = ?", (group_id,))
+        total_users, total_violations = c.fetchone()
+        return total_users, total_violations
 
 # CAPTCHA funksiyalari
 def add_captcha_user(user_id: int, group_id: int, message_id: int):
     """CAPTCHA foydalanuvchisini qo'shadi"""
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO captcha_users (user_id, group_id, message_id) VALUES (?, ?, ?)", 
-              (user_id, group_id, message_id))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute("INSERT OR REPLACE INTO captcha_users (user_id, group_id, message_id) VALUES (?, ?, ?)", 
+                  (user_id, group_id, message_id))
 
 def remove_captcha_user(user_id: int, group_id: int):
     """CAPTCHA foydalanuvchisini olib tashlaydi"""
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
-    c = conn.cursor()
-    c.execute("DELETE FROM captcha_users WHERE user_id = ? AND group_id = ?", (user_id, group_id))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute("DELETE FROM captcha_users WHERE user_id = ? AND group_id = ?", (user_id, group_id))
 
 def is_captcha_user(user_id: int, group_id: int) -> bool:
     """Foydalanuvchi CAPTCHA holatida ekanligini tekshiradi"""
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
-    c = conn.cursor()
-    c.execute("SELECT 1 FROM captcha_users WHERE user_id = ? AND group_id = ?", (user_id, group_id))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
+    with transaction() as c:
+        c.execute("SELECT 1 FROM captcha_users WHERE user_id = ? AND group_id = ?", (user_id, group_id))
+        result = c.fetchone()
+        return result is not None
 
 def get_captcha_message_id(user_id: int, group_id: int) -> int:
     """CAPTCHA xabar ID sini qaytaradi"""
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
-    c = conn.cursor()
-    c.execute("SELECT message_id FROM captcha_users WHERE user_id = ? AND group_id = ?", (user_id, group_id))
-    result = c.fetchone()
-    conn.close()
-    return result[0] if result else None
+    with transaction() as c:
+        c.execute("SELECT message_id FROM captcha_users WHERE user_id = ? AND group_id = ?", (user_id, group_id))
+        result = c.fetchone()
+        return result[0] if result else None
 
 # Blocklangan foydalanuvchilar funksiyalari
 def add_blocked_user(user_id: int, group_id: int, blocked_by: int, reason: str = ""):
     """Blocklangan foydalanuvchini qo'shadi"""
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO blocked_users (user_id, group_id, blocked_by, block_reason) VALUES (?, ?, ?, ?)", 
-              (user_id, group_id, blocked_by, reason))
-    conn.commit()
-    conn.close()
-
-def get_blocked_users(group_id: int) -> list:
-    """Guruhdagi blocklangan foydalanuvchilarni qaytaradi"""
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
-    c = conn.cursor()
-    c.execute("SELECT user_id, blocked_by, block_reason, blocked_at FROM blocked_users WHERE group_id = ?", (group_id,))
-    result = c.fetchall()
-    conn.close()
-    return result
+    with transaction() as c:
+        c.execute("INSERT OR REPLACE INTO blocked_users (user_id, group_id, blocked_by, block_reason) VALUES (?, ?, ?, ?)", 
+                  (user_id, group_id, blocked_by, reason))
+
+def get_blocked_users(group_id: int, limit: int = -1, offset: int = 0) -> list:
+    """Guruhdagi blocklangan foydalanuvchilarni qaytaradi (yangilari birinchi, limit/offset - sahifalash uchun)"""
+    with transaction() as c:
+        c.execute("""
+            SELECT user_id, blocked_by, block_reason, blocked_at FROM blocked_users
+            WHERE group_id = ? ORDER BY blocked_at DESC, user_id LIMIT ? OFFSET ?
+        """, (group_id, limit, offset))
+        result = c.fetchall()
+        return result
+
+def count_blocked_users(group_id: int) -> int:
+    with transaction() as c:
+        c.execute("SELECT COUNT(*) FROM blocked_users WHERE group_id = ?", (group_id,))
+        return c.fetchone()[0]
 
 def is_user_blocked(user_id: int, group_id: int) -> bool:
     """Foydalanuvchi blocklangan ekanligini tekshiradi"""
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
-    c = conn.cursor()
-    c.execute("SELECT 1 FROM blocked_users WHERE user_id = ? AND group_id = ?", (user_id, group_id))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
+    with transaction() as c:
+        c.execute("SELECT 1 FROM blocked_users WHERE user_id = ? AND group_id = ?", (user_id, group_id))
+        result = c.fetchone()
+        return result is not None
+
+# Guruhga xos so'zlar funksiyalari
+def add_group_word(group_id: int, word: str, kind: str, added_by: int = None):
+    """Guruh uchun so'z qo'shadi (kind: 'add' yoki 'exempt')"""
+    with transaction() as c:
+        c.execute("INSERT OR REPLACE INTO group_words (group_id, word, kind, added_by) VALUES (?, ?, ?, ?)", 
+                  (group_id, word, kind, added_by))
+
+def remove_group_word(group_id: int, word: str) -> bool:
+    """Guruhdan so'zni olib tashlaydi (qo'shilgan va istisno ro'yxatlaridan)"""
+    with transaction() as c:
+        c.execute("DELETE FROM group_words WHERE group_id = ? AND word = ?", (group_id, word))
+        removed = c.rowcount > 0
+        return removed
+
+def get_group_words(group_id: int) -> tuple:
+    """Guruhning qo'shilgan va istisno so'zlarini qaytaradi: (additions, exemptions)"""
+    with transaction() as c:
+        c.execute("SELECT word, kind FROM group_words WHERE group_id = ? ORDER BY added_at", (group_id,))
+        rows = c.fetchall()
+        additions = [word for word, kind in rows if kind == "add"]
+        exemptions = [word for word, kind in rows if kind == "exempt"]
+        return additions, exemptions
+
+def get_groups_with_words() -> list:
+    """O'z so'z ro'yxati bor guruhlar ID larini qaytaradi"""
+    with transaction() as c:
+        c.execute("SELECT DISTINCT group_id FROM group_words")
+        result = [row[0] for row in c.fetchall()]
+        return result
+
+# Guruh sozlamalari
+def set_flood_response(group_id: int, response: str):
+    """Guruhning floodga javobini saqlaydi ('off', 'delete' yoki 'mute')"""
+    with transaction() as c:
+        c.execute("""
+            INSERT INTO group_settings (group_id, flood_response) VALUES (?, ?)
+            ON CONFLICT (group_id) DO UPDATE SET flood_response = excluded.flood_response
+        """, (group_id, response))
+
+def get_flood_responses() -> dict:
+    """Floodga javobi o'zgartirilgan guruhlar: {group_id: response}"""
+    with transaction() as c:
+        c.execute("SELECT group_id, flood_response FROM group_settings WHERE flood_response IS NOT NULL")
+        return dict(c.fetchall())
+
+# Kechiktirilgan amallar
+def add_job(due_at: float, kind: str, chat_id: int, user_id: int = None, message_id: int = None) -> int:
+    """Amalni due_at (unix vaqt) ga rejalashtiradi, job_id qaytaradi"""
+    with transaction() as c:
+        c.execute("INSERT INTO scheduled_jobs (due_at, kind, chat_id, user_id, message_id) VALUES (?, ?, ?, ?, ?)",
+                  (due_at, kind, chat_id, user_id, message_id))
+        return c.lastrowid
+
+def cancel_jobs(kind: str, chat_id: int, user_id: int = None, message_id: int = None) -> int:
+    """Shu turdagi va shu foydalanuvchiga (message_id berilsa - shu xabarga) tegishli amallarni bekor qiladi"""
+    with transaction() as c:
+        if message_id is None:
+            c.execute("DELETE FROM scheduled_jobs WHERE kind = ? AND chat_id = ? AND user_id IS ?", (kind, chat_id, user_id))
+        else:
+            c.execute("DELETE FROM scheduled_jobs WHERE kind = ? AND chat_id = ? AND user_id IS ? AND message_id = ?",
+                      (kind, chat_id, user_id, message_id))
+        return c.rowcount
+
+def get_due_jobs(now: float, limit: int, shard_index: int = 0, shard_count: int = 1) -> list:
+    """Vaqti kelgan amallarni eng eskisidan boshlab qaytaradi: [(job_id, kind, chat_id, user_id, message_id)]
+
+    Bir nechta worker jarayoni bo'lsa har biri faqat o'z chatlarining
+    (abs(chat_id) % shard_count == shard_index) amallarini oladi.
+    """
+    with transaction() as c:
+        c.execute("""
+            SELECT job_id, kind, chat_id, user_id, message_id FROM scheduled_jobs
+            WHERE due_at <= ? AND abs(chat_id) % ? = ? ORDER BY due_at LIMIT ?
+        """, (now, shard_count, shard_index, limit))
+        return c.fetchall()
+
+def delete_jobs(job_ids: list):
+    with transaction() as c:
+        c.executemany("DELETE FROM scheduled_jobs WHERE job_id = ?", [(job_id,) for job_id in job_ids])
+
+def next_job_time(shard_index: int = 0, shard_count: int = 1):
+    """Eng yaqin amal vaqtini qaytaradi (yo'q bo'lsa None)"""
+    with transaction() as c:
+        c.execute("SELECT MIN(due_at) FROM scheduled_jobs WHERE abs(chat_id) % ? = ?", (shard_count, shard_index))
+        return c.fetchone()[0]
 
 # Eski funksiyalar - orqaga muvofiqlik uchun
 def create_group_table(group_id: int):
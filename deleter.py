@@ -0,0 +1,116 @@
+import asyncio
+from collections import OrderedDict, deque
+
+from config import DELETE_BATCH_WINDOW, RECENT_MESSAGES_PER_USER, RECENT_MESSAGES_USERS
+from core import bot, logger
+from fanout import fan_out
+from logs import log_delete_failures
+from outbound import ACTION, outbound
+
+# Telegram's deleteMessages limit
+BULK_DELETE_LIMIT = 100
+
+
+class DeletionBatcher:
+    """Deletes messages in bulk, per chat, with Telegram's deleteMessages.
+
+    ``delete`` only queues the id; every DELETE_BATCH_WINDOW seconds (or as
+    soon as BULK_DELETE_LIMIT ids are waiting) the chat's ids go out in one
+    call per hundred. A chunk that fails as a whole is retried one message
+    at a time, and whatever still fails is logged once per batch.
+
+    The last RECENT_MESSAGES_PER_USER message ids of each user are kept in a
+    ring buffer (for at most RECENT_MESSAGES_USERS users, least recently
+    active dropped first) so that a ban can purge what the user already
+    posted.
+    """
+
+    def __init__(self, window: float = DELETE_BATCH_WINDOW, history: int = RECENT_MESSAGES_PER_USER, max_users: int = RECENT_MESSAGES_USERS):
+        self.window = window
+        self.history = history
+        self.max_users = max_users
+        # chat_id -> {message_id: user_id}
+        self._pending = {}
+        self._flushers = {}
+        self._tasks = set()
+        self._recent = OrderedDict()
+        self.metrics = {"requested": 0, "bulk_calls": 0, "single_calls": 0, "failed": 0}
+
+    def remember(self, chat_id: int, user_id: int, message_id: int) -> None:
+        key = (chat_id, user_id)
+        recent = self._recent.get(key)
+        if recent is None:
+            if len(self._recent) >= self.max_users:
+                self._recent.popitem(last=False)
+            recent = self._recent[key] = deque(maxlen=self.history)
+        else:
+            self._recent.move_to_end(key)
+        recent.append(message_id)
+
+    def delete(self, chat_id: int, message_id: int, user_id: int = None) -> None:
+        pending = self._pending.setdefault(chat_id, {})
+        if message_id in pending:
+            return
+        pending[message_id] = user_id
+        self.metrics["requested"] += 1
+        if len(pending) >= BULK_DELETE_LIMIT:
+            self._spawn(self._flush(chat_id))
+        elif chat_id not in self._flushers:
+            self._flushers[chat_id] = self._spawn(self._flush_later(chat_id))
+
+    def purge_user(self, chat_id: int, user_id: int) -> int:
+        """Queue every remembered message of the user in the chat for deletion."""
+        recent = self._recent.pop((chat_id, user_id), None) or ()
+        for message_id in recent:
+            self.delete(chat_id, message_id, user_id)
+        return len(recent)
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _flush_later(self, chat_id: int) -> None:
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._flushers.pop(chat_id, None)
+        await self._flush(chat_id)
+
+    async def _flush(self, chat_id: int) -> None:
+        pending = self._pending.pop(chat_id, None)
+        if not pending:
+            return
+        message_ids = sorted(pending)
+        failures = []
+        for i in range(0, len(message_ids), BULK_DELETE_LIMIT):
+            chunk = message_ids[i:i + BULK_DELETE_LIMIT]
+            if len(chunk) > 1:
+                try:
+                    await outbound.call(ACTION, chat_id, bot.delete_messages, chat_id=chat_id, message_ids=chunk)
+                    self.metrics["bulk_calls"] += 1
+                    continue
+                except Exception as e:
+                    logger.warning(f"Bulk delete of {len(chunk)} messages failed in chat {chat_id}, deleting one by one: {e}")
+            self.metrics["single_calls"] += len(chunk)
+            _, errors = await fan_out(
+                chunk, lambda message_id: outbound.call(ACTION, chat_id, bot.delete_message, chat_id=chat_id, message_id=message_id)
+            )
+            failures.extend((message_id, pending[message_id], str(e)) for message_id, e in errors)
+        if failures:
+            self.metrics["failed"] += len(failures)
+            log_delete_failures(logger, chat_id=chat_id, failures=failures, total=len(message_ids))
+
+    async def stop(self) -> None:
+        """Send whatever is still queued right away."""
+        for task in list(self._flushers.values()):
+            task.cancel()
+        self._flushers.clear()
+        await asyncio.gather(*(self._flush(chat_id) for chat_id in list(self._pending)), return_exceptions=True)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+message_deleter = DeletionBatcher()
+
+__all__ = ["BULK_DELETE_LIMIT", "DeletionBatcher", "message_deleter"]
@@ -0,0 +1,147 @@
+import asyncio
+import html
+import time
+from collections import deque
+
+from config import (
+    DIGEST_THRESHOLD,
+    DIGEST_RATE_WINDOW,
+    DIGEST_FLUSH_DELAY,
+    DIGEST_IDLE_TIMEOUT,
+    DIGEST_MAX_LINES,
+    GROUP_DIGEST_TEMPLATE,
+    GROUP_DIGEST_LINE_TEMPLATE,
+)
+from core import bot, logger
+from outbound import NOTICE, outbound
+from scheduler import job_scheduler
+
+
+class _ChatDigest:
+    __slots__ = ("recent", "entries", "message_id", "dirty", "flusher", "last_update", "delete_at", "scheduled_delete_at")
+
+    def __init__(self):
+        self.recent = deque()
+        # user_id -> [user_name, violations in this digest, total_count, daily_count]
+        self.entries = {}
+        self.message_id = None
+        self.dirty = False
+        self.flusher = None
+        self.last_update = 0.0
+        self.delete_at = 0.0
+        self.scheduled_delete_at = 0.0
+
+
+class NotificationDigest:
+    """Turns a burst of violation notices in one chat into a single message.
+
+    Below DIGEST_THRESHOLD violations per DIGEST_RATE_WINDOW seconds every
+    violation gets its usual notice through ``send_single``. Above it the
+    chat switches to a digest: violations are buffered for
+    DIGEST_FLUSH_DELAY seconds, then one message listing the users and their
+    counts is sent, and later flushes edit that same message. After
+    DIGEST_IDLE_TIMEOUT seconds without violations the digest is closed
+    and the chat is back to single notices.
+    """
+
+    def __init__(self, send_single):
+        self.send_single = send_single
+        self._chats = {}
+
+    async def notify(self, chat_id: int, user_id: int, user_name: str, duration: int, total_count: int, daily_count: int) -> None:
+        now = time.monotonic()
+        state = self._chats.get(chat_id)
+        if state is None:
+            if len(self._chats) > 1000:
+                self._prune(now)
+            state = self._chats[chat_id] = _ChatDigest()
+        recent = state.recent
+        recent.append(now)
+        while recent[0] < now - DIGEST_RATE_WINDOW:
+            recent.popleft()
+        if state.entries and state.flusher is None and now - state.last_update > DIGEST_IDLE_TIMEOUT:
+            # The attack is over; a new burst starts a new digest further down the chat
+            state.entries = {}
+            state.message_id = None
+            state.delete_at = state.scheduled_delete_at = 0.0
+        if not state.entries and len(recent) <= DIGEST_THRESHOLD:
+            await self.send_single(chat_id, user_id, user_name, duration, total_count, daily_count)
+            return
+        entry = state.entries.get(user_id)
+        if entry is None:
+            state.entries[user_id] = [user_name, 1, total_count, daily_count]
+        else:
+            entry[0] = user_name
+            entry[1] += 1
+            entry[2] = total_count
+            entry[3] = daily_count
+        if duration:
+            state.delete_at = max(state.delete_at, time.time() + duration)
+        state.last_update = now
+        state.dirty = True
+        if state.flusher is None:
+            state.flusher = asyncio.create_task(self._flush_later(chat_id, state))
+
+    def _render(self, state: _ChatDigest) -> str:
+        entries = sorted(state.entries.items(), key=lambda item: -item[1][1])
+        lines = [
+            GROUP_DIGEST_LINE_TEMPLATE.format(
+                user_id=user_id,
+                user_name=html.escape(user_name),
+                count=count,
+                total_count=total_count,
+                daily_count=daily_count,
+            )
+            for user_id, (user_name, count, total_count, daily_count) in entries[:DIGEST_MAX_LINES]
+        ]
+        if len(entries) > DIGEST_MAX_LINES:
+            lines.append(f"… va yana {len(entries) - DIGEST_MAX_LINES} ta foydalanuvchi")
+        return GROUP_DIGEST_TEMPLATE.format(
+            users_count=len(entries),
+            violations_count=sum(entry[1] for entry in state.entries.values()),
+            lines="\n".join(lines),
+        )
+
+    async def _flush_later(self, chat_id: int, state: _ChatDigest) -> None:
+        try:
+            while state.dirty:
+                await asyncio.sleep(DIGEST_FLUSH_DELAY)
+                state.dirty = False
+                await self._publish(chat_id, state)
+        except Exception as e:
+            logger.error(f"Failed to publish violation digest in chat {chat_id}: {e}")
+        finally:
+            state.flusher = None
+
+    async def _publish(self, chat_id: int, state: _ChatDigest) -> None:
+        text = self._render(state)
+        edited = False
+        if state.message_id is not None:
+            try:
+                await outbound.call(NOTICE, chat_id, bot.edit_message_text, chat_id=chat_id, message_id=state.message_id, text=text)
+                edited = True
+            except Exception as e:
+                edited = "not modified" in str(e)
+                if not edited:
+                    # Deleted by an admin or too old to edit: start a new digest message
+                    logger.warning(f"Digest edit failed in chat {chat_id}, sending a new one: {e}")
+        if not edited:
+            message = await outbound.call(NOTICE, chat_id, bot.send_message, chat_id=chat_id, text=text)
+            state.message_id = message.message_id
+            state.scheduled_delete_at = 0.0
+        if state.delete_at > state.scheduled_delete_at:
+            # One cleanup job for the whole digest, moved to the latest block end
+            if state.scheduled_delete_at:
+                await job_scheduler.cancel("delete_notification", chat_id, None, state.message_id)
+            await job_scheduler.schedule(max(0.0, state.delete_at - time.time()), "delete_notification", chat_id, None, state.message_id)
+            state.scheduled_delete_at = state.delete_at
+
+    def _prune(self, now: float) -> None:
+        for chat_id in [
+            c for c, s in self._chats.items()
+            if s.flusher is None and (not s.recent or s.recent[-1] < now - max(DIGEST_RATE_WINDOW, DIGEST_IDLE_TIMEOUT))
+        ]:
+            del self._chats[chat_id]
+
+
+__all__ = ["NotificationDigest"]
@@ -0,0 +1,28 @@
+import asyncio
+
+from config import FAN_OUT_CONCURRENCY
+
+
+async def fan_out(items, func, limit: int = FAN_OUT_CONCURRENCY) -> tuple:
+    """Run ``await func(item)`` for every item, at most ``limit`` at a time.
+
+    One failing item does not stop the others. Returns (results, errors):
+    results in item order, None where the call failed, and errors as
+    (item, exception) pairs.
+    """
+    semaphore = asyncio.Semaphore(limit)
+    errors = []
+
+    async def run(item):
+        async with semaphore:
+            try:
+                return await func(item)
+            except Exception as e:
+                errors.append((item, e))
+                return None
+
+    results = await asyncio.gather(*(run(item) for item in items))
+    return results, errors
+
+
+__all__ = ["fan_out"]
@@ -0,0 +1,352 @@
+import heapq
+import time
+from collections import Counter, OrderedDict, deque
+from typing import NamedTuple
+
+from config import (
+    FLOOD_WINDOW_SECONDS,
+    FLOOD_WINDOW_SIZE,
+    FLOOD_THRESHOLD,
+    FLOOD_REPEATS,
+    FLOOD_NEW_MEMBER_SECONDS,
+    FLOOD_RAID_USERS,
+    FLOOD_SIMILARITY,
+    FLOOD_MIN_LENGTH,
+    FLOOD_VERDICT_CACHE_SIZE,
+    FLOOD_CHATS,
+)
+
+# MinHash sketch: the SKETCH_SIZE smallest hashes of the text's
+# SHINGLE-character substrings (one hash function, bottom-k)
+SKETCH_SIZE = 16
+SHINGLE = 4
+# Characters a message's head and tail bands take from each end. Copies
+# that differ by an emoji or a few letters still share one of the two
+BAND = 16
+
+# What ``cached_verdict`` returns for a text the matcher has not seen yet
+UNKNOWN = object()
+
+# Per-chat answer to a flood: not checked, copies deleted, or copies
+# deleted and senders who keep posting muted
+RESPONSES = ("off", "delete", "mute")
+
+
+def compact_text(text: str) -> str:
+    """Lowercased text with whitespace runs collapsed: what flood copies are compared on."""
+    return " ".join(text.lower().split())
+
+
+def content_sketch(compact: str) -> tuple:
+    """Bottom-k MinHash sketch of a compacted text, smallest hash first."""
+    if len(compact) <= SHINGLE:
+        return (hash(compact),)
+    shingles = {compact[i:i + SHINGLE] for i in range(len(compact) - SHINGLE + 1)}
+    return tuple(heapq.nsmallest(SKETCH_SIZE, map(hash, shingles)))
+
+
+def similarity(a: tuple, b: tuple) -> float:
+    """Estimated Jaccard similarity of the texts behind two sketches."""
+    # The k smallest hashes of the union are a sample of it; the share of
+    # them found in both sketches estimates the share of shingles in common.
+    # Both sketches are sorted, so one merge walk finds that sample
+    k = max(len(a), len(b))
+    i = j = taken = common = 0
+    while taken < k and (i < len(a) or j < len(b)):
+        if j == len(b) or i < len(a) and a[i] < b[j]:
+            i += 1
+        elif i == len(a) or b[j] < a[i]:
+            j += 1
+        else:
+            i += 1
+            j += 1
+            common += 1
+        taken += 1
+    return common / taken
+
+
+class FloodAction(NamedTuple):
+    # (message_id, user_id) pairs to delete; on the first sighting of a
+    # flood these include the earlier copies still in the window
+    messages: list
+    # Senders to mute: they posted the flood again after a copy of theirs
+    # had been deleted. Always empty when the flood starts
+    users: list
+    started: bool
+
+
+class _Entry:
+    __slots__ = ("at", "key", "bands", "_sketch", "user_id", "message_id")
+
+    def __init__(self, at, key, bands, user_id, message_id):
+        self.at = at
+        self.key = key
+        self.bands = bands
+        self._sketch = None
+        self.user_id = user_id
+        self.message_id = message_id
+
+    @property
+    def sketch(self) -> tuple:
+        # Only entries that share a band with a would-be flood get one
+        if self._sketch is None:
+            self._sketch = content_sketch(self.key)
+        return self._sketch
+
+
+class _Flood:
+    __slots__ = ("sketch", "keys", "bands", "users", "muted", "last_seen", "messages")
+
+    def __init__(self, sketch, now):
+        self.sketch = sketch
+        self.keys = set()
+        self.bands = set()
+        # Senders with a copy deleted, and those of them already muted
+        self.users = set()
+        self.muted = set()
+        self.last_seen = now
+        self.messages = 0
+
+
+class _ChatFlood:
+    __slots__ = ("entries", "by_band", "floods", "joined")
+
+    def __init__(self, size):
+        self.entries = deque(maxlen=size)
+        # Index over ``entries``: head or tail band -> entries
+        self.by_band = {}
+        self.floods = []
+        # user_id -> when they joined, for FLOOD_NEW_MEMBER_SECONDS
+        self.joined = {}
+
+
+class FloodDetector:
+    """Spots raids where many messages carry the same or near-identical text.
+
+    Every group message leaves an entry in its chat's ring buffer (the last
+    FLOOD_WINDOW_SIZE messages of the last FLOOD_WINDOW_SECONDS): its
+    lowercased, whitespace-collapsed text and the first and last BAND
+    characters of it. Counting the entries that share a band is all most
+    messages cost; only once FLOOD_THRESHOLD of them do are they compared
+    properly, exact copies by text and the rest by MinHash sketches of
+    their character shingles (FLOOD_SIMILARITY), which catches copies that
+    differ by an emoji or a few letters.
+
+    Many members posting the same greeting or congratulation is normal,
+    so alike copies only make a flood with a raid signal: FLOOD_THRESHOLD
+    of them come from senders who posted the text FLOOD_REPEATS times or
+    joined the chat in the last FLOOD_NEW_MEMBER_SECONDS (see ``joined``),
+    or FLOOD_RAID_USERS different senders posted it. Then ``observe``
+    hands back every copy so it can be deleted in bulk, and later copies
+    are caught on arrival until the flood has been quiet for a window; a
+    sender whose copy was already deleted and who posts again is handed
+    back to be muted. Messages shorter than FLOOD_MIN_LENGTH ("ok",
+    "salom") never count.
+
+    It also remembers the matcher's verdict per normalized text, so a
+    repeated text is looked up instead of scanned again. A verdict is
+    only reused with the matcher it came from, so a changed group word
+    list needs no invalidation.
+    """
+
+    def __init__(
+        self,
+        window: float = FLOOD_WINDOW_SECONDS,
+        size: int = FLOOD_WINDOW_SIZE,
+        threshold: int = FLOOD_THRESHOLD,
+        repeats: int = FLOOD_REPEATS,
+        new_member_seconds: float = FLOOD_NEW_MEMBER_SECONDS,
+        raid_users: int = FLOOD_RAID_USERS,
+        min_similarity: float = FLOOD_SIMILARITY,
+        min_length: int = FLOOD_MIN_LENGTH,
+        verdicts: int = FLOOD_VERDICT_CACHE_SIZE,
+        max_chats: int = FLOOD_CHATS,
+    ):
+        self.window = window
+        self.size = size
+        self.threshold = threshold
+        self.repeats = repeats
+        self.new_member_seconds = new_member_seconds
+        self.raid_users = raid_users
+        self.min_similarity = min_similarity
+        self.min_length = min_length
+        self.max_chats = max_chats
+        self._chats = OrderedDict()
+        # Shared by all chats: raids hit many groups with one text, and
+        # most groups use the base matcher. normalized text -> (matcher, verdict)
+        self.verdicts = verdicts
+        self._verdicts = OrderedDict()
+        self.metrics = {
+            "observed": 0, "compared": 0, "floods": 0, "flood_messages": 0, "not_raids": 0,
+            "verdict_hits": 0, "verdict_misses": 0,
+        }
+
+    def _state(self, chat_id: int) -> _ChatFlood:
+        state = self._chats.get(chat_id)
+        if state is None:
+            if len(self._chats) >= self.max_chats:
+                self._chats.popitem(last=False)
+            state = self._chats[chat_id] = _ChatFlood(self.size)
+        else:
+            self._chats.move_to_end(chat_id)
+        return state
+
+    def joined(self, chat_id: int, user_id: int) -> None:
+        """Record a member who just joined: their copies count as a raid signal."""
+        state = self._state(chat_id)
+        now = time.monotonic()
+        self._expire_joined(state, now)
+        # Kept in joining order, so expiry stops at the first recent one
+        state.joined.pop(user_id, None)
+        state.joined[user_id] = now
+
+    def cached_verdict(self, normalized: str, matcher):
+        """The verdict stored for this normalized text and matcher, or UNKNOWN."""
+        cached = self._verdicts.get(normalized)
+        if cached is None or cached[0] is not matcher:
+            self.metrics["verdict_misses"] += 1
+            return UNKNOWN
+        self._verdicts.move_to_end(normalized)
+        self.metrics["verdict_hits"] += 1
+        return cached[1]
+
+    def remember_verdict(self, normalized: str, matcher, verdict) -> None:
+        verdicts = self._verdicts
+        verdicts.pop(normalized, None)
+        if len(verdicts) >= self.verdicts:
+            verdicts.popitem(last=False)
+        verdicts[normalized] = (matcher, verdict)
+
+    def observe(self, chat_id: int, user_id: int, message_id: int, text: str) -> FloodAction | None:
+        """Record a group message; a FloodAction if its content is flooding the chat."""
+        key = compact_text(text)
+        if len(key) < self.min_length:
+            return None
+        self.metrics["observed"] += 1
+        now = time.monotonic()
+        state = self._state(chat_id)
+        self._expire(state, now)
+        head, tail = key[:BAND], key[-BAND:]
+        bands = (head,) if head == tail else (head, tail)
+        sketch = None
+
+        for flood in state.floods:
+            if key in flood.keys:
+                return self._extend(flood, now, [(message_id, user_id)], started=False)
+            if not flood.bands.isdisjoint(bands):
+                if sketch is None:
+                    sketch = content_sketch(key)
+                if similarity(sketch, flood.sketch) >= self.min_similarity:
+                    flood.keys.add(key)
+                    flood.bands.update(bands)
+                    return self._extend(flood, now, [(message_id, user_id)], started=False)
+
+        # Cheap count first: too few entries share a band for a flood
+        by_band = state.by_band
+        if sum(len(by_band.get(band, ())) for band in bands) + 1 < self.threshold:
+            self._add(state, _Entry(now, key, bands, user_id, message_id))
+            return None
+        self.metrics["compared"] += 1
+        candidates = set()
+        for band in bands:
+            candidates.update(by_band.get(band, ()))
+        alike = [entry for entry in candidates if entry.key == key]
+        if len(alike) + 1 < self.threshold:
+            if sketch is None:
+                sketch = content_sketch(key)
+            alike.extend(
+                entry for entry in candidates
+                if entry.key != key and similarity(sketch, entry.sketch) >= self.min_similarity
+            )
+        if len(alike) + 1 < self.threshold or not self._is_raid(state, [entry.user_id for entry in alike] + [user_id]):
+            self._add(state, _Entry(now, key, bands, user_id, message_id))
+            return None
+
+        flood = _Flood(sketch if sketch is not None else content_sketch(key), now)
+        flood.keys.add(key)
+        flood.bands.update(bands)
+        messages = []
+        for entry in sorted(alike, key=lambda entry: entry.at):
+            flood.keys.add(entry.key)
+            flood.bands.update(entry.bands)
+            messages.append((entry.message_id, entry.user_id))
+            self._discard(state, entry)
+        messages.append((message_id, user_id))
+        state.floods.append(flood)
+        self.metrics["floods"] += 1
+        return self._extend(flood, now, messages, started=True)
+
+    def _is_raid(self, state: _ChatFlood, senders: list) -> bool:
+        counts = Counter(senders)
+        if len(counts) >= self.raid_users:
+            return True
+        # ``_expire`` already dropped the members who joined too long ago
+        suspicious = sum(count for user_id, count in counts.items() if count >= self.repeats or user_id in state.joined)
+        if suspicious >= self.threshold:
+            return True
+        self.metrics["not_raids"] += 1
+        return False
+
+    def _extend(self, flood: _Flood, now: float, messages: list, started: bool) -> FloodAction:
+        flood.last_seen = now
+        flood.messages += len(messages)
+        self.metrics["flood_messages"] += len(messages)
+        users = []
+        for _, user_id in messages:
+            # The first response to a sender is deleting their copies; only
+            # posting again after that gets them muted
+            if started or user_id not in flood.users:
+                flood.users.add(user_id)
+            elif user_id not in flood.muted:
+                flood.muted.add(user_id)
+                users.append(user_id)
+        return FloodAction(messages, users, started)
+
+    def _add(self, state: _ChatFlood, entry: _Entry) -> None:
+        if len(state.entries) == state.entries.maxlen:
+            self._unindex(state, state.entries[0])
+        state.entries.append(entry)
+        for band in entry.bands:
+            state.by_band.setdefault(band, set()).add(entry)
+
+    def _discard(self, state: _ChatFlood, entry: _Entry) -> None:
+        state.entries.remove(entry)
+        self._unindex(state, entry)
+
+    @staticmethod
+    def _unindex(state: _ChatFlood, entry: _Entry) -> None:
+        for band in entry.bands:
+            entries = state.by_band.get(band)
+            if entries is not None:
+                entries.discard(entry)
+                if not entries:
+                    del state.by_band[band]
+
+    def _expire(self, state: _ChatFlood, now: float) -> None:
+        entries = state.entries
+        while entries and entries[0].at < now - self.window:
+            self._unindex(state, entries.popleft())
+        if state.floods:
+            state.floods = [flood for flood in state.floods if flood.last_seen >= now - self.window]
+        if state.joined:
+            self._expire_joined(state, now)
+
+    def _expire_joined(self, state: _ChatFlood, now: float) -> None:
+        joined = state.joined
+        while joined:
+            user_id, at = next(iter(joined.items()))
+            if at >= now - self.new_member_seconds:
+                break
+            del joined[user_id]
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        stats["chats"] = len(self._chats)
+        stats["verdicts"] = len(self._verdicts)
+        stats["active_floods"] = sum(len(state.floods) for state in self._chats.values())
+        return stats
+
+
+flood_detector = FloodDetector()
+
+__all__ = ["FloodDetector", "FloodAction", "RESPONSES", "UNKNOWN", "compact_text", "content_sketch", "similarity", "flood_detector"]
@@ -0,0 +1,61 @@
+from async_db import get_groups, init_group_table
+from core import logger
+
+
+class GroupRegistry:
+    """group_id -> title of every group in the ``groups`` table, kept in memory.
+
+    Loaded once at startup; afterwards the per-message "is this group
+    registered?" check is a dict lookup and SQLite is only touched when a
+    group is new or its title changed.
+    """
+
+    def __init__(self):
+        self._groups = {}
+
+    def __contains__(self, group_id: int) -> bool:
+        return group_id in self._groups
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def title(self, group_id: int):
+        return self._groups.get(group_id)
+
+    async def load(self) -> None:
+        self._groups = dict(await get_groups())
+        logger.info(f"Guruhlar ro'yxati yuklandi: {len(self._groups)} ta guruh")
+
+    async def register(self, group_id: int, group_title: str = None) -> None:
+        """Write the group (and its title) through to the database."""
+        if not group_title:
+            group_title = f"Group_{abs(group_id)}"
+        previous = self._groups.get(group_id)
+        # Set before the write so messages arriving meanwhile don't repeat it
+        self._groups[group_id] = group_title
+        try:
+            await init_group_table(group_id, group_title)
+        except Exception:
+            if previous is None:
+                self._groups.pop(group_id, None)
+            else:
+                self._groups[group_id] = previous
+            raise
+
+    async def ensure(self, group_id: int, group_title: str = None) -> None:
+        """Register the group unless it is already known under this title."""
+        known = self._groups.get(group_id)
+        if known is not None and (not group_title or known == group_title):
+            return
+        if known is None and not group_title:
+            # Same as before: untitled chats are registered on first violation
+            return
+        await self.register(group_id, group_title)
+
+    def invalidate(self, group_id: int) -> None:
+        self._groups.pop(group_id, None)
+
+
+group_registry = GroupRegistry()
+
+__all__ = ["GroupRegistry", "group_registry"]
@@ -5,17 +5,19 @@ from aiogram.types import Message, ChatMemberUpdated, CallbackQuery, InlineKeybo
 from aiogram import Router
 from aiogram.filters import CommandStart
 
-from core import bot, logger
-from database import init_group_table, group_table_exists
-from moderation import moderation_bot
-from logs import log_delete_failure
+from core import logger
+from chats import chat_metadata
+from groups import group_registry
+from moderation import moderation_bot, moderation_batcher
+from deleter import message_deleter
+from flood import flood_detector
 
 router = Router()
 
 
 @router.message(CommandStart(), F.chat.type == ChatType.PRIVATE)
 async def handle_start(message: Message):
-    add_group_url = f"https://t.me/{(await bot.me()).username}?startgroup=new"
+    add_group_url = f"https://t.me/{(await chat_metadata.get_me()).username}?startgroup=new"
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[[InlineKeyboardButton(text="➕ Guruhga qo‘shish", url=add_group_url)]]
     )
@@ -52,14 +54,25 @@ async def handle_captcha_callback(callback: CallbackQuery):
         await callback.answer("❌ CAPTCHA topilmadi!", show_alert=True)
 
 
+@router.message(F.new_chat_title)
+async def on_title_changed(message: Message):
+    group_registry.invalidate(message.chat.id)
+    await group_registry.register(message.chat.id, message.new_chat_title)
+    logger.info(f"Guruh nomi o'zgardi: {message.new_chat_title} ({message.chat.id})")
+
+
 @router.message(~F.text.startswith("/"))
 async def handle_all_messages(message: Message):
     if message.chat.type not in [ChatType.PRIVATE, ChatType.GROUP, ChatType.SUPERGROUP]:
         return
     user_id = message.from_user.id
     chat_id = message.chat.id
-    if group_table_exists(chat_id) is False and message.chat.title:
-        init_group_table(chat_id, message.chat.title)
+    chat_metadata.remember(message.chat)
+    # Dict lookup; only a new group or a changed title reaches the database
+    await group_registry.ensure(chat_id, message.chat.title)
+    if message.chat.type != ChatType.PRIVATE:
+        # Ring buffer of the sender's recent messages, purged if they get banned
+        message_deleter.remember(chat_id, user_id, message.message_id)
     # Skip commands (in case of entities like via clients sending rich entities)
     try:
         if message.entities:
@@ -71,39 +84,53 @@ async def handle_all_messages(message: Message):
     content = message.text or message.caption or ""
     if not content:
         return
-    matched = moderation_bot.find_forbidden_word(content)
+    if message.chat.type != ChatType.PRIVATE and moderation_bot.flood_response(chat_id) != "off":
+        # Copies of one text in a burst are handled together, without scanning each of them
+        flood = flood_detector.observe(chat_id, user_id, message.message_id, content)
+        if flood:
+            await moderation_bot.stop_flood(chat_id, flood)
+            return
+    # Batched with other updates handled in the same tick (catch-up bursts)
+    matched = await moderation_batcher.check(content, chat_id)
     if matched:
         chat_title = message.chat.title or f"Chat {chat_id}"
         user_name = message.from_user.full_name or message.from_user.username or f"User {user_id}"
-        if not group_table_exists(chat_id):
-            init_group_table(chat_id, chat_title)
-        total_count, daily_count, _ = moderation_bot.add_violation(user_id, chat_id, chat_title)
+        # Registers the group if needed and returns the new counters in one round trip
+        total_count, daily_count, _ = await moderation_bot.add_violation(user_id, chat_id, chat_title)
         logger.info(f"Qoida buzish: User {user_id}, So'z: {matched}, Total: {total_count}, Daily: {daily_count}")
-        await moderation_bot.send_group_notification(chat_id, user_id, user_name, 0, total_count, daily_count)
-        try:
-            await message.delete()
-        except Exception as e:
-            logger.error(f"Habar o'chirishda xatolik: {e}")
-            try:
-                log_delete_failure(logger, chat_id=chat_id, message_id=message.message_id, user_id=user_id, reason=str(e))
-            except Exception:
-                pass
+        # Delete and restrict are queued in the chat's order; notices, and waiting for
+        # Telegram to answer, happen in the background, so the chat's next update
+        # never waits on the rate limits. Deletes are batched per chat into
+        # deleteMessages calls; failures are logged per batch
+        message_deleter.delete(chat_id, message.message_id, user_id)
         if daily_count >= 5:
             await moderation_bot.ban_user(chat_id, user_id)
-            await moderation_bot.send_private_warning(user_id, 0, daily_count)
+            moderation_bot.notify_violation(chat_id, user_id, user_name, total_count, daily_count, warning_duration=0)
             return
         duration = moderation_bot.get_punishment_duration(daily_count)
         if duration > 0:
-            if await moderation_bot.restrict_user(chat_id, user_id, duration):
-                await moderation_bot.send_private_warning(user_id, duration, daily_count)
+            restriction = await moderation_bot.queue_restriction(chat_id, user_id, duration)
+            moderation_bot.notify_violation(chat_id, user_id, user_name, total_count, daily_count, duration, restriction)
+        else:
+            moderation_bot.notify_violation(chat_id, user_id, user_name, total_count, daily_count)
+
+
+ADMIN_STATUSES = ("administrator", "creator")
 
 
 @router.chat_member()
 async def on_bot_added(event: ChatMemberUpdated):
-    if event.new_chat_member.user.id == (await bot.me()).id and event.new_chat_member.status in ("administrator", "member"):
+    # Promotions, demotions and rights edits: the cached admin list is stale now
+    if event.old_chat_member.status in ADMIN_STATUSES or event.new_chat_member.status in ADMIN_STATUSES:
+        moderation_bot.invalidate_admins(event.chat.id)
+    chat_metadata.remember(event.chat)
+    if event.new_chat_member.status == "member" and event.old_chat_member.status in ("left", "kicked"):
+        # Copies from accounts that only just joined are a raid signal
+        flood_detector.joined(event.chat.id, event.new_chat_member.user.id)
+    if event.new_chat_member.user.id == (await chat_metadata.get_me()).id and event.new_chat_member.status in ("administrator", "member"):
         group_id = event.chat.id
         group_title = event.chat.title or f"Group {group_id}"
-        init_group_table(group_id, group_title)
+        await group_registry.register(group_id, group_title)
         logger.info(f"✅ Bot yangi guruhga qo'shildi: {group_title} ({group_id})")
 
 
@@ -112,7 +139,7 @@ async def on_new_member(event: ChatMemberUpdated):
     if (
         event.new_chat_member.status == "member"
         and event.old_chat_member.status in ["left", "kicked", None]
-        and event.new_chat_member.user.id != (await bot.me()).id
+        and event.new_chat_member.user.id != (await chat_metadata.get_me()).id
     ):
         user_id = event.new_chat_member.user.id
         chat_id = event.chat.id
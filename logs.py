@@ -1,6 +1,6 @@
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 LOG_FILE_PATH = os.path.join(os.path.dirname(__file__), "bot.log")
 
@@ -29,6 +29,26 @@ def setup_logging() -> logging.Logger:
     return logger
 
 
+def log_to_queue(logger: logging.Logger, queue, name: str) -> None:
+    """Send this process's records to ``queue`` instead of its own handlers.
+
+    Worker processes must not rotate bot.log on their own; the front
+    process writes everything through ``listen_for_logs``.
+    """
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    handler = QueueHandler(queue)
+    handler.setFormatter(logging.Formatter(f"[{name}] %(message)s"))
+    logger.addHandler(handler)
+
+
+def listen_for_logs(logger: logging.Logger, queue) -> QueueListener:
+    listener = QueueListener(queue, *logger.handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
 def log_delete_failure(logger: logging.Logger, *, chat_id: int, message_id: int, user_id: int, reason: str):
     logger.error(
         "Delete failure | chat_id=%s | message_id=%s | user_id=%s | reason=%s",
@@ -39,6 +59,20 @@ def log_delete_failure(logger: logging.Logger, *, chat_id: int, message_id: int,
     )
 
 
+def log_delete_failures(logger: logging.Logger, *, chat_id: int, failures: list, total: int):
+    """One line for a whole deletion batch; failures are (message_id, user_id, reason)."""
+    by_reason = {}
+    for message_id, user_id, reason in failures:
+        by_reason.setdefault(reason, []).append(f"{message_id}/{user_id}")
+    logger.error(
+        "Delete failures | chat_id=%s | failed=%s/%s | %s",
+        chat_id,
+        len(failures),
+        total,
+        " | ".join(f"reason={reason} message_id/user_id={','.join(ids)}" for reason, ids in by_reason.items()),
+    )
+
+
 def tail_logs(lines: int = 100) -> str:
     if not os.path.exists(LOG_FILE_PATH):
         return "(no logs yet)"
@@ -50,6 +84,6 @@ def tail_logs(lines: int = 100) -> str:
         return f"Failed to read logs: {e}"
 
 
-__all__ = ["setup_logging", "log_delete_failure", "tail_logs", "LOG_FILE_PATH"]
+__all__ = ["setup_logging", "log_to_queue", "listen_for_logs", "log_delete_failure", "log_delete_failures", "tail_logs", "LOG_FILE_PATH"]
 
 
@@ -0,0 +1,316 @@
+import re
+from collections import deque
+from typing import Iterable, Iterator, NamedTuple
+
+from normalizer import Prefilter, canonical_forms, canonical_index
+
+
+class Match(NamedTuple):
+    word: str
+    start: int
+    end: int
+
+
+def is_word_char(ch: str) -> bool:
+    """Same notion of a word character as ``\\w`` in ``re`` for str patterns."""
+    return ch.isalnum() or ch == "_"
+
+
+# Uzbek and Russian endings a word keeps its meaning under: "ahmoqsan",
+# "dalbayoblar", "gandonlarni", "pidarasy". Up to two suffixes, then
+# possibly one ending that only closes a word. Only the words a matcher
+# is given as ``inflected`` take them: "bich" + "im" and "jala" + "lar"
+# are ordinary words.
+_SUFFIXES = (
+    "lar", "ning", "ni", "ga", "ka", "qa", "dan", "da", "tan", "ta", "imiz", "ingiz", "im", "ing",
+    "miz", "ngiz", "si", "san", "man", "siz", "dir", "mi",
+)
+_ENDINGS = ("ami", "am", "ah", "om", "ov", "oy", "ey", "ng", "a", "e", "i", "m", "u", "y")
+# Shorter words ("am", "it", "mol") start too many ordinary ones
+# ("amma", "itlar", "mollar") to take endings even when listed
+MIN_STEM_LENGTH = 4
+
+_INFLECTION = f"(?:(?:{'|'.join(_SUFFIXES)}){{1,2}}(?:{'|'.join(_ENDINGS)})?|(?:{'|'.join(_ENDINGS)}))(?!\\w)"
+_INFLECTION_RE = re.compile(_INFLECTION)
+# Digits tacked on the end ("ahmoq123") do not make it another word
+_TRAILING_DIGITS = "[0-9]*(?!\\w)"
+_TRAILING_DIGITS_RE = re.compile(_TRAILING_DIGITS)
+
+
+def takes_endings(word: str, inflected=frozenset()) -> bool:
+    return word in inflected and word[-1].isalnum() and sum(ch.isalnum() for ch in word) >= MIN_STEM_LENGTH
+
+
+def at_word_boundary(text: str, start: int, end: int, word: str = "", inflected=frozenset()) -> bool:
+    if start > 0 and is_word_char(text[start - 1]):
+        return False
+    if end < len(text) and is_word_char(text[end]):
+        if _TRAILING_DIGITS_RE.match(text, end) is not None:
+            return True
+        return bool(word) and takes_endings(word, inflected) and _INFLECTION_RE.match(text, end) is not None
+    return True
+
+
+class AhoCorasick:
+    """Multi-pattern automaton: one linear pass over the text finds every pattern.
+
+    Built once from the word list. States are stored in flat lists
+    (transition dicts, failure links, outputs) so a scan is a plain loop
+    with dict lookups only.
+    """
+
+    def __init__(self, words: Iterable[str], inflected=frozenset()):
+        self.inflected = inflected
+        self.words = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        seen = set()
+        for word in words:
+            if not word or word in seen:
+                continue
+            seen.add(word)
+            self._add(word)
+        self._build_links()
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def _add(self, word: str) -> None:
+        state = 0
+        for ch in word:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state] = self._out[state] + (len(self.words),)
+        self.words.append(word)
+
+    def _build_links(self) -> None:
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                # Longest pattern first: own output, then inherited suffixes
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+    def iter_matches(self, text: str, whole_word: bool = False) -> Iterator[Match]:
+        """Yield every occurrence in order of its end offset (longest first on ties)."""
+        goto, fail, out, words, inflected = self._goto, self._fail, self._out, self.words, self.inflected
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = i + 1
+                for idx in out[state]:
+                    word = words[idx]
+                    start = end - len(word)
+                    if whole_word and not at_word_boundary(text, start, end, word, inflected):
+                        continue
+                    yield Match(word, start, end)
+
+    def find_first(self, text: str, whole_word: bool = False) -> Match | None:
+        for match in self.iter_matches(text, whole_word):
+            return match
+        return None
+
+    def find_all(self, text: str, whole_word: bool = False) -> list[Match]:
+        return list(self.iter_matches(text, whole_word))
+
+
+def _trie_regex(node: dict) -> str:
+    end = "" in node
+    alternatives = [re.escape(ch) + _trie_regex(child) for ch, child in sorted(node.items()) if ch]
+    if not alternatives:
+        return ""
+    body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+    if end:
+        # Greedy optional tail: the longer word is tried before its prefix
+        body = (body if len(alternatives) > 1 else "(?:" + body + ")") + "?"
+    return body
+
+
+def build_boundary_pattern(words: Iterable[str], inflected=frozenset()) -> re.Pattern | None:
+    """Compile the whole word list into one trie-shaped, word-bounded regex.
+
+    Shared prefixes are factored out, so one ``search`` replaces a search per
+    word, and longer words win over their prefixes ("fuck you" over "fuck").
+    Words in ``inflected`` of MIN_STEM_LENGTH letters or more may go on with
+    an ending ("ahmoqsan"), and any word with digits ("ahmoq123"); the match
+    still covers the word alone.
+    """
+    stems, short = {}, {}
+    for word in words:
+        if not word:
+            continue
+        node = stems if takes_endings(word, inflected) else short
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    alternatives = []
+    if stems:
+        alternatives.append(f"{_trie_regex(stems)}(?={_TRAILING_DIGITS}|{_INFLECTION})")
+    if short:
+        alternatives.append(f"{_trie_regex(short)}(?={_TRAILING_DIGITS})")
+    if not alternatives:
+        return None
+    return re.compile(rf"(?<!\w)(?:{'|'.join(alternatives)})")
+
+
+def search_boundary(pattern: re.Pattern | None, text: str) -> Match | None:
+    if pattern is None:
+        return None
+    found = pattern.search(text)
+    if found is None:
+        return None
+    return Match(found.group(), found.start(), found.end())
+
+
+def prefilter_summary(metrics: dict) -> dict:
+    """Prefilter counters plus the skip rate and the share of passed texts that were clean anyway."""
+    checked = metrics["skipped"] + metrics["passed"]
+    return {
+        **metrics,
+        "skip_rate": round(metrics["skipped"] / checked, 4) if checked else 0.0,
+        "false_pass_rate": round((metrics["passed"] - metrics["matched"]) / metrics["passed"], 4) if metrics["passed"] else 0.0,
+    }
+
+
+class WordMatcher:
+    """Everything needed to check text against one forbidden word list.
+
+    Spelling variants share one canonical form, so the matchers are built
+    from the canonical index rather than the raw list: one fused,
+    word-bounded regex for the verdict, and an automaton for listing every
+    hit. Reported words are the original list entries. Only the words
+    also given in ``inflected`` match with an ending.
+
+    Before any of that a prefilter (one regex search or a look at the
+    raw characters, see ``Prefilter``) throws out texts that cannot
+    contain any of the words; its counters show how much it saves.
+    """
+
+    def __init__(self, words: Iterable[str], index: dict | None = None, inflected: Iterable[str] = ()):
+        self.words = [word.lower() for word in words]
+        self.index = canonical_index(self.words) if index is None else index
+        # Canonical forms, like the keys of ``index``
+        self.inflected = frozenset(canonical_index(word.lower() for word in inflected))
+        self._prefilter = Prefilter(self.index)
+        self._boundary_pattern = build_boundary_pattern(self.index, self.inflected)
+        self._automaton = AhoCorasick(self.index, self.inflected)
+        self.prefilter_metrics = {"skipped": 0, "passed": 0, "matched": 0}
+
+    def may_match(self, text: str) -> bool:
+        if not self._prefilter(text):
+            self.prefilter_metrics["skipped"] += 1
+            return False
+        self.prefilter_metrics["passed"] += 1
+        return True
+
+    def prefilter_stats(self) -> dict:
+        return prefilter_summary(self.prefilter_metrics)
+
+    def derive(self, additions: Iterable[str] = (), exemptions: Iterable[str] = ()) -> "WordMatcher":
+        """This list plus ``additions`` minus ``exemptions``, as a new matcher.
+
+        The canonical index of this matcher is reused, so only the extra
+        words are canonicalized before the regex and automaton are compiled.
+        An exemption removes every spelling that shares its canonical form.
+        """
+        additions = [word.lower() for word in additions]
+        index = dict(self.index)
+        for canonical, word in canonical_index(additions).items():
+            index.setdefault(canonical, word)
+        for canonical in canonical_index(word.lower() for word in exemptions):
+            index.pop(canonical, None)
+        return WordMatcher(self.words + additions, index, self.inflected)
+
+    def first(self, text: str) -> Match | None:
+        if not text or not self.may_match(text):
+            return None
+        return self._scan(text)
+
+    def _scan(self, text: str) -> Match | None:
+        normalized, collapsed = canonical_forms(text)
+        # A word only counts when it stands on its own, so "am" does not
+        # fire inside "salam". One regex search per text form.
+        match = search_boundary(self._boundary_pattern, normalized)
+        if match is None and collapsed != normalized:
+            match = search_boundary(self._boundary_pattern, collapsed)
+        if match is None:
+            return None
+        self.prefilter_metrics["matched"] += 1
+        return match._replace(word=self.index[match.word])
+
+    def find(self, text: str) -> str | None:
+        match = self.first(text)
+        return match.word if match else None
+
+    def find_all(self, text: str) -> list[Match]:
+        """Every match (word, start, end), offsets into the canonical text."""
+        if not text or not self.may_match(text):
+            return []
+        normalized, collapsed = canonical_forms(text)
+        matches = self._automaton.find_all(normalized, whole_word=True)
+        if not matches and collapsed != normalized:
+            matches = self._automaton.find_all(collapsed, whole_word=True)
+        if matches:
+            self.prefilter_metrics["matched"] += 1
+        return [m._replace(word=self.index[m.word]) for m in matches]
+
+    def find_many(self, texts: Iterable[str], prefiltered: bool = False) -> list[str | None]:
+        """``find`` for a batch; each distinct text is checked once.
+
+        With ``prefiltered`` the texts have already passed ``may_match``
+        and go straight to the scan.
+        """
+        scan = self._scan if prefiltered else self.first
+        verdicts = {}
+        result = []
+        for text in texts:
+            if text not in verdicts:
+                match = scan(text)
+                verdicts[text] = match.word if match else None
+            result.append(verdicts[text])
+        return result
+
+
+# Process-pool side of WordMatcher.find_many: each worker builds its own
+# matcher once (initializer) and then only receives text chunks
+_worker_matcher = None
+
+
+def init_worker_matcher(words: list, inflected: list = ()) -> None:
+    global _worker_matcher
+    _worker_matcher = WordMatcher(words, inflected=inflected)
+
+
+def find_many_in_worker(texts: list) -> list:
+    return _worker_matcher.find_many(texts)
+
+
+__all__ = [
+    "AhoCorasick",
+    "WordMatcher",
+    "init_worker_matcher",
+    "find_many_in_worker",
+    "Match",
+    "is_word_char",
+    "at_word_boundary",
+    "build_boundary_pattern",
+    "search_boundary",
+    "prefilter_summary",
+]
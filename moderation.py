@@ -1,129 +1,188 @@
 import asyncio
-import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from aiogram.enums import ChatType, ChatMemberStatus
+from aiogram.enums import ChatType
 from aiogram.types import ChatPermissions
 
-from config import FORBIDDEN_WORDS, PUNISHMENT_DURATIONS, BLOCKED_MESSAGE_TEMPLATE, GROUP_NOTIFICATION_TEMPLATE, format_duration, format_until_time
-from database import (
-    get_violations_db,
-    add_violation_db,
-    clear_violations_db,
+from config import FORBIDDEN_WORDS, INFLECTED_WORDS, PUNISHMENT_DURATIONS, CAPTCHA_TIMEOUT, ADMIN_CACHE_TTL, BATCH_PROCESS_POOL_THRESHOLD, BATCH_PROCESS_POOL_WORKERS, OUTBOUND_DRAIN_TIMEOUT, FLOOD_MUTE_DURATION, FLOOD_RESPONSE, BLOCKED_MESSAGE_TEMPLATE, GROUP_NOTIFICATION_TEMPLATE, FLOOD_NOTIFICATION_TEMPLATE, FLOOD_MUTE_WARNING_TEMPLATE, format_duration, format_until_time
+from async_db import (
     add_captcha_user,
     is_captcha_user,
     remove_captcha_user,
     get_captcha_message_id,
+    get_group_words,
+    get_groups_with_words,
+    set_flood_response,
+    get_flood_responses,
 )
+from cache import TTLCache
+from chats import chat_metadata
 from core import bot, logger
+from outbound import ACTION, NOTICE, outbound
+from counters import violation_counters
+from deleter import message_deleter
+from digest import NotificationDigest
+from flood import RESPONSES, UNKNOWN, FloodAction, flood_detector
+from matcher import WordMatcher, init_worker_matcher, find_many_in_worker, prefilter_summary
+from normalizer import normalize_text
+from scheduler import job_scheduler
+from shards import current_shard
 
 
 class ModerationBot:
     def __init__(self):
         self.forbidden_words = [word.lower() for word in FORBIDDEN_WORDS]
         self.admin_notifications = {}
-        self.captcha_tasks = {}
-        self._forbidden_patterns = []
-        for w in self.forbidden_words:
-            try:
-                pattern = re.compile(rf"(?<!\\w){re.escape(w)}(?!\\w)", re.IGNORECASE)
-                self._forbidden_patterns.append(pattern)
-            except Exception:
-                continue
+        # Raids get one digest message per chat instead of a notice per violation
+        self.digest = NotificationDigest(self._send_group_notification)
+        # Notices and the outcome of queued restrictions are waited for in the
+        # background: the handler that queues them holds the chat's pipeline slot
+        self._tasks = set()
+        self.matcher = WordMatcher(self.forbidden_words, inflected=INFLECTED_WORDS)
+        self._process_pool = None
+        # chat_id -> WordMatcher for groups with their own additions/exemptions.
+        # Entries are only ever replaced whole, so a message that already
+        # picked a matcher finishes with it while a rebuild is swapped in.
+        self._group_matchers = {}
+        self._rebuild_tasks = {}
+        self._rebuild_pending = set()
+        # chat_id -> flood response set with /flood; other chats use FLOOD_RESPONSE
+        self._flood_responses = {}
+        # chat_id -> admin user ids; dropped early on promote/demote updates
+        self._admins = TTLCache(ADMIN_CACHE_TTL)
+        # Delayed actions go through the persistent scheduler, so they run
+        # even if the bot restarts before they are due
+        job_scheduler.register("unban", self.unban_user)
+        job_scheduler.register("captcha_timeout", self.captcha_timeout)
+        job_scheduler.register("delete_notification", self.delete_group_notification)
 
-    def contains_forbidden_word(self, text: str) -> bool:
-        if not text:
-            return False
-        try:
-            import unicodedata
-            # Normalize unicode (NFKD) and strip diacritics
-            nfkd = unicodedata.normalize("NFKD", (text or "")).lower()
-            without_marks = "".join(ch for ch in nfkd if not unicodedata.combining(ch))
-        except Exception:
-            without_marks = (text or "").lower()
-
-        # Normalize common apostrophes/quotes and separators to spaces
-        normalized = (
-            without_marks
-            .replace("’", " ")
-            .replace("ʻ", " ")
-            .replace("ʼ", " ")
-            .replace("`", " ")
-            .replace("·", " ")
-            .replace("–", "-")
-            .replace("—", "-")
-        )
-
-        # Collapse non-alphanumeric characters to spaces for token-boundary checks
-        try:
-            import re as _re
-            collapsed = _re.sub(r"[^a-z0-9]+", " ", normalized)
-        except Exception:
-            collapsed = normalized
+    def matcher_for(self, chat_id: int = None) -> WordMatcher:
+        return self._group_matchers.get(chat_id, self.matcher)
 
-        # Fast path: simple substring over normalized text
-        for w in self.forbidden_words:
-            if w in normalized:
-                return True
+    def contains_forbidden_word(self, text: str, chat_id: int = None) -> bool:
+        return self.matcher_for(chat_id).first(text) is not None
 
-        # Token-aware exact word/prefix/suffix boundaries via regex patterns prepared in __init__
-        for pat in self._forbidden_patterns:
-            if pat.search(normalized) or pat.search(collapsed):
-                return True
+    def find_forbidden_word(self, text: str, chat_id: int = None) -> str | None:
+        """Return the first matching forbidden token for diagnostics, else None."""
+        return self.matcher_for(chat_id).find(text)
 
-        # Last resort: token-by-token equality
-        tokens = set(collapsed.split())
-        if tokens:
-            for w in self.forbidden_words:
-                if w in tokens:
-                    return True
-        return False
+    def find_forbidden_matches(self, text: str, chat_id: int = None) -> list:
+        """Return every match (word, start, end), offsets into the canonical text."""
+        return self.matcher_for(chat_id).find_all(text)
 
-    def find_forbidden_word(self, text: str) -> str | None:
-        """Return the first matching forbidden token for diagnostics, else None."""
-        if not text:
-            return None
+    def find_forbidden_words(self, texts: list, chat_id: int = None) -> list:
+        """Batch version of find_forbidden_word: one verdict per text, in order."""
+        return self.matcher_for(chat_id).find_many(texts)
+
+    async def find_forbidden_words_async(self, texts: list, chat_id: int = None) -> list:
+        """Like find_forbidden_words, but large batches run in a process pool.
+
+        Pool workers only know the global list, so groups with their own
+        list are always checked inline.
+        """
+        if len(texts) < BATCH_PROCESS_POOL_THRESHOLD or chat_id in self._group_matchers:
+            return self.find_forbidden_words(texts, chat_id)
+        if self._process_pool is None:
+            # Spawned, not forked: this process already runs the database
+            # and log threads, whose locks a fork would copy mid-use
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=BATCH_PROCESS_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker_matcher,
+                initargs=(self.forbidden_words, INFLECTED_WORDS),
+            )
+        loop = asyncio.get_running_loop()
+        size = -(-len(texts) // BATCH_PROCESS_POOL_WORKERS)
+        chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
         try:
-            import unicodedata
-            nfkd = unicodedata.normalize("NFKD", (text or "")).lower()
-            without_marks = "".join(ch for ch in nfkd if not unicodedata.combining(ch))
-        except Exception:
-            without_marks = (text or "").lower()
-        normalized = (
-            without_marks
-            .replace("’", " ")
-            .replace("ʻ", " ")
-            .replace("ʼ", " ")
-            .replace("`", " ")
-            .replace("·", " ")
-            .replace("–", "-")
-            .replace("—", "-")
-        )
+            results = await asyncio.gather(
+                *(loop.run_in_executor(self._process_pool, find_many_in_worker, chunk) for chunk in chunks)
+            )
+        except Exception as e:
+            logger.error(f"Batch moderation in process pool failed, checking inline: {e}")
+            return self.find_forbidden_words(texts)
+        return [verdict for chunk in results for verdict in chunk]
+
+    def prefilter_stats(self) -> dict:
+        """Prefilter counters of the base and all group matchers, summed.
+
+        Counters live in each matcher, so process-pool batches and replaced
+        group matchers are not included.
+        """
+        totals = {"skipped": 0, "passed": 0, "matched": 0}
+        for matcher in (self.matcher, *self._group_matchers.values()):
+            for key in totals:
+                totals[key] += matcher.prefilter_metrics[key]
+        return prefilter_summary(totals)
+
+    async def build_group_matcher(self, chat_id: int) -> WordMatcher | None:
+        """Read the group's word list and compile its matcher off the event loop."""
+        additions, exemptions = await get_group_words(chat_id)
+        if not additions and not exemptions:
+            return None
+        return await asyncio.to_thread(self.matcher.derive, additions, exemptions)
+
+    def _swap_group_matcher(self, chat_id: int, matcher: WordMatcher | None) -> None:
+        if matcher is None:
+            self._group_matchers.pop(chat_id, None)
+        else:
+            self._group_matchers[chat_id] = matcher
+
+    def reload_group_words(self, chat_id: int) -> None:
+        """Rebuild the group's matcher in the background after its list changed.
+
+        Edits arriving while a rebuild runs are folded into one more rebuild.
+        """
+        self._rebuild_pending.add(chat_id)
+        task = self._rebuild_tasks.get(chat_id)
+        if task is None or task.done():
+            self._rebuild_tasks[chat_id] = asyncio.create_task(self._rebuild_group_matcher(chat_id))
+
+    async def _rebuild_group_matcher(self, chat_id: int) -> None:
         try:
-            import re as _re
-            collapsed = _re.sub(r"[^a-z0-9]+", " ", normalized)
-        except Exception:
-            collapsed = normalized
-        for w in self.forbidden_words:
-            if w in normalized:
-                return w
-        for pat, w in zip(self._forbidden_patterns, self.forbidden_words):
-            try:
-                if pat.search(normalized) or pat.search(collapsed):
-                    return w
-            except Exception:
+            while chat_id in self._rebuild_pending:
+                self._rebuild_pending.discard(chat_id)
+                matcher = await self.build_group_matcher(chat_id)
+                self._swap_group_matcher(chat_id, matcher)
+                logger.info(f"Guruh {chat_id} uchun so'zlar ro'yxati yangilandi")
+        except Exception as e:
+            logger.error(f"Failed to rebuild word list for chat {chat_id}: {e}")
+        finally:
+            self._rebuild_tasks.pop(chat_id, None)
+
+    async def load_group_word_lists(self) -> None:
+        for chat_id in await get_groups_with_words():
+            if not current_shard.owns(chat_id):
                 continue
-        tokens = set(collapsed.split())
-        for w in self.forbidden_words:
-            if w in tokens:
-                return w
-        return None
+            try:
+                self._swap_group_matcher(chat_id, await self.build_group_matcher(chat_id))
+            except Exception as e:
+                logger.error(f"Failed to load word list for chat {chat_id}: {e}")
+
+    async def load_flood_responses(self) -> None:
+        for chat_id, response in (await get_flood_responses()).items():
+            if current_shard.owns(chat_id) and response in RESPONSES:
+                self._flood_responses[chat_id] = response
+
+    def flood_response(self, chat_id: int) -> str:
+        return self._flood_responses.get(chat_id, FLOOD_RESPONSE)
+
+    async def set_flood_response(self, chat_id: int, response: str) -> None:
+        await set_flood_response(chat_id, response)
+        self._flood_responses[chat_id] = response
+
+    def shutdown(self) -> None:
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
 
-    def get_violation_count(self, user_id: int, group_id: int) -> tuple:
-        return get_violations_db(user_id, group_id)
+    async def get_violation_count(self, user_id: int, group_id: int) -> tuple:
+        return await violation_counters.get(group_id, user_id)
 
-    def add_violation(self, user_id: int, group_id: int, group_title: str = None) -> tuple:
-        add_violation_db(user_id, group_id, group_title)
-        return get_violations_db(user_id, group_id)
+    async def add_violation(self, user_id: int, group_id: int, group_title: str = None) -> tuple:
+        # Counted in memory (24h sliding window); persisted by the background flusher
+        return await violation_counters.record(group_id, user_id)
 
     def get_punishment_duration(self, daily_count: int) -> int:
         if daily_count <= 4:
@@ -132,13 +191,19 @@ class ModerationBot:
             return 0
 
     async def restrict_user(self, chat_id: int, user_id: int, duration: int) -> bool:
+        return await (await self.queue_restriction(chat_id, user_id, duration))
+
+    async def queue_restriction(self, chat_id: int, user_id: int, duration: int) -> asyncio.Task:
+        """Queue the restriction in the chat's order; the returned task tells whether it worked.
+
+        Only waits while the outbound queue is full, so the chat's next
+        update does not wait for Telegram to answer.
+        """
         try:
-            chat = await bot.get_chat(chat_id)
-            if chat.type == ChatType.GROUP:
-                await bot.ban_chat_member(chat_id=chat_id, user_id=user_id)
-                if duration > 0:
-                    asyncio.create_task(self.unban_user_after_duration(chat_id, user_id, duration))
-                return True
+            # Type comes from the update that triggered this; no get_chat round trip
+            banned = await chat_metadata.chat_type(chat_id) == ChatType.GROUP
+            if banned:
+                sent = await outbound.submit(ACTION, chat_id, bot.ban_chat_member, chat_id=chat_id, user_id=user_id)
             else:
                 permissions = ChatPermissions(
                     can_send_messages=False,
@@ -151,47 +216,123 @@ class ModerationBot:
                     can_pin_messages=False
                 )
                 until_date = datetime.now() + timedelta(seconds=duration)
-                await bot.restrict_chat_member(
+                sent = await outbound.submit(
+                    ACTION, chat_id, bot.restrict_chat_member,
                     chat_id=chat_id,
                     user_id=user_id,
                     permissions=permissions,
                     until_date=until_date
                 )
-                return True
+        except Exception as e:
+            logger.error(f"Failed to restrict user {user_id} in chat {chat_id}: {e}")
+            sent = banned = None
+        return self._spawn(self._restricted(chat_id, user_id, duration, sent, banned))
+
+    async def _restricted(self, chat_id: int, user_id: int, duration: int, sent, banned: bool) -> bool:
+        if sent is None:
+            return False
+        try:
+            await sent
+            if banned and duration > 0:
+                # Basic groups cannot restrict: the ban is lifted by the scheduler
+                await job_scheduler.schedule(duration, "unban", chat_id, user_id)
+            return True
         except Exception as e:
             logger.error(f"Failed to restrict user {user_id} in chat {chat_id}: {e}")
             return False
 
     async def ban_user(self, chat_id: int, user_id: int) -> bool:
         try:
-            await bot.ban_chat_member(chat_id=chat_id, user_id=user_id)
-            clear_violations_db(user_id, chat_id)
+            await outbound.call(ACTION, chat_id, bot.ban_chat_member, chat_id=chat_id, user_id=user_id)
+            message_deleter.purge_user(chat_id, user_id)
+            await violation_counters.clear(chat_id, user_id)
             return True
         except Exception as e:
             logger.error(f"Failed to ban user {user_id} in chat {chat_id}: {e}")
             return False
 
-    async def unban_user_after_duration(self, chat_id: int, user_id: int, duration: int) -> None:
+    async def stop_flood(self, chat_id: int, action: FloodAction) -> None:
+        """Bulk response to a flood: every copy is deleted, and with the "mute"
+        response a sender who posts it again after that is muted.
+
+        Admins are left alone, so a repeated announcement is never a flood.
+        Basic groups can only restrict by banning, so there a flood is never
+        more than deleted.
+        """
+        admins = set(await self.get_admins(chat_id))
+        messages = [(message_id, user_id) for message_id, user_id in action.messages if user_id not in admins]
+        for message_id, user_id in messages:
+            message_deleter.delete(chat_id, message_id, user_id)
+        mute = self.flood_response(chat_id) == "mute" and await chat_metadata.chat_type(chat_id) != ChatType.GROUP
+        if mute:
+            for user_id in action.users:
+                if user_id not in admins:
+                    logger.info(f"Flood: guruh {chat_id}, foydalanuvchi {user_id} takror yubordi, cheklanadi")
+                    await self.queue_restriction(chat_id, user_id, FLOOD_MUTE_DURATION)
+        if action.started and messages:
+            logger.info(f"Flood: guruh {chat_id}, {len(messages)} ta xabar o'chiriladi")
+            self._spawn(self._send_flood_notification(chat_id, len(messages), mute))
+
+    async def _send_flood_notification(self, chat_id: int, messages_count: int, mute: bool) -> None:
+        text = FLOOD_NOTIFICATION_TEMPLATE.format(messages_count=messages_count)
+        if mute:
+            text += FLOOD_MUTE_WARNING_TEMPLATE.format(duration=format_duration(FLOOD_MUTE_DURATION))
+        try:
+            await outbound.call(NOTICE, chat_id, bot.send_message, chat_id=chat_id, text=text, parse_mode="HTML")
+        except Exception as e:
+            logger.error(f"Failed to send flood notification: {e}")
+
+    async def unban_user(self, chat_id: int, user_id: int, message_id: int = None) -> None:
         try:
-            await asyncio.sleep(duration)
-            await bot.unban_chat_member(chat_id=chat_id, user_id=user_id)
+            await outbound.call(ACTION, chat_id, bot.unban_chat_member, chat_id=chat_id, user_id=user_id, only_if_banned=True)
             logger.info(f"Foydalanuvchi {user_id} guruh {chat_id} dan unban qilindi")
         except Exception as e:
             logger.error(f"Failed to unban user {user_id} in chat {chat_id}: {e}")
 
+    def notify_violation(
+        self, chat_id: int, user_id: int, user_name: str, total_count: int, daily_count: int,
+        warning_duration: int = None, restriction: asyncio.Task = None,
+    ) -> None:
+        """Send the group notice and, with ``warning_duration``, the private warning, without waiting for them.
+
+        With ``restriction`` (from ``queue_restriction``) the warning is only
+        sent if the restriction worked.
+        """
+        self._spawn(self._notify_violation(chat_id, user_id, user_name, total_count, daily_count, warning_duration, restriction))
+
+    async def _notify_violation(self, chat_id, user_id, user_name, total_count, daily_count, warning_duration, restriction) -> None:
+        await self.send_group_notification(chat_id, user_id, user_name, 0, total_count, daily_count)
+        if warning_duration is None or restriction is not None and not await restriction:
+            return
+        await self.send_private_warning(user_id, warning_duration, daily_count)
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def stop_notices(self, timeout: float = OUTBOUND_DRAIN_TIMEOUT) -> None:
+        """Give notices and restrictions still in the background ``timeout`` seconds to finish."""
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=timeout)
+
     async def send_private_warning(self, user_id: int, duration: int, daily_count: int) -> bool:
         try:
             message = BLOCKED_MESSAGE_TEMPLATE.format(
                 duration=format_duration(duration) if duration else "doimiy",
                 count=daily_count
             )
-            await bot.send_message(chat_id=user_id, text=message)
+            await outbound.call(NOTICE, user_id, bot.send_message, chat_id=user_id, text=message)
             return True
         except Exception as e:
             logger.error(f"Failed to send warning to user {user_id}: {e}")
             return False
 
     async def send_group_notification(self, chat_id: int, user_id: int, user_name: str, duration: int, total_count: int, daily_count: int) -> None:
+        await self.digest.notify(chat_id, user_id, user_name, duration, total_count, daily_count)
+
+    async def _send_group_notification(self, chat_id: int, user_id: int, user_name: str, duration: int, total_count: int, daily_count: int) -> None:
         try:
             message = GROUP_NOTIFICATION_TEMPLATE.format(
                 user_name=user_name,
@@ -201,7 +342,8 @@ class ModerationBot:
                 daily_count=daily_count,
                 until_time=format_until_time(duration) if duration else "doimiy"
             )
-            notification_msg = await bot.send_message(
+            notification_msg = await outbound.call(
+                NOTICE, chat_id, bot.send_message,
                 chat_id=chat_id,
                 text=message,
                 parse_mode="HTML"
@@ -212,25 +354,18 @@ class ModerationBot:
                 'duration': duration
             }
             if duration:
-                asyncio.create_task(self.delete_group_notification_after_unblock(user_id, duration))
+                await job_scheduler.schedule(duration, "delete_notification", chat_id, user_id, notification_msg.message_id)
         except Exception as e:
             logger.error(f"Failed to send group notification: {e}")
 
-    async def delete_group_notification_after_unblock(self, user_id: int, duration: int) -> None:
+    async def delete_group_notification(self, chat_id: int, user_id: int, message_id: int) -> None:
         try:
-            await asyncio.sleep(duration)
-            if user_id in self.admin_notifications:
-                notification_data = self.admin_notifications[user_id]
-                try:
-                    await bot.delete_message(
-                        chat_id=notification_data['chat_id'],
-                        message_id=notification_data['message_id']
-                    )
-                except Exception as e:
-                    logger.error(f"Failed to delete group notification for user {user_id}: {e}")
-                del self.admin_notifications[user_id]
+            await outbound.call(ACTION, chat_id, bot.delete_message, chat_id=chat_id, message_id=message_id)
         except Exception as e:
             logger.error(f"Failed to delete group notification for user {user_id}: {e}")
+        notification_data = self.admin_notifications.get(user_id)
+        if notification_data and notification_data['message_id'] == message_id:
+            del self.admin_notifications[user_id]
 
     async def send_captcha(self, chat_id: int, user_id: int, user_name: str) -> None:
         from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
@@ -243,54 +378,50 @@ class ModerationBot:
             message = (
                 f"👋 Salom <a href='tg://user?id={user_id}'>{user_name}</a>!\n\n"
                 f"🔐 Guruhga xush kelibsiz! Spam va botlardan himoya qilish uchun "
-                f"quyidagi tugmani bosing va 30 daqiqa ichida tasdiqlang.\n\n"
-                f"⏰ Vaqt: 30 daqiqa"
+                f"quyidagi tugmani bosing va {format_duration(CAPTCHA_TIMEOUT)} ichida tasdiqlang.\n\n"
+                f"⏰ Vaqt: {format_duration(CAPTCHA_TIMEOUT)}"
             )
-            captcha_msg = await bot.send_message(
+            captcha_msg = await outbound.call(
+                NOTICE, chat_id, bot.send_message,
                 chat_id=chat_id,
                 text=message,
                 reply_markup=keyboard
             )
-            add_captcha_user(user_id, chat_id, captcha_msg.message_id)
-            task = asyncio.create_task(self.captcha_timeout(chat_id, user_id, 1800))
-            self.captcha_tasks[f"{user_id}_{chat_id}"] = task
+            await add_captcha_user(user_id, chat_id, captcha_msg.message_id)
+            await job_scheduler.cancel("captcha_timeout", chat_id, user_id)
+            await job_scheduler.schedule(CAPTCHA_TIMEOUT, "captcha_timeout", chat_id, user_id)
         except Exception as e:
             logger.error(f"Failed to send CAPTCHA: {e}")
 
-    async def captcha_timeout(self, chat_id: int, user_id: int, timeout: int) -> None:
+    async def captcha_timeout(self, chat_id: int, user_id: int, message_id: int = None) -> None:
         try:
-            await asyncio.sleep(timeout)
-            if is_captcha_user(user_id, chat_id):
+            if await is_captcha_user(user_id, chat_id):
                 try:
-                    await bot.ban_chat_member(chat_id=chat_id, user_id=user_id)
-                    await bot.send_message(
+                    await outbound.call(ACTION, chat_id, bot.ban_chat_member, chat_id=chat_id, user_id=user_id)
+                    await outbound.call(
+                        NOTICE, chat_id, bot.send_message,
                         chat_id=chat_id,
                         text=f"⏰ <a href='tg://user?id={user_id}'>Foydalanuvchi</a> CAPTCHA tekshiruvidan o'ta olmadi va guruhdan chiqarildi."
                     )
                 except Exception as e:
                     logger.error(f"Failed to ban user after CAPTCHA timeout: {e}")
-                remove_captcha_user(user_id, chat_id)
-                task_key = f"{user_id}_{chat_id}"
-                if task_key in self.captcha_tasks:
-                    del self.captcha_tasks[task_key]
+                await remove_captcha_user(user_id, chat_id)
         except Exception as e:
             logger.error(f"CAPTCHA timeout error: {e}")
 
     async def verify_captcha(self, user_id: int, chat_id: int) -> bool:
         try:
-            if is_captcha_user(user_id, chat_id):
-                message_id = get_captcha_message_id(user_id, chat_id)
+            if await is_captcha_user(user_id, chat_id):
+                message_id = await get_captcha_message_id(user_id, chat_id)
                 if message_id:
                     try:
-                        await bot.delete_message(chat_id=chat_id, message_id=message_id)
+                        await outbound.call(ACTION, chat_id, bot.delete_message, chat_id=chat_id, message_id=message_id)
                     except:
                         pass
-                remove_captcha_user(user_id, chat_id)
-                task_key = f"{user_id}_{chat_id}"
-                if task_key in self.captcha_tasks:
-                    self.captcha_tasks[task_key].cancel()
-                    del self.captcha_tasks[task_key]
-                await bot.send_message(
+                await remove_captcha_user(user_id, chat_id)
+                await job_scheduler.cancel("captcha_timeout", chat_id, user_id)
+                await outbound.call(
+                    NOTICE, chat_id, bot.send_message,
                     chat_id=chat_id,
                     text=f"✅ <a href='tg://user?id={user_id}'>Foydalanuvchi</a> CAPTCHA tekshiruvidan muvaffaqiyatli o'tdi!"
                 )
@@ -301,36 +432,94 @@ class ModerationBot:
             return False
 
     async def is_admin(self, chat_id: int, user_id: int) -> bool:
+        # Answered from the chat's cached admin list: one API call per chat per TTL
+        return user_id in await self.get_admins(chat_id)
+
+    async def get_admins(self, chat_id: int) -> list:
         try:
-            member = await bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+            return list(await self._admins.get(chat_id, lambda: self._fetch_admins(chat_id)))
+        except Exception:
+            return []
+
+    async def _fetch_admins(self, chat_id: int) -> tuple:
+        admins = []
+        members = await bot.get_chat_administrators(chat_id)
+        for member in members:
             status = getattr(member, 'status', None)
-            if isinstance(status, ChatMemberStatus):
+            if hasattr(status, 'value'):
                 status_value = status.value
             else:
                 status_value = str(status).lower() if status else ""
-            return status_value in ["administrator", "creator", "owner"]
-        except Exception:
-            return False
+            if status_value in ["administrator", "creator", "owner"]:
+                admins.append(member.user.id)
+        return tuple(admins)
 
-    async def get_admins(self, chat_id: int) -> list:
+    def invalidate_admins(self, chat_id: int) -> None:
+        self._admins.invalidate(chat_id)
+
+
+class ModerationBatcher:
+    """Collects texts checked in the same event-loop tick into one batch.
+
+    When the bot catches up after downtime, aiogram dispatches the queued
+    updates together; their handlers all await ``check`` before the loop
+    moves on, so they are classified per matcher in one call instead of
+    one call each.
+    """
+
+    def __init__(self, moderation: ModerationBot):
+        self.moderation = moderation
+        self._pending = []
+
+    async def check(self, text: str, chat_id: int = None) -> str | None:
+        matcher = self.moderation.matcher_for(chat_id)
+        # Most texts cannot contain any of the words; those are never normalized
+        if not text or not matcher.may_match(text):
+            return None
+        # Repeated texts (forwards, copy-paste raids) reuse the verdict of their first copy
+        key = normalize_text(text)[0]
+        verdict = flood_detector.cached_verdict(key, matcher)
+        if verdict is not UNKNOWN:
+            return verdict
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future, matcher))
+        if len(self._pending) == 1:
+            asyncio.get_running_loop().call_soon(self._flush)
+        verdict = await future
+        flood_detector.remember_verdict(key, matcher, verdict)
+        return verdict
+
+    def _flush(self) -> None:
+        batch, self._pending = self._pending, []
+        by_matcher = {}
+        for text, future, matcher in batch:
+            by_matcher.setdefault(matcher, []).append((text, future))
+        for matcher, items in by_matcher.items():
+            if matcher is self.moderation.matcher and len(items) >= BATCH_PROCESS_POOL_THRESHOLD:
+                asyncio.create_task(self._flush_in_pool(items))
+            else:
+                self._resolve(items, matcher.find_many([text for text, _ in items], prefiltered=True))
+
+    async def _flush_in_pool(self, items: list) -> None:
         try:
-            admins = []
-            members = await bot.get_chat_administrators(chat_id)
-            for member in members:
-                status = getattr(member, 'status', None)
-                if hasattr(status, 'value'):
-                    status_value = status.value
-                else:
-                    status_value = str(status).lower() if status else ""
-                if status_value in ["administrator", "creator", "owner"]:
-                    admins.append(member.user.id)
-            return admins
-        except Exception:
-            return []
+            verdicts = await self.moderation.find_forbidden_words_async([text for text, _ in items])
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self._resolve(items, verdicts)
+
+    @staticmethod
+    def _resolve(items: list, verdicts: list) -> None:
+        for (_, future), verdict in zip(items, verdicts):
+            if not future.done():
+                future.set_result(verdict)
 
 
 moderation_bot = ModerationBot()
+moderation_batcher = ModerationBatcher(moderation_bot)
 
-__all__ = ["moderation_bot", "ModerationBot"]
+__all__ = ["moderation_bot", "moderation_batcher", "ModerationBot", "ModerationBatcher"]
 
 
@@ -0,0 +1,271 @@
+import re
+import sys
+import unicodedata
+from functools import lru_cache
+
+from config import NORMALIZE_CACHE_SIZE
+
+# One translate() call strips combining marks (left over from NFKD) and
+# maps apostrophes/quotes and dashes the way the matcher expects
+_TRANSLATION = {cp: None for cp in range(sys.maxunicode + 1) if unicodedata.combining(chr(cp))}
+_TRANSLATION.update(str.maketrans({
+    "’": " ",
+    "ʻ": " ",
+    "ʼ": " ",
+    "`": " ",
+    "·": " ",
+    "–": "-",
+    "—": "-",
+}))
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+# Evasion folding, applied only inside tokens that mix scripts or mix
+# letters with digits: "p1zdes", "sukа" (Cyrillic а). Whole Cyrillic words
+# ("кот") and plain numbers ("17") are real text and are left alone.
+_HOMOGLYPHS = {
+    # Cyrillic
+    "а": "a", "в": "b", "е": "e", "к": "k", "м": "m", "н": "h", "о": "o",
+    "р": "p", "с": "c", "т": "t", "у": "y", "х": "x", "і": "i", "ј": "j",
+    "ѕ": "s", "һ": "h", "ԛ": "q", "ԝ": "w", "ү": "y",
+    # Greek
+    "α": "a", "ε": "e", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p",
+    "τ": "t", "υ": "u", "χ": "x",
+}
+_LEET = {
+    "0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b",
+}
+_FOLDING = str.maketrans({**_HOMOGLYPHS, **_LEET})
+_HOMOGLYPH_FOLDING = str.maketrans(_HOMOGLYPHS)
+
+_TOKEN_RE = re.compile(r"\w+")
+# Cheap over-approximation of a mixed token: a Latin letter next to a digit,
+# or an ASCII letter/digit next to any non-ASCII character. Plain ranges keep
+# this a fast scan; _fold_token makes the exact decision per token.
+_MIXED_PAIR_RE = re.compile(r"[a-z][0-9]|[0-9][a-z]|[0-9a-z][^\x00-\x7f]|[^\x00-\x7f][0-9a-z]")
+_LATIN_RE = re.compile(r"[a-z]")
+# Digits inside a word ("p1zdes", "4hm0q") are letters in disguise; a
+# number in front of or after one ("4m", "5kin", "1t") is a measurement
+_INNER_DIGITS_RE = re.compile(r"[^\W\d_][0-9]+[^\W\d_]")
+# A letter typed three times or more is stretched ("jalaaaab"); a double
+# one is spelling ("jalla", "ahmoqqa") and stays
+_REPEAT_RE = re.compile(r"(.)\1{2,}")
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_text(text: str) -> tuple[str, str]:
+    """Return ``(normalized, collapsed)`` forms of a message.
+
+    ``normalized`` is lowercased NFKD text without diacritics and with
+    apostrophes/dashes unified; ``collapsed`` additionally turns every run of
+    non-alphanumeric characters into a single space. Results are cached on
+    the raw text, so repeated (forwarded, copy-pasted) messages are free.
+    """
+    if text.isascii():
+        # NFKD and combining marks cannot change ASCII
+        normalized = text.lower().translate(_TRANSLATION)
+    else:
+        normalized = unicodedata.normalize("NFKD", text).lower().translate(_TRANSLATION)
+    collapsed = _NON_ALNUM_RE.sub(" ", normalized)
+    return normalized, collapsed
+
+
+def _fold_token(match: re.Match) -> str:
+    token = match.group()
+    if token.isdigit():
+        return token
+    if token.isalpha() and (token.isascii() or not _LATIN_RE.search(token)):
+        return token
+    if _INNER_DIGITS_RE.search(token) is None:
+        return token.translate(_HOMOGLYPH_FOLDING)
+    return token.translate(_FOLDING)
+
+
+def canonicalize(normalized: str) -> str:
+    """Fold homoglyphs and digit-for-letter swaps, then squeeze stretched characters.
+
+    Takes an already normalized string (see ``normalize_text``). Forbidden
+    words and incoming text both go through this, so "jalaaap", "Poxxxuy"
+    and "p1zdes" meet "jalap", "poxuy" and "pizdes" in one canonical form.
+    """
+    if _MIXED_PAIR_RE.search(normalized):
+        normalized = _TOKEN_RE.sub(_fold_token, normalized)
+    return _REPEAT_RE.sub(r"\1", normalized)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def canonical_forms(text: str) -> tuple[str, str]:
+    """Return the canonical ``(normalized, collapsed)`` pair of a raw message."""
+    normalized = canonicalize(normalize_text(text)[0])
+    return normalized, _NON_ALNUM_RE.sub(" ", normalized)
+
+
+def canonical_index(words) -> dict:
+    """Map each canonical form to the first word of the list that produces it."""
+    index = {}
+    for word in words:
+        canonical = canonicalize(normalize_text(word)[0]).strip()
+        if canonical:
+            index.setdefault(canonical, word)
+    return index
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _char_output(ch: str) -> str:
+    """What ``normalize_text`` turns one character into.
+
+    NFKD, lowercasing and stripping combining marks all go character by
+    character, so a normalized text is these outputs put together (final
+    sigma aside, which the prefilter treats like sigma).
+    """
+    return unicodedata.normalize("NFKD", ch).lower().translate(_TRANSLATION)
+
+
+# _MIXED_PAIR_RE for raw text: an ASCII letter, digit or "_" beside a
+# neighbour that gets their token folded. Leading with the class lets
+# ``re`` skip over Cyrillic text to the few candidates
+_FOLDED_PAIR_RE = re.compile(
+    r"[0-9_a-zA-Z](?:(?<=[0-9])(?=[^\W\d])|(?<=[^\W\d][0-9])|(?<=_)(?=\w)|(?<=\w_)"
+    r"|(?<=[a-zA-Z])(?=[^\W\d_a-zA-Z])|(?<=[^\W\d_a-zA-Z][a-zA-Z]))"
+)
+
+# Letters a prefilter prefix takes from the start of each word; shorter
+# prefixes ("qan") keep passing ordinary words ("qancha")
+_PREFIX_LENGTH = 6
+
+
+class Prefilter:
+    """Cheap checks on the raw text that every text containing one of the words passes.
+
+    Built from canonical forms (the keys of ``canonical_index``) and run
+    before anything is normalized; a text that fails cannot match, so it
+    is never normalized.
+
+    ASCII text, and text whose other characters normalize to no letter or
+    digit at all (emoji, punctuation), gets one regex search for the first
+    six letters of some word at the start of a token, each letter in
+    either case or as its leet digit, repeated or not. Other text is
+    checked per distinct character: it passes when one of them becomes a
+    letter of some word, or is a homoglyph or leet digit beside something
+    that gets its token folded. Pure Cyrillic text against a Latin list is
+    out without being normalized.
+    """
+
+    def __init__(self, canonical_words):
+        words = [word for word in canonical_words if word]
+        letters = {ch for word in words for ch in word if ch.isalnum()}
+        # Final sigma only appears when a whole word is lowercased
+        if "ς" in letters:
+            letters.add("σ")
+        self.letters = frozenset(letters)
+        self.homoglyphs = frozenset(ch for ch, letter in _HOMOGLYPHS.items() if letter in letters and ch not in letters)
+        self.leet = frozenset(ch for ch, letter in _LEET.items() if letter in letters and ch not in letters)
+        self.prefixes = self._prefixes_pattern(words) if words else None
+        # Raw characters sorted as they show up: outside ASCII, anything but
+        # a plain separator (glued); one that becomes a letter of some word,
+        # or does not stay one character of its kind (passing); a homoglyph
+        # or leet digit that folds into a letter (folding)
+        self._seen = set()
+        self._glued = set()
+        self._passing = set()
+        self._folding = set()
+
+    def __call__(self, text: str) -> bool:
+        if not self.letters:
+            return False
+        if not text.isascii():
+            chars = set(text)
+            unseen = chars.difference(self._seen)
+            if unseen:
+                if len(self._seen) + len(unseen) > NORMALIZE_CACHE_SIZE:
+                    for seen in (self._seen, self._glued, self._passing, self._folding):
+                        seen.clear()
+                    unseen = chars
+                self._sort(unseen)
+            if not self._glued.isdisjoint(chars):
+                if not self._passing.isdisjoint(chars):
+                    return True
+                # Only homoglyphs and digits are left, and only a folded token folds them
+                return not self._folding.isdisjoint(chars) and _FOLDED_PAIR_RE.search(text) is not None
+            # Everything outside ASCII is a separator: judge it like ASCII text
+        return self.prefixes is None or self.prefixes.search(text) is not None
+
+    def _sort(self, chars: set) -> None:
+        for ch in chars:
+            output = _char_output(ch) if ch > "\x7f" else ch.lower()
+            if not self.letters.isdisjoint(output):
+                self._passing.add(ch)
+            if not self.homoglyphs.isdisjoint(output) or not self.leet.isdisjoint(output):
+                self._folding.add(ch)
+            if ch > "\x7f":
+                if not output or "_" in output or any(c.isalnum() for c in output):
+                    self._glued.add(ch)
+                word = ch.isalnum()
+                if len(output) != 1 or word and not ch.isalpha() or word != output.isalnum() or output.isascii():
+                    self._passing.add(ch)
+        self._seen.update(chars)
+
+    @staticmethod
+    def _prefixes_pattern(words: list) -> re.Pattern | None:
+        # A prefix is a tuple of letters, with None for a run of separators
+        # (a space, an apostrophe: in the collapsed form any run of them)
+        trie = {}
+        for word in words:
+            if not word[0].isalnum():
+                # Cannot anchor on a token start; the character checks alone decide
+                return None
+            prefix = []
+            for ch in word:
+                if ch.isalnum():
+                    if len(prefix) - prefix.count(None) == _PREFIX_LENGTH:
+                        break
+                    prefix.append(ch)
+                elif prefix[-1] is not None:
+                    prefix.append(None)
+            while prefix[-1] is None:
+                prefix.pop()
+            node = trie
+            for unit in prefix:
+                node = node.setdefault(unit, {})
+            node[""] = {}
+
+        def spelling(ch: str) -> str:
+            # The letter in either case, or a digit that folds into it
+            spelled = {ch} | {digit for digit, folded in _LEET.items() if folded == ch}
+            if ch.isascii():
+                spelled.add(ch.upper())
+            return re.escape("".join(sorted(spelled)))
+
+        def letter(ch: str) -> str:
+            return f"[{spelling(ch)}]+"
+
+        def alternatives(node: dict) -> str:
+            if "" in node:
+                # Some word ends or goes on from here: the prefix is enough
+                return ""
+            options = [
+                ("[^a-zA-Z0-9]+" if unit is None else letter(unit)) + alternatives(child)
+                for unit, child in sorted(node.items(), key=lambda item: item[0] or "")
+            ]
+            return options[0] if len(options) == 1 else "(?:" + "|".join(options) + ")"
+
+        # The first letter leads as a plain class, so ``re`` scans ahead
+        # for it; the lookbehinds then put it at a token start and pick
+        # the branch for the letter it was
+        firsts = "".join(spelling(ch) for ch in trie)
+        start = f"[{firsts}](?<![a-zA-Z0-9].)"
+        if not any(ch.isdigit() for ch in trie):
+            # A token of digits alone is never folded: "17" cannot be "it"
+            start += "(?!(?<=[0-9])[0-9]*(?![a-zA-Z0-9_]))"
+        branches = [
+            f"(?<=[{spelling(ch)}])[{spelling(ch)}]*{alternatives(child)}"
+            for ch, child in sorted(trie.items())
+        ]
+        return re.compile(start + "(?:" + "|".join(branches) + ")")
+
+
+def normalize_cache_info():
+    return normalize_text.cache_info(), canonical_forms.cache_info()
+
+
+__all__ = ["normalize_text", "canonicalize", "canonical_forms", "canonical_index", "Prefilter", "normalize_cache_info"]
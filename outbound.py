@@ -0,0 +1,303 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+from config import (
+    OUTBOUND_GLOBAL_RATE,
+    OUTBOUND_GROUP_RATE,
+    OUTBOUND_GROUP_BURST,
+    OUTBOUND_PRIVATE_RATE,
+    OUTBOUND_PRIVATE_BURST,
+    OUTBOUND_QUEUE_SIZE,
+    OUTBOUND_CONCURRENCY,
+    OUTBOUND_MAX_RETRIES,
+    OUTBOUND_DRAIN_TIMEOUT,
+)
+from core import logger
+
+# Lanes, highest priority first
+ACTION = 0  # deletes, bans, restricts, unbans
+NOTICE = 1  # messages to groups and users
+LANE_NAMES = ("action", "notice")
+
+
+class OutboundQueueFull(Exception):
+    """A notice was refused because the outbound queue is full."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Job:
+    __slots__ = ("lane", "chat_id", "method", "kwargs", "future", "attempts")
+
+    def __init__(self, lane, chat_id, method, kwargs, future):
+        self.lane = lane
+        self.chat_id = chat_id
+        self.method = method
+        self.kwargs = kwargs
+        self.future = future
+        self.attempts = 0
+
+
+class OutboundQueue:
+    """Every Bot API call that acts on a chat goes out through here.
+
+    A global token bucket keeps the bot under Telegram's overall limit and
+    per-chat buckets keep notices under the per-group and per-user limits;
+    chats take turns, and the action lane always goes before the notice
+    lane, so a flood of notices never delays a delete or a ban. A 429 pauses
+    only the chat it came from for ``retry_after`` and the call is retried;
+    network and server errors are retried with backoff.
+
+    The queue holds at most OUTBOUND_QUEUE_SIZE calls. When it is full an
+    action waits for room (backpressure on the handler) and a notice is
+    refused with OutboundQueueFull; both are counted in ``stats()``.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = OUTBOUND_GLOBAL_RATE,
+        maxsize: int = OUTBOUND_QUEUE_SIZE,
+        concurrency: int = OUTBOUND_CONCURRENCY,
+        max_retries: int = OUTBOUND_MAX_RETRIES,
+    ):
+        self.maxsize = maxsize
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._buckets = {}
+        self._paused = {}
+        # lane -> chat_id -> calls, chats in round-robin order
+        self._lanes = [OrderedDict() for _ in LANE_NAMES]
+        self._queued = 0
+        self._size = 0
+        self._slots = asyncio.Semaphore(concurrency)
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._runner = None
+        self._running = set()
+        self.metrics = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "retried": 0,
+            "rate_limited": 0,
+            "dropped": 0,
+            "backpressure_waits": 0,
+        }
+
+    async def call(self, lane: int, chat_id: int, method, /, **kwargs):
+        """Queue ``method(**kwargs)`` and return its result once sent.
+
+        ``chat_id`` is the chat the call is rate limited against (the target
+        group, or the user for private messages).
+        """
+        future = await self.submit(lane, chat_id, method, **kwargs)
+        # Shielded: a cancelled caller does not take a queued action with it
+        return await asyncio.shield(future)
+
+    async def submit(self, lane: int, chat_id: int, method, /, **kwargs) -> asyncio.Future:
+        """Queue ``method(**kwargs)`` and return the future of its result.
+
+        Returns once the call is queued, which for an action may mean
+        waiting for room, so a handler keeps its place in the chat's order
+        without waiting for Telegram. Whoever holds the future must await it.
+        """
+        if self._runner is None:
+            self.start()
+        if self._size >= self.maxsize:
+            if lane != ACTION:
+                self.metrics["dropped"] += 1
+                logger.warning(f"Outbound queue full ({self._size}), {LANE_NAMES[lane]} to chat {chat_id} refused")
+                raise OutboundQueueFull(f"outbound queue full ({self._size})")
+            self.metrics["backpressure_waits"] += 1
+            while self._size >= self.maxsize:
+                self._space.clear()
+                await self._space.wait()
+        future = asyncio.get_running_loop().create_future()
+        self._size += 1
+        self._idle.clear()
+        if self._size >= self.maxsize:
+            self._space.clear()
+        self.metrics["submitted"] += 1
+        self._enqueue(_Job(lane, chat_id, method, kwargs, future))
+        return future
+
+    def _enqueue(self, job: _Job, front: bool = False) -> None:
+        jobs = self._lanes[job.lane].get(job.chat_id)
+        if jobs is None:
+            jobs = self._lanes[job.lane][job.chat_id] = deque()
+        if front:
+            jobs.appendleft(job)
+        else:
+            jobs.append(job)
+        self._queued += 1
+        self._wakeup.set()
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if chat_id is not None and chat_id < 0:
+                bucket = TokenBucket(OUTBOUND_GROUP_RATE, OUTBOUND_GROUP_BURST)
+            else:
+                bucket = TokenBucket(OUTBOUND_PRIVATE_RATE, OUTBOUND_PRIVATE_BURST)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def _ready_in(self, lane: int, chat_id: int, now: float) -> float:
+        paused = self._paused.get(chat_id)
+        if paused is not None:
+            if paused > now:
+                return paused - now
+            del self._paused[chat_id]
+        if lane == NOTICE:
+            return self._bucket(chat_id).wait_time(now)
+        return 0.0
+
+    def _pick(self, now: float) -> tuple:
+        """Return (job, None) for the next call to send, or (None, seconds to wait)."""
+        if not self._queued:
+            return None, None
+        wait = self._global.wait_time(now)
+        if wait:
+            return None, wait
+        soonest = None
+        for lane, chats in enumerate(self._lanes):
+            for chat_id, jobs in chats.items():
+                ready_in = self._ready_in(lane, chat_id, now)
+                if ready_in:
+                    soonest = ready_in if soonest is None else min(soonest, ready_in)
+                    continue
+                job = jobs.popleft()
+                if jobs:
+                    chats.move_to_end(chat_id)
+                else:
+                    del chats[chat_id]
+                self._queued -= 1
+                self._global.take()
+                if lane == NOTICE:
+                    self._bucket(chat_id).take()
+                return job, None
+        return None, soonest
+
+    def _prune(self, now: float) -> None:
+        if len(self._buckets) > 1000:
+            for chat_id in [c for c, bucket in self._buckets.items() if bucket.idle(now)]:
+                del self._buckets[chat_id]
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            job, wait = self._pick(now)
+            if job is not None:
+                await self._slots.acquire()
+                task = asyncio.create_task(self._execute(job))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+                continue
+            self._prune(now)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, job: _Job) -> None:
+        try:
+            result = await job.method(**job.kwargs)
+        except TelegramRetryAfter as e:
+            # Only this chat waits; everyone else keeps going
+            self.metrics["rate_limited"] += 1
+            self._paused[job.chat_id] = time.monotonic() + e.retry_after
+            logger.warning(f"Flood control in chat {job.chat_id}: retrying in {e.retry_after}s")
+            self._enqueue(job, front=True)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            job.attempts += 1
+            if job.attempts > self.max_retries:
+                self._finish(job, error=e)
+            else:
+                self.metrics["retried"] += 1
+                asyncio.get_running_loop().call_later(min(2 ** job.attempts, 30), self._enqueue, job)
+        except Exception as e:
+            self._finish(job, error=e)
+        else:
+            self._finish(job, result=result)
+        finally:
+            self._slots.release()
+
+    def _finish(self, job: _Job, result=None, error: Exception = None) -> None:
+        if error is None:
+            self.metrics["completed"] += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        else:
+            self.metrics["failed"] += 1
+            if not job.future.done():
+                job.future.set_exception(error)
+        self._size -= 1
+        if self._size < self.maxsize:
+            self._space.set()
+        if not self._size:
+            self._idle.set()
+
+    def set_global_rate(self, rate: float) -> None:
+        """Change the overall calls/second, e.g. to one worker's share of the bot's limit."""
+        self._global = TokenBucket(rate, rate)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        stats = dict(self.metrics)
+        for lane, chats in enumerate(self._lanes):
+            stats[f"queued_{LANE_NAMES[lane]}"] = sum(len(jobs) for jobs in chats.values())
+        stats["in_flight"] = len(self._running)
+        stats["paused_chats"] = sum(1 for until in self._paused.values() if until > now)
+        return stats
+
+    def start(self) -> None:
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = OUTBOUND_DRAIN_TIMEOUT) -> None:
+        """Give queued calls ``timeout`` seconds to go out, then stop."""
+        if self._runner is None:
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Outbound queue stopped with {self._size} calls unsent: {self.stats()}")
+        self._runner.cancel()
+        for task in list(self._running):
+            task.cancel()
+        await asyncio.gather(self._runner, *self._running, return_exceptions=True)
+        self._runner = None
+
+
+outbound = OutboundQueue()
+
+__all__ = ["ACTION", "NOTICE", "OutboundQueue", "OutboundQueueFull", "TokenBucket", "outbound"]
@@ -0,0 +1,169 @@
+import asyncio
+import time
+from collections import deque
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+
+from config import UPDATE_WORKERS, CHAT_QUEUE_SIZE
+from core import logger
+from deleter import message_deleter
+
+# What ``run`` returns for an update that was never handled
+DROPPED = object()
+MERGED = object()
+
+
+class _Item:
+    __slots__ = ("func", "future", "queued_at", "droppable", "merge_key")
+
+    def __init__(self, func, future, queued_at, droppable, merge_key):
+        self.func = func
+        self.future = future
+        self.queued_at = queued_at
+        self.droppable = droppable
+        self.merge_key = merge_key
+
+
+class ChatPipeline:
+    """Runs updates in order within a chat and concurrently across chats.
+
+    Each chat has its own queue and at most one update of a chat runs at a
+    time, so two violations by the same user never race on the counters.
+    UPDATE_WORKERS bounds how many chats run at once; a chat gives its
+    worker back after every update, so a busy chat cannot starve the rest.
+
+    A chat's queue holds at most CHAT_QUEUE_SIZE updates. Beyond that the
+    oldest droppable update (a plain message) is dropped to make room, and
+    if none is droppable the new update is refused. An update with a
+    ``merge_key`` replaces a still-queued one with the same key.
+    """
+
+    def __init__(self, workers: int = UPDATE_WORKERS, queue_size: int = CHAT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._workers = asyncio.Semaphore(workers)
+        # chat_id -> deque of queued items; present while the chat has a runner
+        self._chats = {}
+        self._runners = set()
+        self._busy = 0
+        self._wait_total = 0.0
+        self.metrics = {"processed": 0, "failed": 0, "dropped": 0, "merged": 0, "refused": 0, "max_depth": 0, "max_wait": 0.0}
+
+    async def run(self, chat_id: int, func, droppable: bool = False, merge_key=None):
+        """Run ``func()`` after everything queued before it in the chat; return its result.
+
+        Returns DROPPED or MERGED instead if the update was pushed out of the
+        queue before its turn.
+        """
+        loop = asyncio.get_running_loop()
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            queue = self._chats[chat_id] = deque()
+            runner = asyncio.create_task(self._drain(chat_id, queue))
+            self._runners.add(runner)
+            runner.add_done_callback(self._runners.discard)
+        if merge_key is not None:
+            for i, item in enumerate(queue):
+                if item.merge_key == merge_key:
+                    del queue[i]
+                    self.metrics["merged"] += 1
+                    if not item.future.done():
+                        item.future.set_result(MERGED)
+                    break
+        if len(queue) >= self.queue_size and not self._evict(chat_id, queue):
+            self.metrics["refused"] += 1
+            return DROPPED
+        future = loop.create_future()
+        queue.append(_Item(func, future, time.monotonic(), droppable, merge_key))
+        if len(queue) > self.metrics["max_depth"]:
+            self.metrics["max_depth"] = len(queue)
+        return await future
+
+    def _evict(self, chat_id: int, queue: deque) -> bool:
+        for i, item in enumerate(queue):
+            if item.droppable:
+                del queue[i]
+                self.metrics["dropped"] += 1
+                if self.metrics["dropped"] % 1000 == 1:
+                    logger.warning(f"Chat {chat_id} navbati to'ldi ({len(queue) + 1}), eski xabarlar tashlanmoqda")
+                if not item.future.done():
+                    item.future.set_result(DROPPED)
+                return True
+        return False
+
+    async def _drain(self, chat_id: int, queue: deque) -> None:
+        try:
+            while queue:
+                async with self._workers:
+                    if not queue:
+                        break
+                    item = queue.popleft()
+                    if item.future.done():
+                        # Its caller was cancelled
+                        continue
+                    waited = time.monotonic() - item.queued_at
+                    self._wait_total += waited
+                    if waited > self.metrics["max_wait"]:
+                        self.metrics["max_wait"] = waited
+                    self._busy += 1
+                    try:
+                        result = await item.func()
+                    except Exception as e:
+                        self.metrics["failed"] += 1
+                        if not item.future.done():
+                            item.future.set_exception(e)
+                    else:
+                        self.metrics["processed"] += 1
+                        if not item.future.done():
+                            item.future.set_result(result)
+                    finally:
+                        self._busy -= 1
+        finally:
+            del self._chats[chat_id]
+            for item in queue:
+                if not item.future.done():
+                    item.future.cancel()
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        handled = self.metrics["processed"] + self.metrics["failed"]
+        stats["max_wait"] = round(stats["max_wait"], 3)
+        stats["avg_wait"] = round(self._wait_total / handled, 4) if handled else 0.0
+        stats["queued"] = sum(len(queue) for queue in self._chats.values())
+        stats["deepest"] = max((len(queue) for queue in self._chats.values()), default=0)
+        stats["chats"] = len(self._chats)
+        stats["busy_workers"] = self._busy
+        return stats
+
+
+class ChatPipelineMiddleware(BaseMiddleware):
+    """Outer update middleware that sends every chat's updates through ``ChatPipeline``."""
+
+    def __init__(self, pipeline: ChatPipeline):
+        self.pipeline = pipeline
+
+    async def __call__(self, handler, event, data):
+        chat = data.get("event_chat")
+        if chat is None:
+            return await handler(event, data)
+        message = event.message
+        content = message and (message.text or message.caption)
+        # Ordinary messages may be dropped in a flood; commands, joins and button presses are not
+        droppable = bool(content) and not content.startswith("/")
+        merge_key = None
+        callback = event.callback_query
+        if callback is not None:
+            # Repeated presses of the same button by the same user collapse into one
+            merge_key = ("callback", callback.from_user.id, callback.data)
+        result = await self.pipeline.run(chat.id, lambda: handler(event, data), droppable, merge_key)
+        if result is DROPPED or result is MERGED:
+            if message is not None and message.from_user is not None:
+                # Never checked, but still purged if the sender gets banned
+                message_deleter.remember(chat.id, message.from_user.id, message.message_id)
+            return UNHANDLED
+        return result
+
+
+chat_pipeline = ChatPipeline()
+
+__all__ = ["ChatPipeline", "ChatPipelineMiddleware", "DROPPED", "MERGED", "chat_pipeline"]
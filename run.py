@@ -1,15 +1,58 @@
 import asyncio
 from aiogram import types
 from core import bot, dp, logger
+from config import BOT_MODE, WORKERS
 from database import init_db
+import async_db
 from handlers import router as handlers_router
 from commands import router as commands_router
+from moderation import moderation_bot
+from counters import violation_counters
+from groups import group_registry
+from scheduler import job_scheduler
+from chats import chat_metadata
+from outbound import outbound
+from deleter import message_deleter
+from pipeline import ChatPipelineMiddleware, chat_pipeline
 
-async def main():
-    logger.info("🚀 Telegram moderatsiya boti ishga tushyabdi...")
+async def start_services():
+    """Bitta jarayonda yoki har bir workerda: database, keshlar va fon vazifalari"""
     init_db()
+    me = await chat_metadata.get_me()
+    logger.info(f"Bot: @{me.username} ({me.id})")
+    await group_registry.load()
+    await moderation_bot.load_group_word_lists()
+    await moderation_bot.load_flood_responses()
+    await violation_counters.load()
+    violation_counters.start()
+    outbound.start()
+    job_scheduler.start()
+
+async def stop_services():
+    moderation_bot.shutdown()
+    await job_scheduler.stop()
+    await moderation_bot.stop_notices()
+    await message_deleter.stop()
+    await outbound.stop()
+    await violation_counters.stop()
+    async_db.shutdown()
+
+def setup_dispatcher():
     dp.include_router(handlers_router)
     dp.include_router(commands_router)
+    # Bir chat yangilanishlari navbat bilan, turli chatlar parallel
+    dp.update.outer_middleware(ChatPipelineMiddleware(chat_pipeline))
+
+async def main():
+    logger.info("🚀 Telegram moderatsiya boti ishga tushyabdi...")
+    sharded = WORKERS > 1
+    if sharded:
+        # Bu jarayon faqat yangilanishlarni oladi va workerlarga taqsimlaydi;
+        # jadvallarni workerlar bir vaqtda yaratmasligi uchun avval shu yerda
+        init_db()
+    else:
+        await start_services()
+    setup_dispatcher()
     # Bot commands ro'yxatini sozlash
     commands = [
         types.BotCommand(command="admins", description="Adminlarni ogohlantirish"),
@@ -19,15 +62,32 @@ async def main():
         types.BotCommand(command="captcha", description="Foydalanuvchiga CAPTCHA yuborish (admin)"),
         types.BotCommand(command="admin_notification", description="Adminlarga shaxsiy xabar yuborish"),
         types.BotCommand(command="logs", description="Log faylini yuborish (admin)"),
+        types.BotCommand(command="addword", description="Guruhga taqiqlangan so'z qo'shish (admin)"),
+        types.BotCommand(command="allowword", description="So'zni guruhda ruxsat etish (admin)"),
+        types.BotCommand(command="delword", description="Guruh so'zini o'chirish (admin)"),
+        types.BotCommand(command="words", description="Guruh so'zlari ro'yxati (admin)"),
     ]
     
     try:
         await bot.set_my_commands(commands)
         logger.info("✅ Bot ishga tushmoqda!")
-        await dp.start_polling(bot)
+        if sharded:
+            from workers import run_sharded
+            await run_sharded(dp, bot)
+        elif BOT_MODE == "webhook":
+            from webhook import run_webhook
+            await run_webhook(dp, bot)
+        else:
+            # Avval webhook rejimida ishlagan bo'lsa, polling ishlashi uchun uni o'chiramiz
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
     except Exception as e:
         logger.error(f"Bot shu xatolik bilan to'xtadi: {e}")
     finally:
+        if sharded:
+            async_db.shutdown()
+        else:
+            await stop_services()
         await bot.session.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+from async_db import add_job, cancel_jobs, get_due_jobs, delete_jobs, next_job_time
+from config import SCHEDULER_BATCH_SIZE
+from core import logger
+from shards import current_shard
+
+
+class JobScheduler:
+    """Delayed actions (unbans, captcha timeouts, message cleanup) stored in SQLite.
+
+    Pending jobs live only in the ``scheduled_jobs`` table, ordered by its
+    due_at index, so they survive restarts and memory does not grow with
+    their number. One loop sleeps until the earliest due_at, runs everything
+    due in batches of SCHEDULER_BATCH_SIZE and goes back to sleep; jobs
+    that fell due while the bot was down run as soon as it starts.
+
+    With several worker processes each one only runs the jobs of its own
+    chats; jobs are always scheduled by the worker that owns the chat.
+    """
+
+    def __init__(self, batch_size: int = SCHEDULER_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._handlers = {}
+        self._next_due = None
+        self._wakeup = asyncio.Event()
+        self._runner = None
+
+    def register(self, kind: str, handler) -> None:
+        """``handler(chat_id, user_id, message_id)`` runs each job of this kind."""
+        self._handlers[kind] = handler
+
+    async def schedule(self, delay: float, kind: str, chat_id: int, user_id: int = None, message_id: int = None) -> int:
+        due_at = time.time() + delay
+        job_id = await add_job(due_at, kind, chat_id, user_id, message_id)
+        # None while the loop is between sleeps: it re-reads the next due time anyway
+        if self._next_due is None or due_at < self._next_due:
+            self._wakeup.set()
+        return job_id
+
+    async def cancel(self, kind: str, chat_id: int, user_id: int = None, message_id: int = None) -> int:
+        return await cancel_jobs(kind, chat_id, user_id, message_id)
+
+    async def _execute(self, kind: str, chat_id: int, user_id: int, message_id: int) -> None:
+        handler = self._handlers.get(kind)
+        if handler is None:
+            logger.error(f"No handler for scheduled job {kind!r} in chat {chat_id}")
+            return
+        try:
+            await handler(chat_id, user_id, message_id)
+        except Exception as e:
+            logger.error(f"Scheduled job {kind!r} failed in chat {chat_id}: {e}")
+
+    async def run_due(self) -> int:
+        """Run every job that is due now, a batch at a time; return how many ran."""
+        done = 0
+        while True:
+            jobs = await get_due_jobs(time.time(), self.batch_size, current_shard.index, current_shard.count)
+            if not jobs:
+                return done
+            await asyncio.gather(*(self._execute(*job[1:]) for job in jobs))
+            # Removed only after running: a crash mid-batch repeats it rather than losing it
+            await delete_jobs([job[0] for job in jobs])
+            done += len(jobs)
+            if len(jobs) < self.batch_size:
+                return done
+
+    async def _run(self) -> None:
+        replay = True
+        while True:
+            self._next_due = None
+            self._wakeup.clear()
+            try:
+                done = await self.run_due()
+                if replay and done:
+                    logger.info(f"Kechikkan {done} ta rejalashtirilgan amal bajarildi")
+                replay = False
+                self._next_due = await next_job_time(current_shard.index, current_shard.count)
+            except Exception as e:
+                logger.error(f"Scheduler loop error: {e}")
+                self._next_due = time.time() + 5
+            timeout = None if self._next_due is None else max(0.0, self._next_due - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Jobs stay in the database and are picked up on the next start
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+
+job_scheduler = JobScheduler()
+
+__all__ = ["JobScheduler", "job_scheduler"]
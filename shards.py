@@ -0,0 +1,45 @@
+def shard_of(chat_id: int, count: int) -> int:
+    """The worker that owns ``chat_id``; SQL filters use the same ``abs(chat_id) % count``."""
+    return abs(chat_id) % count
+
+
+def update_chat_id(update: dict) -> int:
+    """The chat a raw update (Bot API JSON) belongs to, 0 if it has none."""
+    for key, value in update.items():
+        if not isinstance(value, dict):
+            continue
+        chat = value.get("chat")
+        if chat is None and isinstance(value.get("message"), dict):
+            # callback_query
+            chat = value["message"].get("chat")
+        if chat is None:
+            # inline queries and the like: keep each user on one worker
+            chat = value.get("from") or value.get("user")
+        if isinstance(chat, dict):
+            return chat.get("id", 0)
+    return 0
+
+
+class Shard:
+    """Which part of the chats this process moderates.
+
+    A single process is shard 0 of 1 and owns every chat. With WORKERS > 1
+    each worker process is configured with its own index and only loads,
+    schedules and counts for chats where ``shard_of(chat_id)`` is its index.
+    """
+
+    def __init__(self):
+        self.index = 0
+        self.count = 1
+
+    def configure(self, index: int, count: int) -> None:
+        self.index = index
+        self.count = count
+
+    def owns(self, chat_id: int) -> bool:
+        return self.count == 1 or shard_of(chat_id, self.count) == self.index
+
+
+current_shard = Shard()
+
+__all__ = ["Shard", "current_shard", "shard_of", "update_chat_id"]
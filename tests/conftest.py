@@ -0,0 +1,17 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import async_db
+import database
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """A fresh database file, with async_db threads that have never connected to another one."""
+    path = str(tmp_path / "violations.db")
+    monkeypatch.setattr(database, "DB_PATH", path)
+    monkeypatch.setattr(async_db, "_writer", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(async_db, "_readers", ThreadPoolExecutor(max_workers=2))
+    yield path
+    async_db.shutdown()
@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+import database
+from counters import ViolationCounters
+
+GROUP = -1001
+
+
+def test_counts_survive_a_flush_and_a_restart(db_path):
+    database.init_db()
+
+    async def scenario():
+        counters = ViolationCounters()
+        counts = [(await counters.record(GROUP, 7))[:2] for _ in range(3)]
+        await counters.record(GROUP, 8)
+        await counters.flush()
+        restarted = ViolationCounters()
+        await restarted.load()
+        return counts, (await restarted.get(GROUP, 7))[:2], (await restarted.record(GROUP, 8))[:2]
+
+    counts, after_restart, next_count = asyncio.run(scenario())
+    assert counts == [(1, 1), (2, 2), (3, 3)]
+    assert after_restart == (3, 3)
+    assert next_count == (2, 2)
+    assert database.get_violation_state(7, GROUP, 0)[0] == 3
+
+
+def test_daily_count_is_a_sliding_window(db_path):
+    database.init_db()
+
+    async def scenario():
+        counters = ViolationCounters(window=0.2)
+        await counters.record(GROUP, 7)
+        await asyncio.sleep(0.3)
+        return (await counters.get(GROUP, 7))[:2], (await counters.record(GROUP, 7))[:2]
+
+    assert asyncio.run(scenario()) == ((1, 0), (2, 1))
+
+
+def test_clear_forgets_the_user_in_memory_and_on_disk(db_path):
+    database.init_db()
+
+    async def scenario():
+        counters = ViolationCounters()
+        await counters.record(GROUP, 7)
+        await counters.flush()
+        await counters.record(GROUP, 7)
+        await counters.clear(GROUP, 7)
+        await counters.flush()
+        return (await counters.get(GROUP, 7))[:2]
+
+    assert asyncio.run(scenario()) == (0, 0)
+    assert database.get_violation_state(7, GROUP, time.time() - 3600) == (0, [])
@@ -0,0 +1,83 @@
+import sqlite3
+
+import database
+
+
+LEGACY_COLUMNS = """
+    user_id INTEGER PRIMARY KEY,
+    total_count INTEGER DEFAULT 0,
+    daily_count INTEGER DEFAULT 0,
+    last_violation DATETIME DEFAULT CURRENT_TIMESTAMP,
+    last_daily_reset DATETIME DEFAULT CURRENT_TIMESTAMP
+"""
+
+
+def make_legacy_db(path: str, tables: dict) -> None:
+    """A database as the per-group-table version left it: {group_id: (table_name, [(user_id, total, daily)])}"""
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE groups (
+            group_id INTEGER PRIMARY KEY,
+            group_title TEXT,
+            table_name TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    for group_id, (table_name, rows) in tables.items():
+        conn.execute("INSERT INTO groups (group_id, group_title, table_name) VALUES (?, ?, ?)", (group_id, table_name, table_name))
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{table_name}" ({LEGACY_COLUMNS})')
+        conn.executemany(
+            f'INSERT INTO "{table_name}" (user_id, total_count, daily_count, last_daily_reset) VALUES (?, ?, ?, \'2024-01-01 00:00:00\')',
+            rows,
+        )
+    conn.commit()
+    conn.close()
+
+
+def columns(table: str) -> set:
+    return {row[1] for row in database.get_connection().execute(f'PRAGMA table_info("{table}")')}
+
+
+def test_init_db_creates_schema_on_empty_file(db_path):
+    database.init_db()
+    database.init_db()
+    tables = {row[0] for row in database.get_connection().execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert set(database.SCHEMA) <= tables
+    assert database.get_connection().execute("PRAGMA user_version").fetchone()[0] == 2
+
+
+def test_legacy_tables_named_like_schema_tables_are_migrated(db_path):
+    make_legacy_db(db_path, {
+        -1: ("group_a", [(10, 3, 1)]),
+        -2: ("Violations", [(20, 5, 2)]),
+        -3: ("Scheduled_Jobs", [(30, 7, 0)]),
+        -4: ("Group_Words", [(40, 1, 1), (41, 2, 0)]),
+    })
+
+    database.init_db()
+
+    assert {"group_id", "user_id", "total_count"} <= columns("violations")
+    assert {"due_at", "kind"} <= columns("scheduled_jobs")
+    assert {"word", "kind"} <= columns("group_words")
+    rows = database.get_connection().execute(
+        "SELECT group_id, user_id, total_count FROM violations ORDER BY group_id DESC, user_id"
+    ).fetchall()
+    assert rows == [(-1, 10, 3), (-2, 20, 5), (-3, 30, 7), (-4, 40, 1), (-4, 41, 2)]
+    leftovers = database.get_connection().execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND (name = 'group_a' OR name LIKE 'legacy_%')"
+    ).fetchall()
+    assert leftovers == []
+    # The new tables work after the migration
+    database.add_group_word(-4, "yomon", "add", 1)
+    assert database.get_group_words(-4) == (["yomon"], [])
+    database.add_job(1.0, "unban", -3, 30)
+    assert database.get_due_jobs(2.0, 10) != []
+
+
+def test_groups_sharing_a_legacy_table_all_get_its_rows(db_path):
+    make_legacy_db(db_path, {-1: ("same", [(10, 3, 1)]), -2: ("Same", [])})
+
+    database.init_db()
+
+    rows = database.get_connection().execute("SELECT group_id, user_id FROM violations ORDER BY group_id").fetchall()
+    assert rows == [(-2, 10), (-1, 10)]
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+import deleter
+from deleter import BULK_DELETE_LIMIT, DeletionBatcher
+from outbound import OutboundQueue
+
+GROUP = -1001
+
+
+class FakeBot:
+    def __init__(self, fail_bulk: bool = False, missing: set = frozenset()):
+        self.calls = []
+        self.fail_bulk = fail_bulk
+        self.missing = missing
+
+    async def delete_messages(self, chat_id, message_ids):
+        self.calls.append(("delete_messages", chat_id, list(message_ids)))
+        if self.fail_bulk:
+            raise RuntimeError("Bad Request: message can't be deleted")
+        return True
+
+    async def delete_message(self, chat_id, message_id):
+        self.calls.append(("delete_message", chat_id, message_id))
+        if message_id in self.missing:
+            raise RuntimeError("Bad Request: message to delete not found")
+        return True
+
+
+@pytest.fixture
+def fake_bot(monkeypatch):
+    def install(**kwargs):
+        bot = FakeBot(**kwargs)
+        monkeypatch.setattr(deleter, "bot", bot)
+        monkeypatch.setattr(deleter, "outbound", OutboundQueue(global_rate=1000))
+        return bot
+    return install
+
+
+def test_deletes_in_one_window_go_out_in_one_call(fake_bot):
+    bot = fake_bot()
+
+    async def scenario():
+        batcher = DeletionBatcher(window=0.05)
+        for message_id in (12, 10, 11):
+            batcher.delete(GROUP, message_id, user_id=7)
+        batcher.delete(GROUP, 10, user_id=7)
+        batcher.delete(-1002, 5)
+        await asyncio.sleep(0.2)
+        await deleter.outbound.stop(timeout=1)
+        return batcher
+
+    batcher = asyncio.run(scenario())
+    assert sorted(bot.calls) == [("delete_message", -1002, 5), ("delete_messages", GROUP, [10, 11, 12])]
+    assert batcher.metrics["bulk_calls"] == 1
+    assert batcher.metrics["requested"] == 4
+
+
+def test_full_batch_goes_out_without_waiting_for_the_window(fake_bot):
+    bot = fake_bot()
+
+    async def scenario():
+        batcher = DeletionBatcher(window=60)
+        for message_id in range(BULK_DELETE_LIMIT):
+            batcher.delete(GROUP, message_id)
+        await asyncio.sleep(0.1)
+        calls = list(bot.calls)
+        await batcher.stop()
+        await deleter.outbound.stop(timeout=1)
+        return calls
+
+    assert asyncio.run(scenario()) == [("delete_messages", GROUP, list(range(BULK_DELETE_LIMIT)))]
+
+
+def test_failed_bulk_delete_is_retried_one_by_one(fake_bot):
+    bot = fake_bot(fail_bulk=True, missing={2})
+
+    async def scenario():
+        batcher = DeletionBatcher(window=0.01)
+        for message_id in (1, 2, 3):
+            batcher.delete(GROUP, message_id)
+        await batcher.stop()
+        await deleter.outbound.stop(timeout=1)
+        return batcher
+
+    batcher = asyncio.run(scenario())
+    singles = sorted(call[2] for call in bot.calls if call[0] == "delete_message")
+    assert singles == [1, 2, 3]
+    assert batcher.metrics["failed"] == 1
+
+
+def test_purge_user_deletes_their_remembered_messages_together(fake_bot):
+    bot = fake_bot()
+
+    async def scenario():
+        batcher = DeletionBatcher(window=0.01, history=3)
+        for message_id in range(1, 6):
+            batcher.remember(GROUP, 7, message_id)
+        batcher.remember(GROUP, 8, 100)
+        assert batcher.purge_user(GROUP, 7) == 3
+        await batcher.stop()
+        await deleter.outbound.stop(timeout=1)
+
+    asyncio.run(scenario())
+    assert bot.calls == [("delete_messages", GROUP, [3, 4, 5])]
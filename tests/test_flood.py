@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+from aiogram.enums import ChatType
+
+import moderation
+from flood import FloodAction, FloodDetector
+from moderation import ModerationBot
+from outbound import OutboundQueue
+
+GROUP = -1001
+RAID = "Kanalimizga obuna bo'ling: t.me/spam_kanal"
+
+
+def detector(**kwargs):
+    return FloodDetector(**{"threshold": 5, "repeats": 2, "raid_users": 20, **kwargs})
+
+
+def post(flood, messages):
+    """Observe (user_id, text) pairs in order; the FloodActions, with None for unflagged messages."""
+    return [flood.observe(GROUP, user_id, message_id, text) for message_id, (user_id, text) in enumerate(messages, 1)]
+
+
+@pytest.mark.parametrize("text", ["Assalomu alaykum hammaga", "Tug'ilgan kuningiz bilan!"])
+def test_many_members_posting_the_same_greeting_is_not_a_flood(text):
+    flood = detector()
+    assert post(flood, [(user_id, text) for user_id in range(1, 11)]) == [None] * 10
+    assert flood.metrics["not_raids"] > 0
+
+
+def test_senders_repeating_a_text_make_a_flood_that_is_only_deleted_at_first():
+    flood = detector()
+    actions = post(flood, [(1, RAID), (2, RAID), (1, RAID), (2, RAID), (1, RAID)])
+    assert actions[:4] == [None] * 4
+    assert actions[4] == FloodAction([(1, 1), (2, 2), (3, 1), (4, 2), (5, 1)], [], True)
+
+
+def test_copies_from_just_joined_members_make_a_flood():
+    flood = detector()
+    for user_id in range(1, 6):
+        flood.joined(GROUP, user_id)
+    actions = post(flood, [(user_id, RAID) for user_id in range(1, 6)])
+    assert actions[-1].started
+    assert [user_id for _, user_id in actions[-1].messages] == [1, 2, 3, 4, 5]
+
+
+def test_members_who_joined_long_ago_are_no_raid_signal():
+    flood = detector(new_member_seconds=0)
+    for user_id in range(1, 6):
+        flood.joined(GROUP, user_id)
+    assert post(flood, [(user_id, RAID) for user_id in range(1, 6)]) == [None] * 5
+
+
+def test_enough_different_senders_make_a_flood_without_other_signals():
+    flood = detector(raid_users=8)
+    actions = post(flood, [(user_id, RAID) for user_id in range(1, 9)])
+    assert actions[:7] == [None] * 7
+    assert actions[7].started and len(actions[7].messages) == 8
+
+
+def test_only_a_sender_posting_again_after_the_deletion_is_muted_once():
+    flood = detector()
+    post(flood, [(1, RAID), (2, RAID), (1, RAID), (2, RAID), (1, RAID)])
+    assert flood.observe(GROUP, 3, 6, RAID) == FloodAction([(6, 3)], [], False)
+    assert flood.observe(GROUP, 1, 7, RAID) == FloodAction([(7, 1)], [1], False)
+    assert flood.observe(GROUP, 1, 8, RAID + "!") == FloodAction([(8, 1)], [], False)
+    assert flood.observe(GROUP, 3, 9, RAID) == FloodAction([(9, 3)], [3], False)
+
+
+class FakeBot:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, method):
+        async def call(**kwargs):
+            self.calls.append(method)
+        return call
+
+
+class FakeDeleter:
+    def __init__(self):
+        self.deleted = []
+
+    def delete(self, chat_id, message_id, user_id=None):
+        self.deleted.append(message_id)
+
+
+@pytest.fixture
+def flood_bot(monkeypatch):
+    def install(chat_type, response):
+        bot, deleter = FakeBot(), FakeDeleter()
+        moderation_bot = ModerationBot()
+        moderation_bot._flood_responses[GROUP] = response
+
+        async def get_admins(chat_id):
+            return [99]
+
+        async def chat_type_of(chat_id):
+            return chat_type
+
+        monkeypatch.setattr(moderation_bot, "get_admins", get_admins)
+        monkeypatch.setattr(moderation.chat_metadata, "chat_type", chat_type_of)
+        monkeypatch.setattr(moderation, "bot", bot)
+        monkeypatch.setattr(moderation, "message_deleter", deleter)
+        monkeypatch.setattr(moderation, "outbound", OutboundQueue(global_rate=1000))
+        return moderation_bot, bot, deleter
+    return install
+
+
+def respond(moderation_bot, actions):
+    async def scenario():
+        for action in actions:
+            await moderation_bot.stop_flood(GROUP, action)
+        await moderation_bot.stop_notices(timeout=1)
+        await moderation.outbound.stop(timeout=1)
+    asyncio.run(scenario())
+
+
+def test_flood_in_a_supergroup_mutes_repeat_senders_but_never_admins(flood_bot):
+    moderation_bot, bot, deleter = flood_bot(ChatType.SUPERGROUP, "mute")
+    respond(moderation_bot, [
+        FloodAction([(1, 1), (2, 99), (3, 2)], [], True),
+        FloodAction([(4, 1)], [1], False),
+        FloodAction([(5, 99)], [99], False),
+    ])
+    assert deleter.deleted == [1, 3, 4]
+    assert sorted(bot.calls) == ["restrict_chat_member", "send_message"]
+
+
+def test_flood_in_a_basic_group_is_never_answered_with_a_ban(flood_bot):
+    moderation_bot, bot, deleter = flood_bot(ChatType.GROUP, "mute")
+    respond(moderation_bot, [FloodAction([(1, 1), (2, 2)], [], True), FloodAction([(3, 1)], [1], False)])
+    assert deleter.deleted == [1, 2, 3]
+    assert bot.calls == ["send_message"]
+
+
+def test_delete_response_never_mutes(flood_bot):
+    moderation_bot, bot, deleter = flood_bot(ChatType.SUPERGROUP, "delete")
+    respond(moderation_bot, [FloodAction([(1, 1)], [], True), FloodAction([(2, 1)], [1], False)])
+    assert deleter.deleted == [1, 2]
+    assert bot.calls == ["send_message"]
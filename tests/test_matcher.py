@@ -0,0 +1,26 @@
+from benchmarks.matcher_corpus import CORPUS, check
+from config import FORBIDDEN_WORDS, INFLECTED_WORDS
+from matcher import WordMatcher
+from moderation import ModerationBot
+
+
+def test_corpus_verdicts():
+    assert check(ModerationBot().find_forbidden_word) == []
+
+
+def test_prefilter_passes_every_text_with_a_word():
+    matcher = WordMatcher(FORBIDDEN_WORDS, inflected=INFLECTED_WORDS)
+    assert [text for text, expected in CORPUS if expected and not matcher.may_match(text)] == []
+
+
+def test_only_inflected_words_take_endings():
+    assert WordMatcher(["gandon"], inflected=["gandon"]).find("gandonlar") == "gandon"
+    assert WordMatcher(["gandon"]).find("gandonlar") is None
+    assert WordMatcher(["gandon"]).find("gandon123") == "gandon"
+
+
+def test_group_list_keeps_the_inflected_words():
+    matcher = WordMatcher(["gandon"], inflected=["gandon"]).derive(additions=["bich"])
+    assert matcher.find("gandonlar") == "gandon"
+    assert matcher.find("bich") == "bich"
+    assert matcher.find("bichim") is None
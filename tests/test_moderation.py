@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from config import BATCH_PROCESS_POOL_THRESHOLD, UPDATE_WORKERS
+from flood import FloodDetector
+import moderation
+from moderation import ModerationBatcher, ModerationBot
+
+
+@pytest.fixture
+def moderation_bot():
+    bot = ModerationBot()
+    yield bot
+    bot.shutdown()
+
+
+def texts(count):
+    # Distinct texts, half of them with a forbidden word
+    return [f"xabar {'a' * i} sen ahmoq" if i % 2 else f"xabar {'a' * i} salom" for i in range(count)]
+
+
+def test_pool_threshold_is_reachable_by_a_batch():
+    # A batch holds at most one text per update worker
+    assert BATCH_PROCESS_POOL_THRESHOLD <= UPDATE_WORKERS
+
+
+def test_large_batch_is_checked_in_a_spawned_pool(moderation_bot):
+    batch = texts(BATCH_PROCESS_POOL_THRESHOLD)
+    verdicts = asyncio.run(moderation_bot.find_forbidden_words_async(batch))
+    assert moderation_bot._process_pool is not None
+    assert moderation_bot._process_pool._mp_context.get_start_method() == "spawn"
+    assert verdicts == moderation_bot.find_forbidden_words(batch)
+    assert [verdict is not None for verdict in verdicts] == [i % 2 == 1 for i in range(len(batch))]
+
+
+def test_texts_checked_in_one_tick_go_to_the_pool_together(moderation_bot, monkeypatch):
+    monkeypatch.setattr(moderation, "flood_detector", FloodDetector())
+    batcher = ModerationBatcher(moderation_bot)
+    # Clean texts never reach the batch, the prefilter answers them
+    batch = [f"xabar {'a' * i} sen ahmoq" for i in range(BATCH_PROCESS_POOL_THRESHOLD)]
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.check(text) for text in batch))
+
+    verdicts = asyncio.run(scenario())
+    assert moderation_bot._process_pool is not None
+    assert verdicts == moderation_bot.find_forbidden_words(batch)
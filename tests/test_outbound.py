@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from outbound import ACTION, NOTICE, OutboundQueue, OutboundQueueFull
+
+GROUP = -1001
+
+
+class Recorder:
+    """Stands in for a Bot method: records the order calls reach Telegram in."""
+
+    def __init__(self, sent: list, name: str):
+        self.sent = sent
+        self.name = name
+
+    async def __call__(self, **kwargs):
+        self.sent.append((self.name, kwargs.get("text")))
+        return self.name
+
+
+def test_action_queued_after_a_notice_in_the_same_chat_is_sent_first():
+    async def scenario():
+        queue = OutboundQueue(global_rate=100)
+        sent = []
+        notice = await queue.submit(NOTICE, GROUP, Recorder(sent, "send_message"), text="warning")
+        action = await queue.submit(ACTION, GROUP, Recorder(sent, "delete_message"))
+        await asyncio.gather(notice, action)
+        assert sent == [("delete_message", None), ("send_message", "warning")]
+        await queue.stop(timeout=1)
+    asyncio.run(scenario())
+
+
+def test_action_does_not_wait_for_notices_held_by_the_chat_rate_limit():
+    async def scenario():
+        queue = OutboundQueue(global_rate=100)
+        sent = []
+        send = Recorder(sent, "send_message")
+        # More notices than the group's burst: the rest wait on its bucket
+        notices = [await queue.submit(NOTICE, GROUP, send, text=str(i)) for i in range(8)]
+        await asyncio.sleep(0.05)
+        assert len(sent) < 8
+        await asyncio.wait_for(queue.call(ACTION, GROUP, Recorder(sent, "restrict_chat_member")), 1)
+        assert ("restrict_chat_member", None) in sent
+        assert not all(notice.done() for notice in notices)
+        for notice in notices:
+            notice.cancel()
+        await queue.stop(timeout=0)
+    asyncio.run(scenario())
+
+
+def test_full_queue_refuses_notices_and_holds_actions():
+    async def scenario():
+        queue = OutboundQueue(global_rate=100, maxsize=1)
+        release = asyncio.Event()
+
+        async def slow(**kwargs):
+            await release.wait()
+
+        first = await queue.submit(ACTION, GROUP, slow)
+        with pytest.raises(OutboundQueueFull):
+            await queue.submit(NOTICE, GROUP, slow)
+        waiting = asyncio.create_task(queue.call(ACTION, GROUP, slow))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        assert queue.metrics["backpressure_waits"] == 1
+        release.set()
+        await asyncio.wait_for(asyncio.gather(first, waiting), 1)
+        await queue.stop(timeout=1)
+    asyncio.run(scenario())
@@ -0,0 +1,92 @@
+import asyncio
+
+from pipeline import ChatPipeline, DROPPED, MERGED
+
+
+def job(log: list, name: str, release: asyncio.Event = None):
+    async def run():
+        log.append(f"start {name}")
+        if release is not None:
+            await release.wait()
+        log.append(f"end {name}")
+        return name
+    return run
+
+
+def test_one_chat_runs_in_order_while_other_chats_go_ahead():
+    async def scenario():
+        pipeline = ChatPipeline(workers=4, queue_size=10)
+        log = []
+        release = asyncio.Event()
+        first = asyncio.create_task(pipeline.run(1, job(log, "a1", release)))
+        second = asyncio.create_task(pipeline.run(1, job(log, "a2")))
+        other = asyncio.create_task(pipeline.run(2, job(log, "b1")))
+        assert await other == "b1"
+        # The slow update holds its own chat only
+        assert log == ["start a1", "start b1", "end b1"]
+        release.set()
+        assert await asyncio.gather(first, second) == ["a1", "a2"]
+        assert log[3:] == ["end a1", "start a2", "end a2"]
+    asyncio.run(scenario())
+
+
+def test_full_queue_drops_the_oldest_droppable_update():
+    async def scenario():
+        pipeline = ChatPipeline(workers=4, queue_size=2)
+        log = []
+        release = asyncio.Event()
+        running = asyncio.create_task(pipeline.run(1, job(log, "running", release)))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(pipeline.run(1, job(log, name), droppable=True)) for name in ("m1", "m2", "m3")]
+        await asyncio.sleep(0)
+        release.set()
+        assert await running == "running"
+        assert await asyncio.gather(*queued) == [DROPPED, "m2", "m3"]
+        assert "start m1" not in log
+        assert pipeline.metrics["dropped"] == 1
+    asyncio.run(scenario())
+
+
+def test_full_queue_refuses_when_nothing_can_be_dropped():
+    async def scenario():
+        pipeline = ChatPipeline(workers=4, queue_size=1)
+        release = asyncio.Event()
+        running = asyncio.create_task(pipeline.run(1, job([], "running", release)))
+        await asyncio.sleep(0)
+        command = asyncio.create_task(pipeline.run(1, job([], "command")))
+        await asyncio.sleep(0)
+        assert await pipeline.run(1, job([], "another command")) is DROPPED
+        assert pipeline.metrics["refused"] == 1
+        release.set()
+        assert await asyncio.gather(running, command) == ["running", "command"]
+    asyncio.run(scenario())
+
+
+def test_update_with_the_same_merge_key_replaces_the_queued_one():
+    async def scenario():
+        pipeline = ChatPipeline(workers=4, queue_size=10)
+        log = []
+        release = asyncio.Event()
+        running = asyncio.create_task(pipeline.run(1, job(log, "running", release)))
+        await asyncio.sleep(0)
+        press = asyncio.create_task(pipeline.run(1, job(log, "press 1"), merge_key=("callback", 7, "ok")))
+        await asyncio.sleep(0)
+        again = asyncio.create_task(pipeline.run(1, job(log, "press 2"), merge_key=("callback", 7, "ok")))
+        release.set()
+        assert await asyncio.gather(running, press, again) == ["running", MERGED, "press 2"]
+        assert "start press 1" not in log
+    asyncio.run(scenario())
+
+
+def test_worker_limit_bounds_chats_running_at_once():
+    async def scenario():
+        pipeline = ChatPipeline(workers=2, queue_size=10)
+        log = []
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(pipeline.run(chat_id, job(log, str(chat_id), release))) for chat_id in range(4)]
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert sum(entry.startswith("start") for entry in log) == 2
+        release.set()
+        assert await asyncio.gather(*tasks) == ["0", "1", "2", "3"]
+    asyncio.run(scenario())
@@ -0,0 +1,90 @@
+import asyncio
+
+import database
+from scheduler import JobScheduler
+
+
+def test_runs_due_jobs_and_keeps_later_ones(db_path):
+    database.init_db()
+    ran = []
+
+    async def scenario():
+        scheduler = JobScheduler(batch_size=2)
+
+        async def unban(chat_id, user_id, message_id):
+            ran.append((chat_id, user_id))
+
+        scheduler.register("unban", unban)
+        for user_id in (1, 2, 3):
+            await scheduler.schedule(0, "unban", -1001, user_id)
+        await scheduler.schedule(3600, "unban", -1001, 4)
+        return await scheduler.run_due()
+
+    assert asyncio.run(scenario()) == 3
+    assert sorted(ran) == [(-1001, 1), (-1001, 2), (-1001, 3)]
+    assert [job[3] for job in database.get_due_jobs(float("inf"), 10)] == [4]
+
+
+def test_failed_and_unknown_jobs_do_not_stop_the_batch(db_path):
+    database.init_db()
+    ran = []
+
+    async def scenario():
+        scheduler = JobScheduler()
+
+        async def fail(chat_id, user_id, message_id):
+            raise RuntimeError("Bad Request: chat not found")
+
+        async def unban(chat_id, user_id, message_id):
+            ran.append(user_id)
+
+        scheduler.register("delete_notification", fail)
+        scheduler.register("unban", unban)
+        await scheduler.schedule(0, "delete_notification", -1001, None, 5)
+        await scheduler.schedule(0, "gone", -1001, 1)
+        await scheduler.schedule(0, "unban", -1001, 2)
+        return await scheduler.run_due()
+
+    assert asyncio.run(scenario()) == 3
+    assert ran == [2]
+    assert database.get_due_jobs(float("inf"), 10) == []
+
+
+def test_cancel_removes_the_matching_job(db_path):
+    database.init_db()
+
+    async def scenario():
+        scheduler = JobScheduler()
+        await scheduler.schedule(0, "captcha_timeout", -1001, 1, 10)
+        await scheduler.schedule(0, "captcha_timeout", -1001, 2, 11)
+        return await scheduler.cancel("captcha_timeout", -1001, 1)
+
+    assert asyncio.run(scenario()) == 1
+    assert [job[3] for job in database.get_due_jobs(float("inf"), 10)] == [2]
+
+
+def test_loop_wakes_up_for_a_job_sooner_than_the_one_it_sleeps_for(db_path):
+    database.init_db()
+
+    async def scenario():
+        done = asyncio.Event()
+        scheduler = JobScheduler()
+
+        async def unban(chat_id, user_id, message_id):
+            done.set()
+
+        scheduler.register("unban", unban)
+        await scheduler.schedule(3600, "unban", -1001, 1)
+        scheduler.start()
+        await asyncio.sleep(0.1)
+        await scheduler.schedule(0.05, "unban", -1001, 2)
+        try:
+            await asyncio.wait_for(done.wait(), 2)
+            # A job is removed only after it ran; stopping in between would run it again
+            while len(database.get_due_jobs(float("inf"), 10)) > 1:
+                await asyncio.sleep(0.01)
+        finally:
+            await scheduler.stop()
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert [job[3] for job in database.get_due_jobs(float("inf"), 10)] == [1]
@@ -0,0 +1,63 @@
+import asyncio
+
+import database
+from scheduler import JobScheduler
+from shards import Shard, current_shard, shard_of, update_chat_id
+from workers import ShardRouter
+
+
+def message(chat_id, message_id=1):
+    return {"update_id": message_id, "message": {"message_id": message_id, "chat": {"id": chat_id}, "from": {"id": 7}}}
+
+
+def test_update_chat_id_finds_the_chat_of_every_kind_of_update():
+    assert update_chat_id(message(-1001)) == -1001
+    assert update_chat_id({"update_id": 1, "callback_query": {"from": {"id": 7}, "message": {"chat": {"id": -1002}}}}) == -1002
+    assert update_chat_id({"update_id": 1, "chat_member": {"chat": {"id": -1003}, "from": {"id": 7}}}) == -1003
+    assert update_chat_id({"update_id": 1, "inline_query": {"from": {"id": 7}}}) == 7
+    assert update_chat_id({"update_id": 1}) == 0
+
+
+def test_a_chat_belongs_to_exactly_one_shard():
+    shards = [Shard() for _ in range(3)]
+    for index, shard in enumerate(shards):
+        shard.configure(index, 3)
+    for chat_id in (-1001, -1002, -1003, 7, 0):
+        assert [shard.owns(chat_id) for shard in shards].count(True) == 1
+        assert shards[shard_of(chat_id, 3)].owns(chat_id)
+    assert Shard().owns(-1001)
+
+
+def test_router_keeps_a_chat_on_one_worker_in_order():
+    async def scenario():
+        router = ShardRouter(count=2, queue_size=2)
+        accepted = [router.offer(message(-1001, i)) for i in (1, 2, 3)]
+        queue = router._queues[shard_of(-1001, 2)]
+        return accepted, [queue.get_nowait()["update_id"] for _ in range(queue.qsize())], router.metrics
+
+    accepted, queued, metrics = asyncio.run(scenario())
+    assert accepted == [True, True, False]
+    assert queued == [1, 2]
+    assert metrics["busy"] == 1
+
+
+def test_scheduler_only_runs_the_jobs_of_its_own_shard(db_path, monkeypatch):
+    database.init_db()
+    monkeypatch.setattr(current_shard, "index", 1)
+    monkeypatch.setattr(current_shard, "count", 2)
+    ran = []
+
+    async def scenario():
+        scheduler = JobScheduler()
+
+        async def unban(chat_id, user_id, message_id):
+            ran.append(chat_id)
+
+        scheduler.register("unban", unban)
+        for chat_id in (-1001, -1002, -1003, -1004):
+            await scheduler.schedule(0, "unban", chat_id, 1)
+        await scheduler.run_due()
+
+    asyncio.run(scenario())
+    assert sorted(ran) == [-1003, -1001]
+    assert sorted(job[2] for job in database.get_due_jobs(float("inf"), 10, 0, 2)) == [-1004, -1002]
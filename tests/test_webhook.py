@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import webhook
+from webhook import SECRET_HEADER, WebhookServer, telegram_secret
+from workers import ShardRouter
+
+UPDATE = {"update_id": 1, "message": {"message_id": 1, "date": 0, "chat": {"id": -1001, "type": "supergroup"}, "text": "salom"}}
+
+
+class Dispatcher:
+    def __init__(self):
+        self.updates = []
+
+    async def feed_update(self, bot, update):
+        self.updates.append(update.update_id)
+
+
+def post(app, headers, payload=UPDATE):
+    async def scenario():
+        async with TestClient(TestServer(app)) as client:
+            response = await client.post("/webhook", json=payload, headers=headers)
+            return response.status
+    return asyncio.run(scenario())
+
+
+def test_secret_comes_from_config_or_is_made_up_only_when_the_bot_sets_the_webhook(monkeypatch):
+    monkeypatch.setattr(webhook, "WEBHOOK_SECRET", "configured")
+    assert telegram_secret() == "configured"
+    monkeypatch.setattr(webhook, "WEBHOOK_SECRET", "")
+    monkeypatch.setattr(webhook, "WEBHOOK_URL", "https://example.org/webhook")
+    assert len(telegram_secret()) == 64 and telegram_secret() != telegram_secret()
+    monkeypatch.setattr(webhook, "WEBHOOK_URL", "")
+    with pytest.raises(RuntimeError):
+        telegram_secret()
+
+
+def test_server_without_a_secret_is_refused():
+    with pytest.raises(ValueError):
+        WebhookServer(Dispatcher(), bot=None, secret="")
+
+
+@pytest.mark.parametrize("headers, status", [({}, 401), ({SECRET_HEADER: "wrong"}, 401), ({SECRET_HEADER: "s3cret"}, 200)])
+def test_updates_need_the_secret_token(headers, status):
+    dispatcher = Dispatcher()
+    server = WebhookServer(dispatcher, bot=None, secret="s3cret")
+
+    async def scenario():
+        async with TestClient(TestServer(server.app())) as client:
+            response = await client.post("/webhook", json=UPDATE, headers=headers)
+            await server.drain(timeout=1)
+            return response.status
+
+    assert asyncio.run(scenario()) == status
+    assert dispatcher.updates == ([1] if status == 200 else [])
+
+
+def test_shard_router_refuses_updates_until_it_has_a_secret():
+    router = ShardRouter(count=1)
+
+    def app():
+        app = web.Application()
+        app.router.add_post("/webhook", router.handle)
+        return app
+
+    assert post(app(), {SECRET_HEADER: ""}) == 401
+    router.telegram_secret = "s3cret"
+    assert post(app(), {SECRET_HEADER: "wrong"}) == 401
+    assert post(app(), {SECRET_HEADER: "s3cret"}) == 200
+    assert router.metrics["rejected"] == 2
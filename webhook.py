@@ -0,0 +1,164 @@
+import asyncio
+import hmac
+import secrets
+import signal
+import time
+
+from aiohttp import web
+from aiogram.types import Update
+
+from config import (
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_MAX_INFLIGHT,
+    WEBHOOK_DRAIN_TIMEOUT,
+)
+from core import logger
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def telegram_secret() -> str:
+    """The secret token Telegram has to send with every update.
+
+    WEBHOOK_SECRET when it is set. Otherwise a random one, which only works
+    when the bot sets the webhook itself (WEBHOOK_URL) and so tells
+    Telegram the token; a webhook set elsewhere needs WEBHOOK_SECRET, and
+    without it webhook mode does not start rather than accept anyone's POSTs.
+    """
+    if WEBHOOK_SECRET:
+        return WEBHOOK_SECRET
+    if WEBHOOK_URL:
+        return secrets.token_hex(32)
+    raise RuntimeError("webhook mode needs WEBHOOK_SECRET when WEBHOOK_URL is empty")
+
+
+class WebhookServer:
+    """Receives updates from Telegram over HTTP and feeds them to the dispatcher.
+
+    Each request is checked against the secret token, parsed and answered
+    with 200 straight away; the update itself is handled in a background
+    task, so Telegram never waits on moderation. With WEBHOOK_MAX_INFLIGHT
+    updates already being handled new ones get a 503, and Telegram delivers
+    them again later. On shutdown the server stops taking updates and waits
+    for the in-flight ones to finish.
+    """
+
+    def __init__(self, dispatcher, bot, secret: str, path: str = WEBHOOK_PATH, max_inflight: int = WEBHOOK_MAX_INFLIGHT):
+        if not secret:
+            raise ValueError("WebhookServer needs a secret token")
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.secret = secret
+        self.path = path
+        self.max_inflight = max_inflight
+        self.closing = False
+        self._inflight = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.metrics = {"received": 0, "rejected": 0, "busy": 0, "processed": 0, "failed": 0}
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            self.metrics["rejected"] += 1
+            return web.Response(status=401)
+        if self.closing or len(self._inflight) >= self.max_inflight:
+            self.metrics["busy"] += 1
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"Malformed webhook update: {e}")
+            return web.Response(status=400)
+        self.metrics["received"] += 1
+        task = asyncio.create_task(self._process(update))
+        self._inflight.add(task)
+        self._idle.clear()
+        task.add_done_callback(self._done)
+        return web.Response()
+
+    async def _process(self, update: Update) -> None:
+        try:
+            await self.dispatcher.feed_update(self.bot, update)
+            self.metrics["processed"] += 1
+        except Exception as e:
+            self.metrics["failed"] += 1
+            logger.error(f"Failed to handle update {update.update_id}: {e}")
+
+    def _done(self, task: asyncio.Task) -> None:
+        self._inflight.discard(task)
+        if not self._inflight:
+            self._idle.set()
+
+    async def drain(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT) -> bool:
+        """Stop taking updates and wait for the in-flight ones; False on timeout."""
+        self.closing = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"{len(self._inflight)} updates still running after {timeout}s, cancelling them")
+            for task in list(self._inflight):
+                task.cancel()
+            return False
+
+
+async def run_webhook(dispatcher, bot, *, secret: str = None, path: str = WEBHOOK_PATH, unix_path: str = None, signals: tuple = (signal.SIGINT, signal.SIGTERM)) -> None:
+    """Serve updates until one of ``signals``, then drain and stop.
+
+    With ``unix_path`` the server listens on that socket for the front
+    process of a sharded deployment instead of on WEBHOOK_HOST:WEBHOOK_PORT
+    for Telegram, and leaves the bot's webhook alone. ``secret`` defaults
+    to ``telegram_secret()``.
+    """
+    if secret is None:
+        secret = telegram_secret()
+    server = WebhookServer(dispatcher, bot, secret=secret, path=path)
+    runner = web.AppRunner(server.app())
+    await runner.setup()
+    if unix_path:
+        site = web.UnixSite(runner, unix_path)
+    else:
+        site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+    if WEBHOOK_URL and not unix_path:
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=secret,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+        )
+    logger.info(f"✅ Webhook {site.name}{path} da tinglanmoqda")
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in signals:
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+    await dispatcher.emit_startup(bot=bot, dispatcher=dispatcher)
+    try:
+        await stop.wait()
+    finally:
+        started = time.monotonic()
+        drained = await server.drain()
+        logger.info(
+            f"Webhook to'xtadi: {server.metrics}, "
+            f"{'hammasi' if drained else 'qisman'} {time.monotonic() - started:.1f}s da yakunlandi"
+        )
+        await runner.cleanup()
+        await dispatcher.emit_shutdown(bot=bot, dispatcher=dispatcher)
+
+
+__all__ = ["WebhookServer", "run_webhook", "telegram_secret", "SECRET_HEADER"]
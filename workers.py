@@ -0,0 +1,285 @@
+import asyncio
+import hmac
+import multiprocessing
+import os
+import secrets
+import shutil
+import signal
+import tempfile
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, UnixConnector, web
+
+from config import (
+    BOT_MODE,
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WORKERS,
+    WORKER_QUEUE_SIZE,
+    WORKER_DRAIN_TIMEOUT,
+    OUTBOUND_GLOBAL_RATE,
+)
+from core import logger
+from logs import listen_for_logs, log_to_queue
+from shards import current_shard, shard_of, update_chat_id
+from webhook import SECRET_HEADER, telegram_secret
+
+# Path the workers serve updates on, over their unix sockets
+WORKER_PATH = "/update"
+
+
+def worker_main(index: int, count: int, socket_path: str, secret: str, log_queue) -> None:
+    """Entry point of a worker process."""
+    log_to_queue(logger, log_queue, f"worker-{index}")
+    # Ctrl+C reaches the whole process group; a worker waits for the front's
+    # SIGTERM so that updates still queued for it are delivered first
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    current_shard.configure(index, count)
+    asyncio.run(_run_worker(count, socket_path, secret))
+
+
+async def _run_worker(count: int, socket_path: str, secret: str) -> None:
+    from core import bot, dp
+    from outbound import outbound
+    from run import setup_dispatcher, start_services, stop_services
+    from webhook import run_webhook
+
+    # The bot's overall limit is shared by all workers
+    outbound.set_global_rate(OUTBOUND_GLOBAL_RATE / count)
+    try:
+        await start_services()
+        setup_dispatcher()
+        await run_webhook(dp, bot, secret=secret, path=WORKER_PATH, unix_path=socket_path, signals=(signal.SIGTERM,))
+    except Exception as e:
+        logger.error(f"Worker shu xatolik bilan to'xtadi: {e}")
+    finally:
+        await stop_services()
+        await bot.session.close()
+
+
+class ShardRouter:
+    """Front process of a sharded deployment.
+
+    Starts ``count`` worker processes and hands every update to the one
+    that owns its chat (``shard_of(chat_id)``), so a group's counters,
+    timers, caches and rate limits all live in a single worker and the
+    workers never need to coordinate. Each worker has a bounded queue here
+    and one forwarder that delivers its updates one by one, in order, over
+    a unix socket; a worker that is busy or restarting is retried.
+
+    Workers share the SQLite file: WAL lets them read concurrently, writes
+    wait on the busy timeout, and the only shared table they all touch
+    (``scheduled_jobs``) is filtered by shard. A worker that dies is
+    started again; its updates wait in its queue meanwhile.
+    """
+
+    def __init__(self, count: int = WORKERS, queue_size: int = WORKER_QUEUE_SIZE):
+        self.count = count
+        # Between this process and the workers
+        self.secret = secrets.token_hex(16)
+        # Telegram's, for the webhook endpoint; set by run_sharded in webhook mode
+        self.telegram_secret = None
+        self.closing = False
+        self._dir = None
+        self._context = multiprocessing.get_context("spawn")
+        self._processes = [None] * count
+        self._queues = [asyncio.Queue(queue_size) for _ in range(count)]
+        self._forwarders = []
+        self._supervisor = None
+        self._log_queue = None
+        self._listener = None
+        self.metrics = {"routed": [0] * count, "forwarded": [0] * count, "rejected": 0, "busy": 0, "retried": 0, "dropped": 0, "restarted": 0}
+
+    def socket_path(self, index: int) -> str:
+        return os.path.join(self._dir, f"worker-{index}.sock")
+
+    def _spawn(self, index: int) -> None:
+        process = self._context.Process(
+            target=worker_main,
+            args=(index, self.count, self.socket_path(index), self.secret, self._log_queue),
+            name=f"worker-{index}",
+        )
+        process.start()
+        self._processes[index] = process
+
+    def start(self) -> None:
+        self._dir = tempfile.mkdtemp(prefix="shutupbot-")
+        self._log_queue = self._context.Queue()
+        self._listener = listen_for_logs(logger, self._log_queue)
+        for index in range(self.count):
+            self._spawn(index)
+        self._forwarders = [asyncio.create_task(self._forward(index)) for index in range(self.count)]
+        self._supervisor = asyncio.create_task(self._supervise())
+        logger.info(f"✅ {self.count} ta worker ishga tushirildi")
+
+    def offer(self, update: dict) -> bool:
+        """Queue an update for its worker; False if that worker's queue is full."""
+        index = shard_of(update_chat_id(update), self.count)
+        try:
+            self._queues[index].put_nowait(update)
+        except asyncio.QueueFull:
+            self.metrics["busy"] += 1
+            return False
+        self.metrics["routed"][index] += 1
+        return True
+
+    async def put(self, update: dict) -> None:
+        """Queue an update for its worker, waiting for room."""
+        index = shard_of(update_chat_id(update), self.count)
+        await self._queues[index].put(update)
+        self.metrics["routed"][index] += 1
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Webhook endpoint for Telegram: route the update, answer 200."""
+        if not self.telegram_secret or not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.telegram_secret):
+            self.metrics["rejected"] += 1
+            return web.Response(status=401)
+        if self.closing:
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        if not isinstance(update, dict):
+            return web.Response(status=400)
+        if not self.offer(update):
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        return web.Response()
+
+    async def _forward(self, index: int) -> None:
+        queue = self._queues[index]
+        headers = {SECRET_HEADER: self.secret}
+        connector = UnixConnector(path=self.socket_path(index))
+        async with ClientSession(connector=connector, timeout=ClientTimeout(total=30)) as session:
+            while True:
+                update = await queue.get()
+                delay = 0.1
+                while True:
+                    try:
+                        async with session.post(f"http://worker{WORKER_PATH}", json=update, headers=headers) as response:
+                            if response.status == 200:
+                                self.metrics["forwarded"][index] += 1
+                                break
+                            if response.status != 503:
+                                self.metrics["dropped"] += 1
+                                logger.warning(f"Worker {index} rejected update {update.get('update_id')}: HTTP {response.status}")
+                                break
+                            wait = float(response.headers.get("Retry-After", delay))
+                    except (ClientError, asyncio.TimeoutError):
+                        # Still starting, or being restarted by the supervisor
+                        wait = delay
+                    self.metrics["retried"] += 1
+                    await asyncio.sleep(wait)
+                    delay = min(delay * 2, 5)
+                queue.task_done()
+
+    async def _supervise(self) -> None:
+        while True:
+            await asyncio.sleep(1)
+            for index, process in enumerate(self._processes):
+                if not self.closing and not process.is_alive():
+                    logger.error(f"Worker {index} {process.exitcode} kodi bilan to'xtadi, qayta ishga tushirilmoqda")
+                    self.metrics["restarted"] += 1
+                    self._spawn(index)
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        stats["queued"] = [queue.qsize() for queue in self._queues]
+        stats["alive"] = sum(1 for process in self._processes if process is not None and process.is_alive())
+        return stats
+
+    async def stop(self, timeout: float = WORKER_DRAIN_TIMEOUT) -> None:
+        """Deliver what is queued (up to ``timeout``), then stop the workers."""
+        self.closing = True
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{sum(queue.qsize() for queue in self._queues)} ta yangilanish workerlarga yetkazilmadi")
+        for task in self._forwarders:
+            task.cancel()
+        await asyncio.gather(*self._forwarders, return_exceptions=True)
+        # SIGTERM: each worker drains its own in-flight updates and shuts down
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, timeout * 2)
+            if process.is_alive():
+                logger.warning(f"{process.name} o'z vaqtida to'xtamadi, majburan to'xtatilmoqda")
+                process.kill()
+                process.join()
+        if self._listener is not None:
+            self._listener.stop()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+async def _poll(bot, router: ShardRouter, allowed_updates: list, stop: asyncio.Event) -> None:
+    offset = None
+    while not stop.is_set():
+        request = asyncio.ensure_future(bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates))
+        stopping = asyncio.ensure_future(stop.wait())
+        await asyncio.wait({request, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+        if not request.done():
+            # Not confirmed with a new offset, so Telegram sends them again next time
+            request.cancel()
+            break
+        try:
+            updates = request.result()
+        except Exception as e:
+            logger.error(f"Failed to get updates: {e}")
+            await asyncio.sleep(5)
+            continue
+        for update in updates:
+            await router.put(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+            offset = update.update_id + 1
+
+
+async def run_sharded(dispatcher, bot) -> None:
+    """Receive updates (BOT_MODE) and route them to WORKERS worker processes until SIGINT/SIGTERM."""
+    router = ShardRouter()
+    if BOT_MODE == "webhook":
+        # Before any worker starts, so a missing secret stops nothing half-started
+        router.telegram_secret = telegram_secret()
+    router.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+    allowed_updates = dispatcher.resolve_used_update_types()
+    runner = None
+    try:
+        if BOT_MODE == "webhook":
+            app = web.Application()
+            app.router.add_post(WEBHOOK_PATH, router.handle)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+            if WEBHOOK_URL:
+                await bot.set_webhook(
+                    WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                    secret_token=router.telegram_secret,
+                    allowed_updates=allowed_updates,
+                )
+            logger.info(f"✅ Webhook {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH} da tinglanmoqda")
+            await stop.wait()
+        else:
+            await bot.delete_webhook()
+            await _poll(bot, router, allowed_updates, stop)
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+        await router.stop()
+        logger.info(f"Workerlar to'xtadi: {router.stats()}")
+
+
+__all__ = ["ShardRouter", "WORKER_PATH", "run_sharded", "worker_main"]